@@ -15,6 +15,7 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,15 +86,7 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 SUPABASE_URL = "https://pnukuxgecmgeeeggjecw.supabase.co"  # Correct format for Supabase API URL
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')  # Keep using your existing key from .env
 
-# Create Supabase client for API interactions (if needed)
-try:
-    from supabase import create_client
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-except ImportError:
-    supabase = None
-except Exception as e:
-    print(f"Warning: Could not initialize Supabase client: {e}")
-    supabase = None
+# The backend only talks to the database; no Supabase API client is created
 
 # Database configuration using direct PostgreSQL connection
 DATABASES = {
@@ -104,9 +98,100 @@ DATABASES = {
         'HOST': 'aws-0-eu-central-1.pooler.supabase.com',
         'PORT': '5432',
         'POOL_MODE' : 'session',
+        # Reuse connections across requests instead of paying a TLS + auth handshake each time
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DATABASE_URL points the project at another database, e.g. a local Postgres
+if os.getenv('DATABASE_URL'):
+    DATABASES['default'] = dj_database_url.parse(
+        os.environ['DATABASE_URL'],
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=True,
+    )
+
+# DB_POOL=1 switches to psycopg 3's connection pool, which replaces persistent
+# connections. psycopg2 cannot be pooled; install psycopg 3 as listed in requirements.txt
+if os.getenv('DB_POOL') and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured('DB_POOL needs psycopg 3 with its pool: pip install "psycopg[binary,pool]>=3.1.8"')
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        'timeout': 10,
+    }
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Local memory by default; point REDIS_URL at a Redis server to share the cache between workers
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ecare',
+        }
+    }
+
+# Seconds a serialized doctor profile or directory page stays cached
+DOCTOR_CACHE_TIMEOUT = 300
+
+# Cache holding the request counters of core.throttling
+THROTTLE_CACHE_ALIAS = 'default'
+# Seconds a request waits for an identical in-flight read (core.coalescing) before running its own
+COALESCE_TIMEOUT = 10
+
+
+# Django REST framework
+# orjson renders JSON when installed (pip install orjson); otherwise DRF's renderer is used
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Limits of the doctor directory and availability reads (core.throttling);
+    # anonymous limits are per IP, which many phones share behind carrier NAT
+    'DEFAULT_THROTTLE_RATES': {
+        'hot_read_user': '120/min',
+        'hot_read_anon': '300/min',
+    },
+}
+
+
+# Request instrumentation (core.instrumentation)
+
+# Send per-request query counts and timings as a Server-Timing header
+SERVER_TIMING_HEADER = DEBUG
+# Log a likely N+1 when one request runs the same SQL this many times
+QUERY_REPEAT_THRESHOLD = 5
+
+
+# Offline sync (core.sync)
+
+# Seconds change feeds stay behind now, longer than any transaction writing synced rows
+SYNC_SAFETY_LAG = 10
+
+
+# Background notification dispatch (core.notifications)
+
+NOTIFICATION_WORKERS = 2
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_QUEUE_SIZE = 10000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,3 +1,112 @@
+"""Admin for tables that grow to millions of rows.
+
+Change lists never run an unbounded COUNT(*) (`EstimatedCountPaginator`,
+no full result count), fetch the rows they display with list_select_related,
+pick related rows through autocomplete or raw id widgets instead of dropdowns
+listing every doctor or patient, and only offer filters backed by an index.
+"""
 from django.contrib import admin
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, Availability, Clinic, Doctor, Notification, Patient, Prescription, PrescriptionItem
+from .pagination import EstimatedCountPaginator
+from .search import search_doctors
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ('-id',)
+
+
+class WhenFilter(admin.SimpleListFilter):
+    """Upcoming or past rows by start_time, a range over its indexes"""
+    title = 'when'
+    parameter_name = 'when'
+
+    def lookups(self, request, model_admin):
+        return [('upcoming', 'Upcoming'), ('past', 'Past')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'upcoming':
+            return queryset.filter(start_time__gte=timezone.now())
+        if self.value() == 'past':
+            return queryset.filter(start_time__lt=timezone.now())
+        return queryset
+
+
+@admin.register(Clinic)
+class ClinicAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'address')
+    search_fields = ('name',)
+
+
+@admin.register(Doctor)
+class DoctorAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'specialty', 'clinic', 'grade', 'nbr_patients')
+    list_select_related = ('user', 'clinic')
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('clinic',)
+    # Answered by core.search rather than LIKE scans over the joined user rows
+    search_fields = ('search_text',)
+    exclude = ('search_text', 'rating_sum', 'rating_count')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search_doctors(search_term, limit=self.list_per_page)), False
+
+
+@admin.register(Patient)
+class PatientAdmin(LargeTableAdmin):
+    list_display = ('id', 'user')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('user__email', 'user__username')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Exact, case-sensitive matches stay on the unique indexes
+        if not search_term:
+            return queryset, False
+        return queryset.filter(Q(user__email=search_term) | Q(user__username=search_term)), False
+
+
+@admin.register(Appointment)
+class AppointmentAdmin(LargeTableAdmin):
+    list_display = ('id', 'doctor', 'patient', 'start_time', 'end_time', 'status')
+    list_select_related = ('doctor__user', 'patient__user')
+    autocomplete_fields = ('doctor', 'patient')
+    list_filter = ('status', WhenFilter)
+    readonly_fields = ('qr_Code', 'reminder_sent_at')
+
+
+@admin.register(Availability)
+class AvailabilityAdmin(LargeTableAdmin):
+    list_display = ('id', 'doctor_id', 'start_time', 'end_time', 'booked')
+    list_select_related = ('doctor_id__user',)
+    autocomplete_fields = ('doctor_id',)
+    list_filter = ('booked', WhenFilter)
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'title', 'type', 'date_creation', 'time_creation')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+class PrescriptionItemInline(admin.TabularInline):
+    model = PrescriptionItem
+    extra = 0
+    # The medication catalogue is far too large for a dropdown
+    raw_id_fields = ('medication',)
+
 
-# Register your models here.
+@admin.register(Prescription)
+class PrescriptionAdmin(LargeTableAdmin):
+    list_display = ('id', 'patient', 'doctor', 'date')
+    list_select_related = ('patient__user', 'doctor__user')
+    autocomplete_fields = ('patient', 'doctor')
+    inlines = [PrescriptionItemInline]
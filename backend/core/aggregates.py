@@ -0,0 +1,130 @@
+"""Incrementally maintained doctor aggregates.
+
+`Doctor.grade` is the mean feedback rating, kept as running `rating_sum` /
+`rating_count` totals, and `Doctor.nbr_patients` counts the distinct patients
+with at least one completed appointment, archived ones included. Writes go
+through single UPDATE statements built from F() expressions, so concurrent
+requests never lose an increment; a completion checks for the patient's other
+visits under the doctor's row lock. Rows written without signals (bulk_create, queryset.update) are
+picked up by `rebuild`.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from . import cache
+from .models import Appointment, AppointmentArchive, Doctor, Feedback
+
+FIELDS = ['rating_sum', 'rating_count', 'grade', 'nbr_patients']
+
+
+def apply_rating_change(doctor_id, sum_delta, count_delta):
+    """Shift a doctor's rating totals and recompute the grade in the same UPDATE"""
+    if not sum_delta and not count_delta:
+        return
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+    Doctor.objects.filter(pk=doctor_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        grade=Case(
+            When(rating_count=-count_delta, then=Value(0.0)),
+            default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+            output_field=FloatField(),
+        ),
+        # Bumped by hand since update() skips auto_now, so offline clients see the new grade
+        updated_at=timezone.now(),
+    )
+
+
+def _patient_counts(doctor_ids):
+    """Distinct patients per doctor across completed and archived appointments, for `compute`"""
+    pairs = set()
+    for queryset in (Appointment.objects.filter(status='completed'), AppointmentArchive.objects.all()):
+        pairs.update(queryset.filter(doctor_id__in=doctor_ids).values_list('doctor_id', 'patient_id').distinct())
+    return Counter(doctor_id for doctor_id, _ in pairs)
+
+
+def record_completion(appointment, completed):
+    """Count the patient once per doctor when their first appointment completes, and uncount the last.
+
+    The check runs under the doctor's row lock, and Appointment writes commit
+    inside the same transaction, so two first visits completing at once are
+    counted one after the other instead of both seeing no earlier visit (or
+    both seeing each other).
+    """
+    doctor_id, patient_id = appointment.doctor_id, appointment.patient_id
+    with transaction.atomic():
+        if not Doctor.objects.select_for_update().filter(pk=doctor_id).exists():
+            return
+        others = (
+            Appointment.objects.filter(doctor_id=doctor_id, patient_id=patient_id, status='completed')
+            .exclude(pk=appointment.pk)
+            .exists()
+            or AppointmentArchive.objects.filter(doctor_id=doctor_id, patient_id=patient_id).exists()
+        )
+        if others:
+            return
+        Doctor.objects.filter(pk=doctor_id).update(
+            nbr_patients=F('nbr_patients') + (1 if completed else -1),
+            updated_at=timezone.now(),
+        )
+    cache.invalidate_doctor(doctor_id)
+
+
+def compute(doctor_ids):
+    """Recompute the aggregates of the given doctors from scratch"""
+    ratings = {
+        row['doctor_id']: row
+        for row in Feedback.objects.filter(doctor_id__in=doctor_ids, rating__isnull=False)
+        .values('doctor_id').annotate(total=Sum('rating'), count=Count('id'))
+    }
+    patients = _patient_counts(doctor_ids)
+    result = {}
+    for doctor_id in doctor_ids:
+        rating = ratings.get(doctor_id, {'total': 0, 'count': 0})
+        result[doctor_id] = {
+            'rating_sum': rating['total'],
+            'rating_count': rating['count'],
+            'grade': rating['total'] / rating['count'] if rating['count'] else 0.0,
+            'nbr_patients': patients.get(doctor_id, 0),
+        }
+    return result
+
+
+def _doctor_batches(batch_size):
+    last = 0
+    while True:
+        batch = list(Doctor.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def rebuild(batch_size=500):
+    """Recompute every doctor's aggregates, one locked batch per transaction"""
+    total = 0
+    for batch in _doctor_batches(batch_size):
+        with transaction.atomic():
+            # Hold the rows so live increments wait instead of being overwritten
+            list(Doctor.objects.select_for_update().filter(pk__in=batch).values_list('pk'))
+            doctors = [Doctor(pk=pk, **values) for pk, values in compute(batch).items()]
+            Doctor.objects.bulk_update(doctors, FIELDS)
+        total += len(batch)
+    cache.invalidate_all()
+    return total
+
+
+def find_inconsistencies(batch_size=500):
+    """Yield (doctor_id, field, stored, expected) for every drifted aggregate"""
+    for batch in _doctor_batches(batch_size):
+        expected = compute(batch)
+        for row in Doctor.objects.filter(pk__in=batch).values('pk', *FIELDS):
+            for field in FIELDS:
+                stored, wanted = row[field], expected[row['pk']][field]
+                if abs(stored - wanted) > 1e-9:
+                    yield row['pk'], field, stored, wanted
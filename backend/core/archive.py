@@ -0,0 +1,72 @@
+"""Moving history out of the hot tables.
+
+Completed appointments and old notifications are copied into archive tables
+with the same columns and removed from `Appointment` / `Notification`, one
+keyset batch per transaction, so queries on upcoming appointments and recent
+notifications only ever scan current rows. Each batch is a single
+INSERT ... SELECT and a single DELETE; no row travels through Python. The
+delete skips signals on purpose: archived rows are moved, not deleted, so
+offline clients keep them (no sync tombstone) and doctor aggregates, which
+count archived appointments too, do not change.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive, Notification, NotificationArchive
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _completed_before(cutoff):
+    return Q(status='completed', end_time__lt=cutoff)
+
+
+def _created_before(cutoff):
+    return Q(date_creation__lt=timezone.localtime(cutoff).date())
+
+
+# name -> (hot model, archive model, rows to archive given a cutoff, default age in days)
+ARCHIVED_MODELS = {
+    'appointments': (Appointment, AppointmentArchive, _completed_before, 180),
+    'notifications': (Notification, NotificationArchive, _created_before, 90),
+}
+
+
+def _copy(model, archive_model, ids):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in archive_model._meta.concrete_fields if field.name != 'archived_at')
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(archive_model._meta.db_table)} ({columns}) '
+            f'SELECT {columns} FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            ids,
+        )
+
+
+def archive(name, older_than=None, batch_size=DEFAULT_BATCH_SIZE, where=None):
+    """Move the rows of `name` that are older than `older_than` into its archive; returns the number moved.
+
+    `where` is an optional Q restricting the rows considered.
+    """
+    model, archive_model, eligible, default_days = ARCHIVED_MODELS[name]
+    cutoff = timezone.now() - (older_than if older_than is not None else timedelta(days=default_days))
+    pending = model.objects.filter(eligible(cutoff)).order_by('pk')
+    if where is not None:
+        pending = pending.filter(where)
+    moved = 0
+    last = 0
+    while True:
+        with transaction.atomic():
+            # Locked so a concurrent update cannot land between the copy and the delete
+            ids = list(pending.filter(pk__gt=last).select_for_update(of=('self',)).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return moved
+            _copy(model, archive_model, ids)
+            doomed = model.objects.filter(pk__in=ids)
+            doomed._raw_delete(doomed.db)
+        moved += len(ids)
+        last = ids[-1]
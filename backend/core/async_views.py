@@ -0,0 +1,78 @@
+"""Async (ASGI) versions of the read-heavy list endpoints.
+
+These views use the async ORM so a slow database or client never pins a worker
+thread. DRF views are synchronous, so pagination is a small keyset scheme of
+its own: `?after=<last id>&page_size=<n>`, answered with `results` and the
+`next` URL.
+"""
+from django.db.models import Count
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET
+
+from .models import User, Doctor, Appointment, Notification
+from .serializers import UserSerializer, DoctorSerializer, DoctorProfileSerializer, AppointmentSerializer, NotificationSerializer
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _positive_int(value, default):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+async def _keyset_page(request, queryset, serializer_class):
+    params = request.GET
+    page_size = min(_positive_int(params.get('page_size'), DEFAULT_PAGE_SIZE) or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    queryset = serializer_class.setup_eager_loading(queryset.filter(pk__gt=_positive_int(params.get('after'), 0)))
+    # Fetch one extra row to learn whether there is a next page
+    rows = [row async for row in queryset.order_by('pk')[:page_size + 1]]
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        query = params.copy()
+        query['after'] = rows[-1].pk
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+    return JsonResponse({'next': next_url, 'results': serializer_class(rows, many=True).data})
+
+
+@require_GET
+async def get_users(request):
+    return await _keyset_page(request, User.objects.all(), UserSerializer)
+
+
+@require_GET
+async def get_doctors(request):
+    queryset = Doctor.objects.all()
+    if request.GET.get('specialty'):
+        queryset = queryset.filter(specialty=request.GET['specialty'])
+    return await _keyset_page(request, queryset, DoctorSerializer)
+
+
+@require_GET
+async def get_doctor(request, pk):
+    queryset = DoctorProfileSerializer.setup_eager_loading(Doctor.objects.annotate(feedback_count=Count('feedback')))
+    try:
+        doctor = await queryset.aget(pk=pk)
+    except Doctor.DoesNotExist:
+        raise Http404
+    return JsonResponse(DoctorProfileSerializer(doctor).data)
+
+
+@require_GET
+async def get_appointments(request):
+    queryset = Appointment.objects.all()
+    for param in ('doctor', 'patient'):
+        if request.GET.get(param):
+            queryset = queryset.filter(**{f'{param}_id': _positive_int(request.GET[param], 0)})
+    return await _keyset_page(request, queryset, AppointmentSerializer)
+
+
+@require_GET
+async def get_notifications(request):
+    queryset = Notification.objects.all()
+    if request.GET.get('user'):
+        queryset = queryset.filter(user_id=_positive_int(request.GET['user'], 0))
+    return await _keyset_page(request, queryset, NotificationSerializer)
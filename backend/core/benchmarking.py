@@ -0,0 +1,32 @@
+import time
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Call `fn` repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'min': samples[0],
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'max': samples[-1],
+    }
+
+
+def format_timings(label, stats):
+    return f"{label:<40} " + '  '.join(f"{key}={value:.2f}ms" for key, value in stats.items())
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .coalescing import coalesce
+
+DIRECTORY_GENERATION_KEY = 'doctors:directory:generation'
+PROFILE_GENERATION_KEY = 'doctors:profile:generation'
+
+
+class CacheStats:
+    """Per-process hit/miss counters, grouped by namespace"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def record(self, namespace, hit):
+        with self._lock:
+            self._counts[namespace]['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                namespace: dict(counts, hit_ratio=counts['hits'] / ((counts['hits'] + counts['misses']) or 1))
+                for namespace, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'DOCTOR_CACHE_ALIAS', 'default')]
+
+
+def _generation(key):
+    return get_cache().get_or_set(key, 1, None)
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def directory_key(url):
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'doctors:directory:{_generation(DIRECTORY_GENERATION_KEY)}:{digest}'
+
+
+def profile_key(doctor_id):
+    return f'doctors:profile:{_generation(PROFILE_GENERATION_KEY)}:{doctor_id}'
+
+
+def get_or_compute(namespace, key, compute):
+    """Return the cached value for `key`, computing and storing it on a miss.
+
+    Concurrent misses of one key share a single computation (core.coalescing).
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    stats.record(namespace, hit=value is not None)
+    if value is None:
+        def compute_and_store():
+            result = compute()
+            cache.set(key, result, getattr(settings, 'DOCTOR_CACHE_TIMEOUT', 300))
+            return result
+        value = coalesce(key, compute_and_store)
+    return value
+
+
+def invalidate_doctor(doctor_id):
+    """Drop one doctor's profile and every directory page once the transaction commits"""
+    def invalidate():
+        get_cache().delete(profile_key(doctor_id))
+        _bump(DIRECTORY_GENERATION_KEY)
+    transaction.on_commit(invalidate)
+
+
+def invalidate_all():
+    """Drop every cached profile and directory page once the transaction commits"""
+    def invalidate():
+        _bump(PROFILE_GENERATION_KEY)
+        _bump(DIRECTORY_GENERATION_KEY)
+    transaction.on_commit(invalidate)
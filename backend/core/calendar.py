@@ -0,0 +1,82 @@
+"""Busy/free calendars for one or many doctors over a time window.
+
+Each table is read with a single range query over all requested doctors,
+served by the (doctor, start_time) indexes, and the intervals are merged in
+Python. Slots generated from recurring availability rules (core.schedule)
+count as free time alongside `Availability` rows.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from . import schedule
+from .models import Appointment, Availability
+
+# Appointments and slots never last longer than this, which bounds the
+# start_time range scan for intervals that began before the window
+MAX_INTERVAL = timedelta(hours=24)
+
+
+def merge_intervals(intervals):
+    """Sort and coalesce overlapping or touching (start, end) pairs"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def subtract_intervals(intervals, removals):
+    """Parts of merged `intervals` not covered by merged `removals`"""
+    result = []
+    index = 0
+    for start, end in intervals:
+        while index < len(removals) and removals[index][1] <= start:
+            index += 1
+        cursor = start
+        scan = index
+        while scan < len(removals) and removals[scan][0] < end:
+            removal_start, removal_end = removals[scan]
+            if removal_start > cursor:
+                result.append((cursor, removal_start))
+            cursor = max(cursor, removal_end)
+            scan += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+
+def clip_intervals(intervals, start, end):
+    return [(max(s, start), min(e, end)) for s, e in intervals if s < end and e > start]
+
+
+def _window(queryset, doctor_field, doctor_ids, start, end):
+    return queryset.filter(**{
+        f'{doctor_field}__in': doctor_ids,
+        'start_time__gte': start - MAX_INTERVAL,
+        'start_time__lt': end,
+        'end_time__gt': start,
+    })
+
+
+def doctor_calendars(doctor_ids, start, end):
+    """{doctor_id: {'busy': [...], 'free': [...]}} with merged (start, end) intervals"""
+    busy = defaultdict(list)
+    open_slots = defaultdict(list)
+    appointments = _window(Appointment.objects.all(), 'doctor', doctor_ids, start, end)
+    for doctor_id, slot_start, slot_end in appointments.values_list('doctor_id', 'start_time', 'end_time'):
+        busy[doctor_id].append((slot_start, slot_end))
+    slots = _window(Availability.objects.all(), 'doctor_id', doctor_ids, start, end)
+    for doctor_id, slot_start, slot_end, booked in slots.values_list('doctor_id', 'start_time', 'end_time', 'booked'):
+        (busy if booked else open_slots)[doctor_id].append((slot_start, slot_end))
+    for doctor_id, intervals in schedule.Schedule(start - MAX_INTERVAL, end, doctor_ids=doctor_ids).free_intervals().items():
+        open_slots[doctor_id].extend(intervals)
+
+    calendars = {}
+    for doctor_id in doctor_ids:
+        doctor_busy = merge_intervals(clip_intervals(busy[doctor_id], start, end))
+        doctor_free = merge_intervals(clip_intervals(open_slots[doctor_id], start, end))
+        calendars[doctor_id] = {'busy': doctor_busy, 'free': subtract_intervals(doctor_free, doctor_busy)}
+    return calendars
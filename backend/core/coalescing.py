@@ -0,0 +1,70 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+When the app reopens on thousands of phones at once, the same directory and
+availability reads arrive together. `coalesce` lets the first caller for a
+key run the read while every caller arriving in the meantime waits for it and
+shares its result (or its exception), so a thundering herd costs one query
+per key and process instead of one per request. Nothing is kept once the call
+returns, so unlike core.cache a shared result is never older than the call
+that produced it.
+"""
+import threading
+
+from django.conf import settings
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """In-flight calls by key, with per-process counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counts = {'calls': 0, 'shared': 0}
+
+    def do(self, key, compute, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._counts['calls' if leader else 'shared'] += 1
+        if not leader:
+            # A stuck leader must not hold every follower; give up and read alone
+            if not call.done.wait(timeout):
+                return compute()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = compute()
+            return call.value
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._calls))
+
+    def reset(self):
+        with self._lock:
+            self._counts = {'calls': 0, 'shared': 0}
+
+
+flights = SingleFlight()
+
+
+def coalesce(key, compute):
+    """compute(), shared with every concurrent caller passing the same key"""
+    return flights.do(key, compute, timeout=getattr(settings, 'COALESCE_TIMEOUT', 10))
@@ -0,0 +1,268 @@
+import random
+from datetime import time, timedelta
+
+from django.utils import timezone
+
+from . import geo
+from .checkin import generate_token
+from .models import User, Clinic, Doctor, Patient, Availability, Appointment, Prescription, PrescriptionItem, Medication, Feedback, Notification, AvailabilityRule
+from .search import refresh_search_text
+from .utils import chunked
+
+SPECIALTIES = [
+    'Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics',
+    'Gynecology', 'Ophthalmology', 'Psychiatry', 'Radiology', 'General Practice',
+]
+
+SYLLABLES = [
+    'am', 'ox', 'ci', 'lin', 'ator', 'va', 'sta', 'tin', 'lo', 'sar', 'met', 'for',
+    'min', 'ome', 'pra', 'zole', 'para', 'ce', 'ta', 'mol', 'ibu', 'pro', 'fen', 'ce',
+    'ti', 'ri', 'zine', 'le', 'vo', 'flox',
+]
+DOSAGES = ['5mg', '10mg', '20mg', '50mg', '100mg', '250mg', '500mg', '1g']
+FREQUENCIES = ['once a day', 'twice a day', 'three times a day', 'every 8 hours', 'as needed']
+
+FIRST_NAMES = [
+    'Amina', 'Yacine', 'Sara', 'Karim', 'Lina', 'Mehdi', 'Nour', 'Walid', 'Ines', 'Rayan',
+    'Meriem', 'Sofiane', 'Imane', 'Adel', 'Yasmine', 'Bilal', 'Houda', 'Nassim', 'Salma', 'Anis',
+]
+LAST_NAMES = [
+    'Benali', 'Haddad', 'Cherif', 'Bouzid', 'Mansouri', 'Khelifi', 'Saidi', 'Amrani', 'Belkacem', 'Rahmani',
+    'Ziani', 'Brahimi', 'Toumi', 'Larbi', 'Meziane', 'Hamdi', 'Djebbar', 'Ouali', 'Boudiaf', 'Kaci',
+]
+FEEDBACK = [
+    ('Very attentive', 'Took the time to explain everything.'),
+    ('On time', 'The appointment started right on schedule.'),
+    ('Long wait', 'Waited a long time before being seen.'),
+    ('Helpful', 'Clear treatment plan and follow-up.'),
+]
+
+
+def full_name(rng=random):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def iter_medication_names(rng=random):
+    """Endless stream of pronounceable, unique-looking drug names"""
+    seen = set()
+    while True:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.15:
+            name += ' ' + rng.choice(['Forte', 'Retard', 'Plus', 'Acid', 'Sodium'])
+        if name not in seen:
+            seen.add(name)
+            yield name
+
+
+def create_medications(count, batch_size=5000, rng=random):
+    """Catalogue medications (no prescription), several dosages per name"""
+    def entries():
+        produced = 0
+        for name in iter_medication_names(rng):
+            for dosage in rng.sample(DOSAGES, 3):
+                if produced == count:
+                    return
+                produced += 1
+                yield Medication(name=name, dosage=dosage)
+
+    total = 0
+    for batch in chunked(entries(), batch_size):
+        Medication.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    return total
+
+
+# (min_lat, max_lat, min_lon, max_lon) of northern Algeria, where generated clinics are placed
+CLINIC_BOUNDS = (34.5, 37.0, -1.5, 8.5)
+
+
+def create_clinics(count, prefix='bench', batch_size=2000, bounds=CLINIC_BOUNDS, rng=random):
+    min_lat, max_lat, min_lon, max_lon = bounds
+    clinics = (
+        Clinic(
+            name=f'{prefix} clinic {i}', address=f'{i} Synthetic Street',
+            latitude=rng.uniform(min_lat, max_lat), longitude=rng.uniform(min_lon, max_lon),
+        )
+        for i in range(count)
+    )
+    created = []
+    for batch in chunked(clinics, batch_size):
+        created.extend(Clinic.objects.bulk_create(batch))
+    # bulk_create skips the signal that resets it
+    geo.invalidate_density()
+    return created
+
+
+def create_doctors(count, clinics, prefix='bench', batch_size=2000, rng=random):
+    users = (
+        User(username=f'{prefix}-doctor-{i}', email=f'{prefix}-doctor-{i}@example.com', name=f'Doctor {i} {full_name(rng)}', role='doctor')
+        for i in range(count)
+    )
+    created = []
+    for batch in chunked(users, batch_size):
+        doctors = [
+            Doctor(user=user, specialty=rng.choice(SPECIALTIES), clinic=rng.choice(clinics) if clinics else None)
+            for user in User.objects.bulk_create(batch)
+        ]
+        doctors = Doctor.objects.bulk_create(doctors)
+        refresh_search_text(Doctor.objects.filter(pk__in=[doctor.pk for doctor in doctors]))
+        created.extend(doctors)
+    return created
+
+
+def iter_slots(doctors, per_doctor, start=None, slot_minutes=30, booked_ratio=0.3, rng=random):
+    """Consecutive working-hour slots (08:00-17:00) for each doctor"""
+    day = (start or timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    slots_per_day = (9 * 60) // slot_minutes
+    length = timedelta(minutes=slot_minutes)
+    for doctor in doctors:
+        for n in range(per_doctor):
+            days, index = divmod(n, slots_per_day)
+            slot_start = day + timedelta(days=days, hours=8) + index * length
+            yield Availability(
+                doctor_id=doctor,
+                start_time=slot_start,
+                end_time=slot_start + length,
+                booked=rng.random() < booked_ratio,
+            )
+
+
+def create_slots(doctors, per_doctor, batch_size=5000, **kwargs):
+    total = 0
+    for batch in chunked(iter_slots(doctors, per_doctor, **kwargs), batch_size):
+        Availability.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def create_patients(count, prefix='bench', batch_size=2000, rng=random):
+    users = (
+        User(username=f'{prefix}-patient-{i}', email=f'{prefix}-patient-{i}@example.com', name=full_name(rng), role='patient')
+        for i in range(count)
+    )
+    created = []
+    for batch in chunked(users, batch_size):
+        created.extend(Patient.objects.bulk_create(Patient(user=user) for user in User.objects.bulk_create(batch)))
+    return created
+
+
+def create_appointments(doctors, patients, batch_size=2000, rng=random):
+    """One appointment per booked slot of `doctors`; past ones are completed"""
+    now = timezone.now()
+    slots = (
+        Availability.objects.filter(doctor_id__in=doctors, booked=True)
+        .order_by('id').values_list('doctor_id', 'start_time', 'end_time')
+    )
+    appointments = (
+        Appointment(
+            doctor_id=doctor_id, patient=rng.choice(patients), start_time=start, end_time=end,
+            status='completed' if end < now else 'confirmed', qr_Code=generate_token(),
+        )
+        for doctor_id, start, end in slots.iterator(chunk_size=batch_size)
+    )
+    total = 0
+    for batch in chunked(appointments, batch_size):
+        Appointment.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def create_prescriptions(doctors, ratio=0.5, items=(1, 4), batch_size=1000, rng=random):
+    """Prescriptions for a share of the doctors' completed appointments, with items from the catalogue"""
+    catalogue = list(Medication.objects.filter(prescription__isnull=True).values_list('id', flat=True)[:5000])
+    if not catalogue:
+        return 0
+    completed = (
+        Appointment.objects.filter(doctor__in=doctors, status='completed')
+        .order_by('id').values_list('patient_id', 'doctor_id', 'start_time')
+    )
+    total = 0
+    for batch in chunked(completed.iterator(chunk_size=batch_size), batch_size):
+        prescriptions = Prescription.objects.bulk_create(
+            Prescription(patient_id=patient_id, doctor_id=doctor_id, date=start.date())
+            for patient_id, doctor_id, start in batch if rng.random() < ratio
+        )
+        PrescriptionItem.objects.bulk_create(
+            PrescriptionItem(prescription=prescription, medication_id=medication_id, frequency=rng.choice(FREQUENCIES))
+            for prescription in prescriptions
+            for medication_id in rng.sample(catalogue, min(len(catalogue), rng.randint(*items)))
+        )
+        total += len(prescriptions)
+    return total
+
+
+def create_feedback(doctors, ratio=0.3, batch_size=2000, rng=random):
+    """Rated feedback for a share of the doctors' completed appointments"""
+    completed = (
+        Appointment.objects.filter(doctor__in=doctors, status='completed')
+        .order_by('id').values_list('patient_id', 'doctor_id', 'end_time')
+    )
+    total = 0
+    for batch in chunked(completed.iterator(chunk_size=batch_size), batch_size):
+        feedback = []
+        for patient_id, doctor_id, end in batch:
+            if rng.random() < ratio:
+                title, description = rng.choice(FEEDBACK)
+                feedback.append(Feedback(
+                    patient_id=patient_id, doctor_id=doctor_id, title=title, description=description,
+                    rating=rng.randint(1, 5), date_creation=end.date(), time_creation=end.time(),
+                ))
+        Feedback.objects.bulk_create(feedback)
+        total += len(feedback)
+    return total
+
+
+def create_appointment_history(doctors, patients, count, days=730, upcoming_days=30, batch_size=5000, rng=random):
+    """`count` hourly appointments spread over the past `days` and the next `upcoming_days`"""
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    first = now - timedelta(days=days)
+    per_doctor = -(-count // len(doctors))
+    step = max(1, (days + upcoming_days) * 24 // per_doctor)
+
+    def appointments():
+        for n in range(count):
+            doctor_index, slot = divmod(n, per_doctor)
+            start = first + timedelta(hours=slot * step)
+            yield Appointment(
+                doctor=doctors[doctor_index], patient=rng.choice(patients),
+                start_time=start, end_time=start + timedelta(minutes=30),
+                status='completed' if start < now else 'confirmed',
+            )
+
+    total = 0
+    for batch in chunked(appointments(), batch_size):
+        Appointment.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def create_notifications(users, count, days=730, batch_size=5000, rng=random):
+    """`count` notifications dated over the past `days`"""
+    now = timezone.localtime()
+
+    def notifications():
+        for n in range(count):
+            created = now - timedelta(seconds=rng.randint(0, days * 86400))
+            yield Notification(
+                user=rng.choice(users), title=f'Notice {n}', description='Synthetic notification body.', type='info',
+                date_creation=created.date(), time_creation=created.time(),
+            )
+
+    total = 0
+    for batch in chunked(notifications(), batch_size):
+        Notification.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def create_weekly_rules(doctors, weekdays=range(5), start=time(8), end=time(17), slot_minutes=30, batch_size=5000):
+    """The same working-hours rule on each of `weekdays` for every doctor"""
+    rules = (
+        AvailabilityRule(doctor=doctor, weekday=weekday, start_time=start, end_time=end, slot_minutes=slot_minutes)
+        for doctor in doctors for weekday in weekdays
+    )
+    total = 0
+    for batch in chunked(rules, batch_size):
+        AvailabilityRule.objects.bulk_create(batch)
+        total += len(batch)
+    return total
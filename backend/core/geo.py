@@ -0,0 +1,120 @@
+"""Proximity search over clinic coordinates.
+
+Candidates come from a bounding box on the indexed (latitude, longitude)
+columns. The first box is sized from the average clinic density so sparse
+datasets do not start with a run of empty boxes, and grows until it holds
+enough clinics; only those candidates are ranked by exact haversine distance.
+"""
+import math
+import re
+import time
+
+from django.db.models import Count, Exists, Max, Min, OuterRef
+
+from .models import Clinic, Doctor
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+INITIAL_RADIUS_KM = 5.0
+MIN_RADIUS_KM = 1.0
+MAX_RADIUS_KM = 500.0
+# Clinic signals reset the density; this bounds staleness after bulk writes
+DENSITY_MAX_AGE = 600
+
+COORDINATES = re.compile(r'(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)')
+
+
+def parse_coordinates(text):
+    """(lat, lon) from "36.75,3.06" or a maps URL containing "@36.75,3.06", else None"""
+    for lat, lon in COORDINATES.findall(text or ''):
+        lat, lon = float(lat), float(lon)
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            return lat, lon
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle; longitudes are clamped, not wrapped"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+    return lat - lat_delta, lat + lat_delta, max(-180.0, lon - lon_delta), min(180.0, lon + lon_delta)
+
+
+# (clinics per km², time.monotonic() when computed), replaced in one assignment
+_density = None
+
+
+def invalidate_density():
+    global _density
+    _density = None
+
+
+def clinic_density():
+    """Located clinics per km² over the area they span; None while no clinic has coordinates"""
+    global _density
+    if _density is not None and time.monotonic() - _density[1] <= DENSITY_MAX_AGE:
+        return _density[0]
+    extent = Clinic.objects.filter(latitude__isnull=False, longitude__isnull=False).aggregate(
+        count=Count('id'), min_lat=Min('latitude'), max_lat=Max('latitude'),
+        min_lon=Min('longitude'), max_lon=Max('longitude'),
+    )
+    if not extent['count']:
+        # Not cached, so the first located clinic is picked up straight away
+        return None
+    middle = math.radians((extent['min_lat'] + extent['max_lat']) / 2)
+    height = (extent['max_lat'] - extent['min_lat']) * KM_PER_DEGREE
+    width = (extent['max_lon'] - extent['min_lon']) * KM_PER_DEGREE * math.cos(middle)
+    density = extent['count'] / (max(height, 1.0) * max(width, 1.0))
+    _density = (density, time.monotonic())
+    return density
+
+
+def initial_radius(limit):
+    """Radius of the circle that holds `limit` clinics at the average density"""
+    density = clinic_density()
+    if density is None:
+        return INITIAL_RADIUS_KM
+    return max(MIN_RADIUS_KM, math.sqrt(limit / (math.pi * density)))
+
+
+def nearest_clinics(lat, lon, limit=10, max_radius_km=MAX_RADIUS_KM, queryset=None):
+    """[(distance_km, clinic id)] of the closest clinics within `max_radius_km`, nearest first"""
+    queryset = Clinic.objects.all() if queryset is None else queryset
+    radius = min(initial_radius(limit), max_radius_km)
+    while True:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+        rows = queryset.filter(
+            latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon),
+        ).values_list('id', 'latitude', 'longitude')
+        # Corners of the box lie beyond `radius`, so only the inscribed circle is certain
+        found = sorted(
+            (distance, pk) for pk, clinic_lat, clinic_lon in rows
+            if (distance := haversine_km(lat, lon, clinic_lat, clinic_lon)) <= radius
+        )
+        if len(found) >= limit or radius >= max_radius_km:
+            return found[:limit]
+        # Grow to the area the density seen so far says holds `limit` clinics
+        factor = max(1.5, 1.2 * math.sqrt(limit / len(found))) if found else 4
+        radius = min(radius * factor, max_radius_km)
+
+
+def nearest_doctors(lat, lon, limit=10, max_radius_km=MAX_RADIUS_KM, specialty=None):
+    """[(distance_km, doctor id)] of doctors practising at the closest clinics"""
+    doctors = Doctor.objects.all()
+    if specialty:
+        doctors = doctors.filter(specialty=specialty)
+    # Only clinics with at least one matching doctor, so `limit` clinics are enough
+    clinics = Clinic.objects.filter(Exists(doctors.filter(clinic=OuterRef('pk'))))
+    distances = {pk: distance for distance, pk in nearest_clinics(lat, lon, limit, max_radius_km, clinics)}
+    found = sorted(
+        (distances[clinic_id], pk)
+        for pk, clinic_id in doctors.filter(clinic_id__in=distances).values_list('id', 'clinic_id')
+    )
+    return found[:limit]
@@ -0,0 +1,198 @@
+"""Per-request database and rendering costs.
+
+`QueryInstrumentationMiddleware` opens a `RequestMetrics` for every request;
+an execute wrapper installed on each database connection adds every query to
+it, and the renderer adds its encoding time. The totals go out as a
+`Server-Timing` header and into per-endpoint histograms (`registry`), shown to
+admins by the performance-stats endpoint. Requests that run the same SQL
+several times are logged as likely N+1 queries.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self.executions = Counter()
+
+    def add_query(self, sql, params, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[sql] += 1
+        self.executions[sql, repr(params)] += 1
+
+    @property
+    def duplicates(self):
+        """Executions of the exact same SQL and parameters beyond the first"""
+        return sum(count - 1 for count in self.executions.values())
+
+    def repeated_statements(self, threshold):
+        """SQL run at least `threshold` times with any parameters, the N+1 signature"""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'dup;desc="{self.duplicates} duplicate queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'app;dur={max(0.0, total - self.db_time - self.render_time) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+@contextmanager
+def timed(attribute):
+    """Add the time spent in the block to an attribute of the current request's metrics"""
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, params, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _bucket(value, bounds):
+    for bound in bounds:
+        if value <= bound:
+            return f'<={bound}'
+    return f'>{bounds[-1]}'
+
+
+class PerformanceRegistry:
+    """Per-process request histograms, grouped by method and URL pattern"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _empty(self):
+        return {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'duplicates': 0, 'n_plus_one': 0,
+            'db_ms': 0.0, 'render_ms': 0.0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'latency_ms': defaultdict(int), 'query_count': defaultdict(int),
+        }
+
+    def record(self, endpoint, metrics, total, suspicious):
+        with self._lock:
+            row = self._endpoints.setdefault(endpoint, self._empty())
+            row['requests'] += 1
+            row['queries'] += metrics.queries
+            row['max_queries'] = max(row['max_queries'], metrics.queries)
+            row['duplicates'] += metrics.duplicates
+            row['n_plus_one'] += bool(suspicious)
+            row['db_ms'] += metrics.db_time * 1000
+            row['render_ms'] += metrics.render_time * 1000
+            row['total_ms'] += total * 1000
+            row['max_ms'] = max(row['max_ms'], total * 1000)
+            row['latency_ms'][_bucket(total * 1000, LATENCY_BUCKETS_MS)] += 1
+            row['query_count'][_bucket(metrics.queries, QUERY_BUCKETS)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            report = {}
+            for endpoint, row in self._endpoints.items():
+                requests = row['requests']
+                report[endpoint] = {
+                    'requests': requests,
+                    'avg_queries': row['queries'] / requests,
+                    'max_queries': row['max_queries'],
+                    'duplicate_queries': row['duplicates'],
+                    'n_plus_one_requests': row['n_plus_one'],
+                    'avg_db_ms': row['db_ms'] / requests,
+                    'avg_render_ms': row['render_ms'] / requests,
+                    'avg_ms': row['total_ms'] / requests,
+                    'max_ms': row['max_ms'],
+                    'latency_ms': dict(row['latency_ms']),
+                    'query_count': dict(row['query_count']),
+                }
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = PerformanceRegistry()
+
+
+class QueryInstrumentationMiddleware:
+    """Measure every request; add Server-Timing and feed the per-endpoint histograms"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current.set(RequestMetrics())
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        token = _current.set(RequestMetrics())
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            _current.reset(token)
+
+    def finish(self, request, response):
+        metrics = _current.get()
+        total = time.perf_counter() - metrics.started
+        threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 5)
+        suspicious = metrics.repeated_statements(threshold)
+        for sql, count in suspicious:
+            logger.warning('Possible N+1 on %s %s: %d runs of %s', request.method, request.path, count, sql[:200])
+        match = getattr(request, 'resolver_match', None)
+        endpoint = f'{request.method} {match.route if match else "<unresolved>"}'
+        registry.record(endpoint, metrics, total, suspicious)
+        if getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG):
+            response['Server-Timing'] = metrics.server_timing(total)
+        return response
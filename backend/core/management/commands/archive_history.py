@@ -0,0 +1,23 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVED_MODELS, DEFAULT_BATCH_SIZE, archive
+
+
+class Command(BaseCommand):
+    help = 'Move completed appointments and old notifications into their archive tables in batches'
+
+    def add_arguments(self, parser):
+        for name, (_, _, _, days) in ARCHIVED_MODELS.items():
+            parser.add_argument(f'--{name}-days', type=int, default=days, help=f'Archive {name} older than this many days')
+        parser.add_argument('--only', nargs='*', choices=ARCHIVED_MODELS, help='Archive only these tables')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for name in options['only'] or ARCHIVED_MODELS:
+            started = time.perf_counter()
+            moved = archive(name, timedelta(days=options[f'{name}_days']), batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Archived {moved} {name} in {elapsed:.2f}s ({moved / elapsed if elapsed else 0:.0f} rows/s)')
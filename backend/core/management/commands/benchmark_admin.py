@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.benchmarking import measure, format_timings
+from core.models import Appointment, Availability, Notification, Prescription
+
+MODELS = [Appointment, Availability, Notification, Prescription]
+# What a bare ModelAdmin would do
+DEFAULTS = {
+    'paginator': Paginator, 'show_full_result_count': True, 'list_select_related': False,
+    'autocomplete_fields': (), 'raw_id_fields': (),
+}
+
+
+class Command(BaseCommand):
+    help = 'Time admin change lists and add forms of the large tables, as configured and with default ModelAdmin settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page', type=int, default=1, help='Change list page to load')
+
+    def run(self, label, url, params, repeat):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+        stats = measure(lambda: self.client.get(url, params), repeat=repeat)
+        self.stdout.write(format_timings(f'{label} ({len(queries)} queries)', stats))
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(username='benchmark-admin', defaults={'is_staff': True, 'is_superuser': True})
+        self.client = Client()
+        self.client.force_login(user)
+        params = {'p': options['page']} if options['page'] > 1 else {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], SERVER_TIMING_HEADER=False):
+            for model in MODELS:
+                name = model._meta.model_name
+                self.stdout.write(f'{name}: {model.objects.count()} rows')
+                for view, view_params in (('changelist', params), ('add', {})):
+                    url = reverse(f'admin:core_{name}_{view}')
+                    self.run(f'  {view}, optimized', url, view_params, options['repeat'])
+                    with mock.patch.multiple(type(admin.site._registry[model]), **DEFAULTS):
+                        self.run(f'  {view}, default', url, view_params, options['repeat'])
@@ -0,0 +1,84 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from core.archive import archive
+from core.benchmarking import measure, format_timings
+from core.datagen import create_appointment_history, create_clinics, create_doctors, create_notifications, create_patients
+from core.models import Appointment, Notification
+
+
+class Command(BaseCommand):
+    help = (
+        'Time upcoming-appointment and recent-notification queries over years of history, '
+        'then archive the generated history and time them again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--patients', type=int, default=20_000)
+        parser.add_argument('--appointments', type=int, default=2_000_000)
+        parser.add_argument('--notifications', type=int, default=2_000_000)
+        parser.add_argument('--days', type=int, default=730, help='Days of history to generate')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def populate(self, options, rng):
+        prefix = f'archive-{int(time.time())}'
+        started = time.perf_counter()
+        doctors = create_doctors(options['doctors'], create_clinics(10, prefix=prefix, rng=rng), prefix=prefix, rng=rng)
+        patients = create_patients(options['patients'], prefix=prefix, rng=rng)
+        create_appointment_history(doctors, patients, options['appointments'], days=options['days'], rng=rng)
+        create_notifications([patient.user for patient in patients], options['notifications'], days=options['days'], rng=rng)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Generated the history in {time.perf_counter() - started:.1f}s')
+        return prefix, [patient.pk for patient in patients], [patient.user_id for patient in patients]
+
+    def run_queries(self, label, patient_ids, user_ids, rng, repeat):
+        now = timezone.now()
+        week_ago = (timezone.localtime(now) - timedelta(days=7)).date()
+        queries = {
+            'upcoming for a patient': lambda: list(
+                Appointment.objects.filter(patient_id=rng.choice(patient_ids), start_time__gte=now).order_by('start_time')[:20]
+            ),
+            'upcoming count': lambda: Appointment.objects.filter(start_time__gte=now, status='confirmed').count(),
+            'recent notifications for a user': lambda: list(
+                Notification.objects.filter(user_id=rng.choice(user_ids), date_creation__gte=week_ago).order_by('-id')[:20]
+            ),
+            'notifications this week': lambda: Notification.objects.filter(date_creation__gte=week_ago).count(),
+        }
+        self.stdout.write(
+            f'{label}: {Appointment.objects.count()} appointments, {Notification.objects.count()} notifications in the hot tables'
+        )
+        results = {}
+        for name, query in queries.items():
+            results[name] = measure(query, repeat=repeat)
+            self.stdout.write(format_timings(f'  {name}', results[name]))
+        return results
+
+    def handle(self, *args, **options):
+        rng = random.Random(20)
+        prefix, patient_ids, user_ids = self.populate(options, rng)
+        before = self.run_queries('Before archiving', patient_ids, user_ids, rng, options['repeat'])
+
+        # Only the rows generated above; real history stays where it is
+        generated = {
+            'appointments': Q(patient__user__username__startswith=f'{prefix}-'),
+            'notifications': Q(user__username__startswith=f'{prefix}-'),
+        }
+        for name, where in generated.items():
+            started = time.perf_counter()
+            moved = archive(name, batch_size=5000, where=where)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Archived {moved} {name} in {elapsed:.1f}s ({moved / elapsed if elapsed else 0:.0f} rows/s)')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        after = self.run_queries('After archiving', patient_ids, user_ids, rng, options['repeat'])
+        for name in before:
+            self.stdout.write(f"{name:<40} p50 {before[name]['p50']:.2f}ms -> {after[name]['p50']:.2f}ms")
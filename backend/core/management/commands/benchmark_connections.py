@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.benchmarking import measure, format_timings
+from core.models import User
+
+STARTUP_SNIPPET = 'import django; django.setup()'
+
+
+class Command(BaseCommand):
+    help = 'Time process startup and per-request database cost with and without persistent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--startups', type=int, default=5)
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'))
+        stats = measure(
+            lambda: subprocess.run([sys.executable, '-c', STARTUP_SNIPPET], env=env, check=True, cwd=settings.BASE_DIR),
+            repeat=options['startups'], warmup=1,
+        )
+        self.stdout.write(format_timings('django.setup() in a fresh process', stats))
+
+        def request():
+            # What Django does around every request: drop obsolete connections, query, drop again
+            close_old_connections()
+            list(User.objects.order_by('id')[:1])
+            close_old_connections()
+
+        configured = connection.settings_dict['CONN_MAX_AGE']
+        if 'pool' in connection.settings_dict.get('OPTIONS', {}):
+            # The pool owns the connections, CONN_MAX_AGE stays 0
+            modes = [('psycopg connection pool', 0)]
+        else:
+            persistent = configured or 600
+            modes = [('connect per request (CONN_MAX_AGE=0)', 0), (f'persistent (CONN_MAX_AGE={persistent})', persistent)]
+        for label, max_age in modes:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            self.stdout.write(format_timings(label, measure(request, repeat=options['requests'])))
+        connection.settings_dict['CONN_MAX_AGE'] = configured
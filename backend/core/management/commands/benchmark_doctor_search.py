@@ -0,0 +1,47 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.benchmarking import measure, format_timings
+from core.datagen import SPECIALTIES, create_clinics, create_doctors
+from core.models import Doctor
+from core.search import search_doctors
+
+
+class Command(BaseCommand):
+    help = 'Generate doctors and time ranked full-text searches over them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100_000)
+        parser.add_argument('--clinics', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the doctors already in the database')
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+        if not options['skip_generate']:
+            prefix = f'search-{int(time.time())}'
+            started = time.perf_counter()
+            clinics = create_clinics(options['clinics'], prefix=prefix)
+            create_doctors(options['doctors'], clinics, prefix=prefix, rng=rng)
+            self.stdout.write(f'Generated {options["doctors"]} doctors in {time.perf_counter() - started:.1f}s')
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        total = Doctor.objects.count()
+        if not total:
+            self.stderr.write('There are no doctors, run without --skip-generate')
+            return
+
+        queries = {
+            'specialty': lambda: rng.choice(SPECIALTIES),
+            'specialty prefix': lambda: rng.choice(SPECIALTIES)[:5],
+            'name': lambda: f'doctor {rng.randrange(options["doctors"])}',
+            'specialty + clinic': lambda: f'{rng.choice(SPECIALTIES)} clinic {rng.randrange(options["clinics"])}',
+        }
+        self.stdout.write(f'Backend: {connection.vendor}, {total} doctors')
+        for label, make_query in queries.items():
+            stats = measure(lambda: search_doctors(make_query(), options['limit']), repeat=options['repeat'])
+            self.stdout.write(format_timings(label, stats))
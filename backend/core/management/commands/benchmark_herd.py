@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import coalescing
+from core.cache import get_cache
+from core.models import Doctor
+
+
+def uncoalesced(key, compute):
+    return compute()
+
+
+class Command(BaseCommand):
+    help = 'Fire a burst of identical concurrent reads at the hot endpoints, with and without request coalescing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def herd(self, url, clients):
+        """(seconds, queries) for `clients` threads requesting `url` at the same moment"""
+        barrier = threading.Barrier(clients)
+        lock = threading.Lock()
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            with lock:
+                queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def fetch(_):
+            try:
+                barrier.wait()
+                with connection.execute_wrapper(count):
+                    return Client().get(url).status_code
+            finally:
+                connection.close()
+
+        # Every round starts cold, as after a deploy or invalidation
+        get_cache().clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            statuses = set(pool.map(fetch, range(clients)))
+        if statuses != {200}:
+            self.stderr.write(f'{url}: unexpected statuses {statuses}')
+        return time.perf_counter() - started, queries[0]
+
+    def handle(self, *args, **options):
+        doctor = Doctor.objects.filter(availabilities__start_time__gte=timezone.now()).order_by('id').first()
+        if doctor is None:
+            self.stderr.write('No doctor with future slots, run generate_data first')
+            return
+        window = {'start': timezone.now().isoformat(), 'end': (timezone.now() + timedelta(days=7)).isoformat()}
+        urls = {
+            'doctor directory': f"{reverse('get_doctors')}?specialty={doctor.specialty}",
+            'doctor availability': f"{reverse('search_slots')}?doctor={doctor.pk}",
+            'slot search': f"{reverse('search_slots')}?{urlencode(window)}",
+        }
+        clients = options['clients']
+        # The herd comes from one address and would otherwise be throttled
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with override_settings(ALLOWED_HOSTS=['testserver'], SERVER_TIMING_HEADER=False, REST_FRAMEWORK=rest_framework):
+            for name, url in urls.items():
+                for label, read in (('coalesced', coalescing.coalesce), ('uncoalesced', uncoalesced)):
+                    with mock.patch('core.mixins.coalesce', read), mock.patch('core.cache.coalesce', read):
+                        rounds = [self.herd(url, clients) for _ in range(options['rounds'])]
+                    seconds = sorted(elapsed for elapsed, _ in rounds)[len(rounds) // 2]
+                    queries = sum(count for _, count in rounds) / len(rounds)
+                    self.stdout.write(f'{name}, {label}: {clients} clients, {queries:.0f} queries, {seconds * 1000:.1f}ms median burst')
@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.benchmarking import measure, format_timings
+from core.datagen import create_medications
+from core.medications import medication_index, search_medications
+from core.models import Medication
+
+
+class Command(BaseCommand):
+    help = 'Fill the medication catalogue and time typeahead queries against it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the catalogue already in the database')
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        if not options['skip_generate']:
+            total = create_medications(options['entries'], rng=rng)
+            self.stdout.write(f'Generated {total} catalogue medications')
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        names = list(Medication.objects.filter(prescription__isnull=True).values_list('name', flat=True)[:1000])
+        if not names:
+            self.stderr.write('The medication catalogue is empty, run without --skip-generate')
+            return
+
+        if connection.vendor != 'postgresql':
+            medication_index.invalidate()
+            started = time.perf_counter()
+            medication_index.search('a')
+            self.stdout.write(f'Built the in-process index in {(time.perf_counter() - started) * 1000:.0f}ms')
+
+        def typo(name):
+            position = rng.randrange(1, len(name))
+            return name[:position] + name[position + 1:]
+
+        queries = {
+            'prefix (3 letters)': lambda: rng.choice(names)[:3],
+            'prefix (6 letters)': lambda: rng.choice(names)[:6],
+            'fuzzy (one letter dropped)': lambda: typo(rng.choice(names)),
+        }
+        limit = options['limit']
+        self.stdout.write(f'Backend: {connection.vendor}')
+        for label, make_query in queries.items():
+            stats = measure(lambda: search_medications(make_query(), limit), repeat=options['repeat'])
+            self.stdout.write(format_timings(label, stats))
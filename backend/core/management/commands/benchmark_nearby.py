@@ -0,0 +1,47 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmarking import measure, format_timings
+from core.datagen import CLINIC_BOUNDS, create_clinics
+from core.geo import haversine_km, nearest_clinics
+from core.models import Clinic
+
+
+class Command(BaseCommand):
+    help = 'Generate clinics and time k-nearest lookups against a full scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clinics', type=int, default=50_000)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the clinics already in the database')
+
+    def handle(self, *args, **options):
+        rng = random.Random(5)
+        if not options['skip_generate']:
+            create_clinics(options['clinics'], prefix=f'geo-{int(time.time())}', rng=rng)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        located = Clinic.objects.filter(latitude__isnull=False)
+        self.stdout.write(f'Backend: {connection.vendor}, {located.count()} clinics with coordinates')
+        min_lat, max_lat, min_lon, max_lon = CLINIC_BOUNDS
+        k = options['k']
+
+        def point():
+            return rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+
+        def full_scan():
+            lat, lon = point()
+            rows = located.values_list('id', 'latitude', 'longitude')
+            return sorted((haversine_km(lat, lon, a, b), pk) for pk, a, b in rows)[:k]
+
+        for _ in range(20):
+            lat, lon = point()
+            expected = sorted((haversine_km(lat, lon, a, b), pk) for pk, a, b in located.values_list('id', 'latitude', 'longitude'))[:k]
+            if nearest_clinics(lat, lon, k) != expected:
+                raise CommandError(f'Bounding-box search disagrees with the full scan at ({lat}, {lon})')
+        self.stdout.write(format_timings(f'{k}-nearest, bounding box', measure(lambda: nearest_clinics(*point(), k), repeat=options['repeat'])))
+        self.stdout.write(format_timings(f'{k}-nearest, full scan', measure(full_scan, repeat=max(5, options['repeat'] // 20))))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.benchmarking import measure, format_timings
+from core.datagen import create_clinics, create_doctors
+from core.models import Medication, Patient, Prescription, PrescriptionItem, User
+from core.services import create_prescription
+
+
+def create_per_item(patient, doctor, date, items):
+    """The naive path: one catalogue lookup or INSERT per medication and one INSERT per item"""
+    with transaction.atomic():
+        prescription = Prescription.objects.create(patient=patient, doctor=doctor, date=date)
+        for item in items:
+            medication, _ = Medication.objects.get_or_create(name=item['name'], dosage=item['dosage'], prescription=None)
+            PrescriptionItem.objects.create(
+                prescription=prescription, medication=medication,
+                frequency=item['frequency'], instructions=item.get('instructions'),
+            )
+    return prescription
+
+
+class Command(BaseCommand):
+    help = 'Compare batched prescription creation against per-item creation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        prefix = f'rx-bench-{int(time.time())}'
+        doctor = create_doctors(1, create_clinics(1, prefix=prefix), prefix=prefix)[0]
+        user = User.objects.create(username=f'{prefix}-patient', email=f'{prefix}-patient@example.com', role='patient')
+        patient = Patient.objects.create(user=user)
+        items = [
+            {'name': f'Drug {i}', 'dosage': f'{(i + 1) * 10}mg', 'frequency': 'twice a day'}
+            for i in range(options['items'])
+        ]
+        today = timezone.now().date()
+        for label, create in (('per-item', create_per_item), ('bulk', create_prescription)):
+            with CaptureQueriesContext(connection) as context:
+                create(patient, doctor, today, items)
+            stats = measure(lambda: create(patient, doctor, today, items), repeat=options['repeat'])
+            self.stdout.write(format_timings(f'{label} ({len(context.captured_queries)} queries)', stats))
@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarking import measure, format_timings
+from core.datagen import SPECIALTIES, create_clinics, create_doctors, create_patients, create_weekly_rules
+from core.models import Appointment, Availability, AvailabilityRule
+from core.schedule import Schedule, open_slots
+from core.services import search_slots
+from core.utils import chunked
+
+
+def table_bytes(model):
+    """On-disk size of a table and its indexes, where the backend can tell"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+            except Exception:
+                return None
+            return cursor.fetchone()[0]
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Compare recurring availability rules against materialized Availability rows: storage and slot query latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=1000)
+        parser.add_argument('--weeks', type=int, default=8, help='Weeks of materialized slots')
+        parser.add_argument('--booked-ratio', type=float, default=0.3)
+        parser.add_argument('--repeat', type=int, default=100)
+
+    def populate(self, options, rng):
+        """Weekday rules for every doctor, the same slots as Availability rows, and bookings for both"""
+        prefix = f'schedule-{int(time.time())}'
+        clinic = create_clinics(1, prefix=prefix, rng=rng)[0]
+        doctors = create_doctors(options['doctors'], [clinic], prefix=prefix, rng=rng)
+        patients = create_patients(max(1, options['doctors'] * 10), prefix=prefix, rng=rng)
+        create_weekly_rules(doctors)
+        start = timezone.now()
+        schedule = Schedule(start, start + timedelta(weeks=options['weeks']), clinic=clinic.pk)
+
+        def rows():
+            for doctor_id, intervals in schedule.free_intervals().items():
+                for slot_start, slot_end in intervals:
+                    booked = rng.random() < options['booked_ratio']
+                    appointment = Appointment(
+                        doctor_id=doctor_id, patient=rng.choice(patients), start_time=slot_start, end_time=slot_end, status='confirmed',
+                    ) if booked else None
+                    yield Availability(doctor_id_id=doctor_id, start_time=slot_start, end_time=slot_end, booked=booked), appointment
+
+        for batch in chunked(rows(), 5000):
+            Availability.objects.bulk_create([slot for slot, _ in batch])
+            Appointment.objects.bulk_create([appointment for _, appointment in batch if appointment])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return clinic, [doctor.pk for doctor in doctors]
+
+    def handle(self, *args, **options):
+        rng = random.Random(21)
+        clinic, doctor_ids = self.populate(options, rng)
+        slots = Availability.objects.filter(doctor_id__clinic=clinic)
+        rules = AvailabilityRule.objects.filter(doctor__clinic=clinic)
+        self.stdout.write(f'Materialized: {slots.count()} rows, {table_bytes(Availability) or "unknown"} bytes for the whole table')
+        self.stdout.write(f'Rules:        {rules.count()} rows, {table_bytes(AvailabilityRule) or "unknown"} bytes for the whole table')
+
+        now = timezone.now()
+        week = now + timedelta(days=7)
+        specialty = rng.choice(SPECIALTIES)
+
+        def materialized_page():
+            return [s.start_time for s in search_slots(specialty=specialty, clinic=clinic.pk, start=now, end=week)[:20]]
+
+        def generated_page():
+            return [start for start, _, _ in islice(open_slots(now, week, specialty=specialty, clinic=clinic.pk), 20)]
+
+        def materialized_next(doctor_id):
+            return [(s.start_time, s.end_time) for s in search_slots(doctor=doctor_id, start=now)[:1]]
+
+        def generated_next(doctor_id):
+            return [(start, end) for start, _, end in islice(open_slots(now, now + timedelta(weeks=options['weeks']), doctor=doctor_id), 1)]
+
+        if materialized_page() != generated_page():
+            raise CommandError('The generated first page differs from the materialized one')
+        for doctor_id in rng.sample(doctor_ids, min(20, len(doctor_ids))):
+            if materialized_next(doctor_id) != generated_next(doctor_id):
+                raise CommandError(f'Next open slot of doctor {doctor_id} differs')
+
+        repeat = options['repeat']
+        self.stdout.write(format_timings('first page by specialty, rows', measure(materialized_page, repeat=repeat)))
+        self.stdout.write(format_timings('first page by specialty, rules', measure(generated_page, repeat=repeat)))
+        self.stdout.write(format_timings('next open slot, rows', measure(lambda: materialized_next(rng.choice(doctor_ids)), repeat=repeat)))
+        self.stdout.write(format_timings('next open slot, rules', measure(lambda: generated_next(rng.choice(doctor_ids)), repeat=repeat)))
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from core.benchmarking import measure, format_timings
+from core.models import Availability, Clinic, Doctor, User
+from core.renderers import ORJSONRenderer, orjson
+from core.serializers import AvailabilitySerializer
+
+
+def build_slots(count, doctors=50):
+    """Unsaved slots with their doctor, user and clinic attached, so no query is timed"""
+    clinic = Clinic(id=1, name='Benchmark clinic', address='1 Synthetic Street', created_at=timezone.now(), updated_at=timezone.now())
+    doctor_rows = [
+        Doctor(
+            id=i, specialty='Cardiology', clinic=clinic, created_at=timezone.now(), updated_at=timezone.now(),
+            user=User(id=i, username=f'doctor-{i}', email=f'doctor-{i}@example.com', name=f'Doctor {i}', role='doctor', created_at=timezone.now(), updated_at=timezone.now()),
+        )
+        for i in range(1, doctors + 1)
+    ]
+    start = timezone.now()
+    return [
+        Availability(
+            id=i, doctor_id=doctor_rows[i % doctors], booked=False,
+            start_time=start + timedelta(minutes=30 * i), end_time=start + timedelta(minutes=30 * (i + 1)),
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Time serializing and rendering availability rows in full, compact and orjson modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        slots = build_slots(options['rows'])
+        factory = RequestFactory()
+        modes = [('full', {}), ('compact', {'expand': ''}), ('compact + fields', {'fields': 'id,start_time,booked'})]
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', ORJSONRenderer()))
+        else:
+            self.stdout.write('orjson is not installed, skipping its renderer')
+        for mode, params in modes:
+            context = {'request': Request(factory.get('/', params))}
+            data = AvailabilitySerializer(slots, many=True, context=context).data
+            stats = measure(lambda: AvailabilitySerializer(slots, many=True, context=context).data, repeat=options['repeat'], warmup=1)
+            self.stdout.write(format_timings(f'serialize {mode}', stats))
+            for name, renderer in renderers:
+                size = len(renderer.render(data))
+                stats = measure(lambda: renderer.render(data), repeat=options['repeat'], warmup=1)
+                self.stdout.write(format_timings(f'render {mode} with {name} ({size / 1024:.0f} KiB)', stats))
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarking import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput and tail latency of a running WSGI and ASGI deployment under many '
+        'concurrent slow clients, e.g. `gunicorn backend.wsgi -w 4 -b :8000` against '
+        '`uvicorn backend.asgi:application --workers 4 --port 8001`'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000/api/get-doctors/')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001/api/async/get-doctors/')
+        parser.add_argument('--clients', type=int, default=200, help='Concurrent connections')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--read-delay', type=float, default=0.01, help='Seconds a client waits between 1KB reads')
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError('benchmark_servers needs httpx (pip install httpx)')
+        for label in ('wsgi', 'asgi'):
+            url = options[f'{label}_url']
+            latencies, errors, elapsed = asyncio.run(
+                self.load(url, options['clients'], options['requests'], options['read_delay'])
+            )
+            latencies.sort()
+            self.stdout.write(
+                f'{label}: {len(latencies) / elapsed:.1f} req/s, p50={percentile(latencies, 50):.1f}ms '
+                f'p99={percentile(latencies, 99):.1f}ms, {errors} errors ({url})'
+            )
+
+    async def load(self, url, clients, requests, read_delay):
+        import httpx
+
+        latencies = []
+        errors = 0
+        remaining = iter(range(requests))
+
+        async def client_loop(client):
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    async with client.stream('GET', url) as response:
+                        response.raise_for_status()
+                        async for _ in response.aiter_bytes(1024):
+                            if read_delay:
+                                await asyncio.sleep(read_delay)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+            elapsed = time.perf_counter() - started
+        return latencies, errors, elapsed
@@ -0,0 +1,49 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarking import measure, format_timings
+from core.datagen import SPECIALTIES, create_clinics, create_doctors, create_slots
+from core.models import Doctor
+from core.services import search_slots
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic availability dataset and time the slot search queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=1_000_000)
+        parser.add_argument('--doctors', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the rows already in the database')
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of every query')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        if not options['skip_generate']:
+            clinics = create_clinics(max(1, options['doctors'] // 10))
+            doctors = create_doctors(options['doctors'], clinics, rng=rng)
+            total = create_slots(doctors, options['slots'] // len(doctors), rng=rng)
+            self.stdout.write(f'Generated {total} slots for {len(doctors)} doctors')
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        sample = Doctor.objects.order_by('?').values('id', 'clinic_id').first()
+        if sample is None:
+            self.stderr.write('No doctors in the database, run without --skip-generate')
+            return
+        now = timezone.now()
+        week = now + timedelta(days=7)
+        queries = {
+            'specialty, next 7 days': lambda: search_slots(specialty=rng.choice(SPECIALTIES), start=now, end=week),
+            'clinic, next 7 days': lambda: search_slots(clinic=sample['clinic_id'], start=now, end=week),
+            'next free slot for a doctor': lambda: search_slots(doctor=sample['id'], start=now),
+        }
+        for label, build in queries.items():
+            if options['explain']:
+                self.stdout.write(build()[:20].explain())
+            stats = measure(lambda: list(build()[:20]), repeat=options['repeat'])
+            self.stdout.write(format_timings(label, stats))
@@ -0,0 +1,143 @@
+import json
+import platform
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarking import measure, format_timings
+from core.models import Appointment, Availability, Clinic, Doctor, Patient
+
+# Timings below this many milliseconds over the baseline are treated as noise
+NOISE_FLOOR_MS = 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the main list, detail, search and booking endpoints against the current database '
+        '(fill it with generate_data first; DATABASE_URL selects SQLite or PostgreSQL) '
+        'and compare with, or save, a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--baseline', help='Baseline file, benchmarks/baseline-<vendor>.json by default')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50 slowdown before failing')
+        parser.add_argument('--only', nargs='*', help='Run only these scenarios')
+
+    def scenarios(self):
+        """name -> (request callable, expected status)"""
+        client = self.client
+        doctor = Doctor.objects.filter(availabilities__booked=False, availabilities__start_time__gte=timezone.now()).order_by('id').first()
+        patient = Patient.objects.order_by('id').first()
+        clinic = Clinic.objects.filter(latitude__isnull=False).order_by('id').first()
+        if doctor is None or patient is None or clinic is None:
+            raise CommandError('The database has no suitable data, run generate_data first')
+        now = timezone.now()
+        window = {'start': now.isoformat(), 'end': (now + timedelta(days=7)).isoformat()}
+        initial = client.get(reverse('sync'), {'user': patient.user_id}).json()
+        watermarks = {name: changes['watermark'] or '' for name, changes in initial['changes'].items()}
+        # Every booking consumes a slot: the check, the warmup and the timed runs
+        needed = self.repeat + 3
+        open_slots = list(
+            Availability.objects.filter(booked=False, start_time__gte=now)
+            .order_by('start_time', 'id').values_list('id', flat=True)[:needed]
+        )
+        if len(open_slots) < needed:
+            raise CommandError(f'Booking needs {needed} open future slots, run generate_data again')
+        open_slots = iter(open_slots)
+        appointment_doctor = Appointment.objects.order_by('id').values_list('doctor_id', flat=True).first()
+
+        def get(name, params=None, *args):
+            return lambda: client.get(reverse(name, args=args), params or {})
+
+        def book():
+            return client.post(
+                reverse('book_appointment'), {'slot': next(open_slots), 'patient': patient.pk}, content_type='application/json',
+            )
+
+        return {
+            'users list': (get('get_users'), 200),
+            'doctor directory (cached)': (get('get_doctors', {'specialty': doctor.specialty}), 200),
+            'doctor profile (cached)': (get('get_doctor', None, doctor.pk), 200),
+            'appointments list': (get('get_appointments'), 200),
+            'appointments list (compact)': (get('get_appointments', {'expand': ''}), 200),
+            'availabilities list': (get('get_availabilities'), 200),
+            'prescriptions list': (get('get_prescriptions'), 200),
+            'feedback list': (get('get_feedback'), 200),
+            'slot search': (get('search_slots', {'specialty': doctor.specialty, **window}), 200),
+            'doctor calendar': (get('doctor_calendar', {'doctor': appointment_doctor, **window}), 200),
+            'doctor search': (get('search_doctors', {'q': doctor.specialty[:5]}), 200),
+            'nearby doctors': (get('nearby_doctors', {'lat': clinic.latitude, 'lon': clinic.longitude}), 200),
+            'sync delta': (get('sync', {'user': patient.user_id, 'deleted': initial['deleted_watermark'], **watermarks}), 200),
+            'book appointment': (book, 201),
+        }
+
+    def run(self, name, request, expected, repeat):
+        # With DEBUG on the bounded query log fills up and would hide new queries
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        if response.status_code != expected:
+            raise CommandError(f'{name}: expected HTTP {expected}, got {response.status_code}')
+        stats = measure(request, repeat=repeat)
+        self.stdout.write(format_timings(f'{name} ({len(queries)} queries)', stats))
+        return {'queries': len(queries), **{key: round(value, 3) for key, value in stats.items()}}
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, result in results.items():
+            previous = baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{name}: {result['queries']} queries, baseline {previous['queries']}")
+            slower = result['p50'] - previous['p50']
+            if slower > NOISE_FLOOR_MS and result['p50'] > previous['p50'] * (1 + tolerance):
+                regressions.append(f"{name}: p50 {result['p50']:.2f}ms, baseline {previous['p50']:.2f}ms")
+        return regressions
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        path = Path(options['baseline'] or Path(settings.BASE_DIR) / 'benchmarks' / f'baseline-{vendor}.json')
+        self.client = Client()
+        self.repeat = options['repeat']
+        results = {}
+        # One client repeating requests would soon be throttled
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with override_settings(ALLOWED_HOSTS=['testserver'], SERVER_TIMING_HEADER=False, REST_FRAMEWORK=rest_framework):
+            for name, (request, expected) in self.scenarios().items():
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = self.run(name, request, expected, self.repeat)
+
+        report = {
+            'vendor': vendor,
+            'python': platform.python_version(),
+            'dataset': {
+                'doctors': Doctor.objects.count(),
+                'patients': Patient.objects.count(),
+                'appointments': Appointment.objects.count(),
+                'availabilities': Availability.objects.count(),
+            },
+            'scenarios': results,
+        }
+        if options['save']:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f'Saved the baseline to {path}')
+            return
+        if not path.exists():
+            self.stdout.write(f'No baseline at {path}; rerun with --save to create one')
+            return
+        regressions = self.compare(results, json.loads(path.read_text()), options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path}'))
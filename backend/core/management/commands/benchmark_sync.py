@@ -0,0 +1,114 @@
+import json
+import random
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from core import views
+from core.benchmarking import measure, format_timings
+from core.datagen import create_clinics, create_doctors
+from core.models import Appointment, Notification, Patient, User
+from core.notifications import build_notification
+from core.utils import chunked
+
+FULL_REFRESH = [
+    views.DoctorListView, views.AppointmentListView, views.NotificationListView,
+    views.FeedbackListView, views.PrescriptionListView,
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes transferred and latency of a full refresh against an offline sync delta'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--notifications', type=int, default=5000)
+        parser.add_argument('--changed', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def get(self, view_class, params):
+        return view_class.as_view()(self.factory.get('/', params)).render().content
+
+    def full_refresh(self):
+        """Every list endpoint, page by page, the way clients refresh today"""
+        size = 0
+        for view_class in FULL_REFRESH:
+            params = {'page_size': 500}
+            while params:
+                content = self.get(view_class, params)
+                size += len(content)
+                next_url = json.loads(content)['next']
+                params = dict(parse_qsl(urlsplit(next_url).query)) if next_url else None
+        return size
+
+    def sync(self, watermarks):
+        """Follow the sync endpoint until nothing is pending; returns bytes, rows and new watermarks"""
+        size = rows = 0
+        params = dict(watermarks, limit=5000)
+        while True:
+            content = self.get(views.SyncView, params)
+            size += len(content)
+            body = json.loads(content)
+            rows += sum(len(ids) for ids in body['deleted'].values()) + sum(len(changes['rows']) for changes in body['changes'].values())
+            for name, changes in body['changes'].items():
+                if changes['watermark']:
+                    params[name] = changes['watermark']
+            params['deleted'] = body['deleted_watermark']
+            if not body['more_deleted'] and not any(changes['more'] for changes in body['changes'].values()):
+                return size, rows, params
+
+    def populate(self, options):
+        prefix = f'sync-bench-{int(time.time())}'
+        doctors = create_doctors(options['doctors'], create_clinics(5, prefix=prefix), prefix=prefix)
+        users = User.objects.bulk_create(
+            User(username=f'{prefix}-patient-{i}', email=f'{prefix}-patient-{i}@example.com', role='patient')
+            for i in range(max(1, options['appointments'] // 10))
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        appointments = (
+            Appointment(
+                doctor=doctors[i % len(doctors)], patient=random.choice(patients), status='confirmed',
+                start_time=start + timedelta(minutes=30 * (i // len(doctors))),
+                end_time=start + timedelta(minutes=30 * (i // len(doctors) + 1)),
+            )
+            for i in range(options['appointments'])
+        )
+        for batch in chunked(appointments, 2000):
+            Appointment.objects.bulk_create(batch)
+        notifications = (
+            build_notification(random.choice(users).pk, f'Notice {i}', 'Synthetic notification body.', 'info')
+            for i in range(options['notifications'])
+        )
+        for batch in chunked(notifications, 2000):
+            Notification.objects.bulk_create(batch)
+
+    def handle(self, *args, **options):
+        # The rows are written just before they are synced, so feeds must not lag behind now
+        with override_settings(SYNC_SAFETY_LAG=0):
+            self.run(options)
+
+    def run(self, options):
+        self.factory = RequestFactory(SERVER_NAME='localhost')
+        self.populate(options)
+
+        full_bytes = self.full_refresh()
+        self.stdout.write(format_timings(f'full refresh ({full_bytes / 1024:.0f} KiB)', measure(self.full_refresh, repeat=options['repeat'], warmup=1)))
+        initial_bytes, initial_rows, watermarks = self.sync({})
+        if not initial_rows:
+            raise CommandError('The initial sync returned no rows')
+        self.stdout.write(format_timings(f'initial sync ({initial_rows} rows, {initial_bytes / 1024:.0f} KiB)', measure(lambda: self.sync({}), repeat=options['repeat'], warmup=1)))
+
+        changed = list(Notification.objects.order_by('?').values_list('pk', flat=True)[:options['changed']])
+        Notification.objects.filter(pk__in=changed[::2]).update(title='Updated', updated_at=timezone.now())
+        Notification.objects.filter(pk__in=changed[1::2]).delete()
+        delta_bytes, delta_rows, _ = self.sync(watermarks)
+        if delta_rows < len(changed):
+            raise CommandError(f'The delta sync returned {delta_rows} rows for {len(changed)} changes')
+        self.stdout.write(format_timings(f'delta sync ({delta_rows} rows, {delta_bytes / 1024:.1f} KiB)', measure(lambda: self.sync(watermarks), repeat=options['repeat'])))
+        self.stdout.write(f'{len(changed)} changed rows: delta is {delta_bytes / full_bytes:.2%} of a full refresh')
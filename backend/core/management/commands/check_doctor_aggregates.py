@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.aggregates import find_inconsistencies
+
+
+class Command(BaseCommand):
+    help = 'Compare the maintained doctor aggregates against a full recomputation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for doctor_id, field, stored, expected in find_inconsistencies(batch_size=options['batch_size']):
+            mismatches += 1
+            self.stdout.write(f'doctor {doctor_id}: {field} is {stored}, expected {expected}')
+        if mismatches:
+            raise CommandError(f'{mismatches} inconsistent aggregates, run rebuild_doctor_aggregates')
+        self.stdout.write('Doctor aggregates are consistent')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.transfer import DEFAULT_BATCH_SIZE, FIELDS, export_rows, file_format, write_records
+
+
+class Command(BaseCommand):
+    help = 'Stream clinics, doctors or availability slots to a CSV or JSON Lines file that import_records can read back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=FIELDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        entity = options['entity']
+        with open(options['path'], 'w', newline='', encoding='utf-8') as file:
+            count = write_records(
+                file, file_format(options['path'], options['format']), FIELDS[entity],
+                export_rows(entity, batch_size=options['batch_size']),
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Exported {count} {entity} in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/s)')
@@ -0,0 +1,64 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core import aggregates
+from core.datagen import (
+    create_appointments, create_clinics, create_doctors, create_feedback, create_medications,
+    create_patients, create_prescriptions, create_slots,
+)
+
+SCALES = {
+    'small': {'clinics': 20, 'doctors': 200, 'patients': 2000, 'slots_per_doctor': 100, 'medications': 2000},
+    'medium': {'clinics': 200, 'doctors': 2000, 'patients': 20_000, 'slots_per_doctor': 200, 'medications': 20_000},
+    'large': {'clinics': 2000, 'doctors': 20_000, 'patients': 200_000, 'slots_per_doctor': 300, 'medications': 100_000},
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a realistic synthetic dataset, inserted with bulk_create in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        for name in SCALES['small']:
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, help=f'Override the preset number of {name.replace("_", " ")}')
+        parser.add_argument('--history-days', type=int, help='Days of past slots, whose appointments are completed; half the schedule by default')
+        parser.add_argument('--booked-ratio', type=float, default=0.4)
+        parser.add_argument('--prescription-ratio', type=float, default=0.5)
+        parser.add_argument('--feedback-ratio', type=float, default=0.3)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default=None, help='Username prefix, unique per run by default')
+
+    def stage(self, label, create):
+        started = time.perf_counter()
+        result = create()
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(f'{label:<16} {count:>9} rows in {time.perf_counter() - started:.1f}s')
+        return result
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] if options[name] is not None else value for name, value in SCALES[options['scale']].items()}
+        rng = random.Random(options['seed'])
+        prefix = options['prefix'] or f'gen-{int(time.time())}'
+        # iter_slots fills 18 half-hour slots per working day
+        history_days = options['history_days'] if options['history_days'] is not None else counts['slots_per_doctor'] // 18 // 2
+        start = timezone.now() - timedelta(days=history_days)
+
+        clinics = self.stage('clinics', lambda: create_clinics(counts['clinics'], prefix=prefix, rng=rng))
+        doctors = self.stage('doctors', lambda: create_doctors(counts['doctors'], clinics, prefix=prefix, rng=rng))
+        patients = self.stage('patients', lambda: create_patients(counts['patients'], prefix=prefix, rng=rng))
+        self.stage('slots', lambda: create_slots(
+            doctors, counts['slots_per_doctor'], start=start, booked_ratio=options['booked_ratio'], rng=rng,
+        ))
+        self.stage('appointments', lambda: create_appointments(doctors, patients, rng=rng))
+        self.stage('medications', lambda: create_medications(counts['medications'], rng=rng))
+        self.stage('prescriptions', lambda: create_prescriptions(doctors, options['prescription_ratio'], rng=rng))
+        self.stage('feedback', lambda: create_feedback(doctors, options['feedback_ratio'], rng=rng))
+        # bulk_create skips the signals that keep ratings and patient counts current
+        self.stage('aggregates', lambda: aggregates.rebuild())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
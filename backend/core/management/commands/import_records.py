@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.transfer import DEFAULT_BATCH_SIZE, FIELDS, file_format, import_records, read_records
+
+
+class Command(BaseCommand):
+    help = 'Stream clinics, doctors or availability slots from a CSV or JSON Lines file into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=FIELDS)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--strict', action='store_true', help='Fail when any record was rejected')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - started
+            self.stderr.write(f'{result.processed} records, {result.processed / elapsed:.0f} rows/s', ending='\r')
+
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            records = read_records(file, file_format(options['path'], options['format']))
+            result = import_records(options['entity'], records, batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Imported {options['entity']}: {result.created} created, {result.updated} updated, {result.unchanged} unchanged, "
+            f"{len(result.errors)} rejected in {elapsed:.2f}s ({result.processed / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        for number, message in result.errors[:20]:
+            self.stdout.write(f'  line {number}: {message}')
+        if options['strict'] and result.errors:
+            raise CommandError(f'{len(result.errors)} records were rejected')
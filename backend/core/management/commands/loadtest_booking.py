@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from core.benchmarking import percentile
+from core.datagen import create_clinics, create_doctors, create_slots
+from core.models import Appointment, Availability, Patient, User
+from core.services import SlotUnavailable, book_next_slot
+
+
+class Command(BaseCommand):
+    help = 'Hammer a single doctor with concurrent bookings and check for double-bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--attempts', type=int, default=500, help='Total booking attempts')
+        parser.add_argument('--slots', type=int, default=200)
+
+    def handle(self, *args, **options):
+        prefix = f'loadtest-{int(time.time())}'
+        doctor = create_doctors(1, create_clinics(1, prefix=prefix), prefix=prefix)[0]
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        create_slots([doctor], options['slots'], start=start, booked_ratio=0)
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-patient-{i}', email=f'{prefix}-patient-{i}@example.com', role='patient')
+            for i in range(options['attempts'])
+        ])
+        patients = Patient.objects.bulk_create([Patient(user=user) for user in users])
+
+        latencies = []
+        outcomes = {'booked': 0, 'unavailable': 0, 'errors': 0}
+        errors = set()
+        lock = threading.Lock()
+
+        def attempt(patient):
+            started = time.perf_counter()
+            try:
+                book_next_slot(doctor, patient, start=start)
+                outcome = 'booked'
+            except SlotUnavailable:
+                outcome = 'unavailable'
+            except Exception as exc:
+                outcome = 'errors'
+                errors.add(repr(exc))
+            finally:
+                connection.close()
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcomes[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(attempt, patients))
+
+        duplicates = (
+            Appointment.objects.filter(doctor=doctor)
+            .values('start_time').annotate(n=Count('id')).filter(n__gt=1).count()
+        )
+        booked_slots = Availability.objects.filter(doctor_id=doctor, booked=True).count()
+        appointments = Appointment.objects.filter(doctor=doctor).count()
+        latencies.sort()
+        self.stdout.write(
+            f"{outcomes['booked']} booked, {outcomes['unavailable']} unavailable, {outcomes['errors']} errors; "
+            f"p50={percentile(latencies, 50):.2f}ms p99={percentile(latencies, 99):.2f}ms"
+        )
+        self.stdout.write(f'{appointments} appointments for {booked_slots} booked slots, {duplicates} double-booked start times')
+        for error in sorted(errors):
+            self.stderr.write(error)
+        if duplicates or appointments != booked_slots:
+            self.stderr.write(self.style.ERROR('Booking invariant violated'))
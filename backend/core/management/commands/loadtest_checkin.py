@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarking import percentile
+from core.checkin import AlreadyCheckedIn, InvalidToken, check_in, generate_token
+from core.datagen import create_clinics, create_doctors
+from core.models import Appointment, Patient, User
+from core.utils import chunked
+
+
+class Command(BaseCommand):
+    help = 'Simulate many scanners checking patients in concurrently and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--appointments', type=int, default=2000)
+        parser.add_argument('--rescans', type=float, default=0.2, help='Share of scans repeating an earlier code')
+        parser.add_argument('--forged', type=float, default=0.05, help='Share of scans with a forged code')
+
+    def handle(self, *args, **options):
+        rng = random.Random(3)
+        prefix = f'checkin-{int(time.time())}'
+        doctors = create_doctors(20, create_clinics(1, prefix=prefix), prefix=prefix, rng=rng)
+        users = User.objects.bulk_create(
+            User(username=f'{prefix}-patient-{i}', email=f'{prefix}-patient-{i}@example.com', role='patient')
+            for i in range(options['appointments'])
+        )
+        patients = Patient.objects.bulk_create(Patient(user=user) for user in users)
+        start = timezone.now().replace(second=0, microsecond=0)
+        appointments = (
+            Appointment(
+                doctor=doctors[i % len(doctors)], patient=patient, status='confirmed', qr_Code=generate_token(),
+                start_time=start + timedelta(minutes=15 * (i // len(doctors))),
+                end_time=start + timedelta(minutes=15 * (i // len(doctors) + 1)),
+            )
+            for i, patient in enumerate(patients)
+        )
+        tokens = []
+        for batch in chunked(appointments, 2000):
+            tokens.extend(appointment.qr_Code for appointment in Appointment.objects.bulk_create(batch))
+        scans = list(tokens)
+        scans += rng.choices(tokens, k=int(len(tokens) * options['rescans']))
+        scans += ['forged.' + generate_token().partition('.')[2] for _ in range(int(len(tokens) * options['forged']))]
+        rng.shuffle(scans)
+
+        latencies = []
+        outcomes = {'checked_in': 0, 'repeated': 0, 'rejected': 0, 'errors': 0}
+        errors = set()
+        lock = threading.Lock()
+
+        def scan(token):
+            started = time.perf_counter()
+            try:
+                check_in(token)
+                outcome = 'checked_in'
+            except AlreadyCheckedIn:
+                outcome = 'repeated'
+            except InvalidToken:
+                outcome = 'rejected'
+            except Exception as exc:
+                outcome = 'errors'
+                errors.add(repr(exc))
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcomes[outcome] += 1
+
+        def worker(chunk):
+            try:
+                for token in chunk:
+                    scan(token)
+            finally:
+                connection.close()
+
+        threads = options['threads']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, [scans[i::threads] for i in range(threads)]))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        self.stdout.write(
+            f"{len(scans)} scans by {threads} scanners in {elapsed:.2f}s ({len(scans) / elapsed:.0f} scans/s); "
+            f"p50={percentile(latencies, 50):.2f}ms p99={percentile(latencies, 99):.2f}ms"
+        )
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in outcomes.items()))
+        checked_in = Appointment.objects.filter(qr_Code__in=tokens, status='in_progress').count()
+        for error in sorted(errors):
+            self.stderr.write(error)
+        if outcomes['checked_in'] != checked_in or checked_in + outcomes['errors'] < len(tokens):
+            self.stderr.write(self.style.ERROR(f'Check-in invariant violated: {checked_in} appointments in progress'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.aggregates import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute Doctor.grade and Doctor.nbr_patients from feedback and completed appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt aggregates of {total} doctors in {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,19 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.notifications import schedule_appointment_reminders
+
+
+class Command(BaseCommand):
+    help = 'Write reminders for confirmed appointments starting soon, in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Remind appointments starting within this many hours')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = schedule_appointment_reminders(within=timedelta(hours=options['hours']), batch_size=options['batch_size'])
+        self.stdout.write(f'Sent {total} reminders ({time.perf_counter() - started:.2f}s)')
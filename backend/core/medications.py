@@ -0,0 +1,160 @@
+"""Typeahead search over the medication catalogue.
+
+On PostgreSQL prefix matches come from the `search_name` b-tree index and
+fuzzy matches from the pg_trgm GIN index. Other backends (SQLite in tests and
+local development) use an in-process sorted prefix index with a trigram
+fallback, rebuilt lazily after catalogue writes.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+
+from django.db import connection
+from django.db.models import F
+
+from .models import Medication
+
+FIELDS = ('id', 'name', 'dosage')
+SIMILARITY_THRESHOLD = 0.3
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: every word padded with two leading and one trailing space"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+_Snapshot = namedtuple('_Snapshot', 'entries names groups words postings sizes built_at')
+
+
+class MedicationPrefixIndex:
+    """Sorted in-memory index of catalogue names for backends without pg_trgm.
+
+    Names are indexed once however many dosages they come in; a match expands
+    to every catalogue entry with that name. A rebuild publishes a whole new
+    snapshot in one assignment, so a search never mixes old and new structures.
+    """
+    max_age = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _build(self):
+        entries = list(
+            Medication.objects.filter(prescription__isnull=True)
+            .order_by('search_name', 'dosage', 'id')
+            .values_list(*FIELDS, 'search_name')
+        )
+        grouped = defaultdict(list)
+        for index, entry in enumerate(entries):
+            grouped[normalize(entry[3])].append(index)
+        names = sorted(grouped)
+        words = []
+        postings = defaultdict(list)
+        sizes = []
+        for index, name in enumerate(names):
+            # Later words are indexed too, so "acid" finds "folic acid"
+            words.extend((token, index) for token in name.split()[1:])
+            grams = trigrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(index)
+        words.sort()
+        return _Snapshot(entries, names, [grouped[name] for name in names], words, dict(postings), sizes, time.monotonic())
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.built_at < self.max_age:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.built_at >= self.max_age:
+                snapshot = self._snapshot = self._build()
+            return snapshot
+
+    def _matching_names(self, snapshot, query, limit):
+        """Name indexes: whole-name prefix matches, then word prefix matches, then similar names"""
+        seen = set()
+        names = snapshot.names
+        position = bisect_left(names, query)
+        while position < len(names) and names[position].startswith(query):
+            seen.add(position)
+            yield position
+            position += 1
+
+        words = snapshot.words
+        position = bisect_left(words, (query,))
+        while position < len(words) and words[position][0].startswith(query):
+            index = words[position][1]
+            if index not in seen:
+                seen.add(index)
+                yield index
+            position += 1
+
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(snapshot.postings.get(gram, ()))
+        scored = (
+            (count / (len(grams) + snapshot.sizes[index] - count), index)
+            for index, count in shared.items()
+            if index not in seen
+        )
+        for score, index in heapq.nlargest(limit, scored):
+            if score < SIMILARITY_THRESHOLD:
+                return
+            yield index
+
+    def search(self, query, limit=10):
+        snapshot = self._current()
+        rows = []
+        for name_index in self._matching_names(snapshot, normalize(query), limit):
+            for entry_index in snapshot.groups[name_index]:
+                rows.append(dict(zip(FIELDS, snapshot.entries[entry_index][:3])))
+                if len(rows) == limit:
+                    return rows
+        return rows
+
+
+medication_index = MedicationPrefixIndex()
+
+
+def _search_postgres(query, limit):
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    query = normalize(query)
+    catalogue = Medication.objects.filter(prescription__isnull=True)
+    results = list(catalogue.filter(search_name__startswith=query).order_by('search_name', 'id').values(*FIELDS)[:limit])
+    if len(results) < limit:
+        fuzzy = (
+            catalogue.filter(TrigramSimilar(F('search_name'), query))
+            .exclude(pk__in=[row['id'] for row in results])
+            .annotate(similarity=TrigramSimilarity('search_name', query))
+            .order_by('-similarity', 'search_name')
+            .values(*FIELDS)[:limit - len(results)]
+        )
+        results.extend(fuzzy)
+    return results
+
+
+def search_medications(query, limit=10):
+    """Top catalogue matches for a typeahead query: prefix matches first, then fuzzy ones"""
+    if not query.strip():
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, limit)
+    return medication_index.search(query, limit)
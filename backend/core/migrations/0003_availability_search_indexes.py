@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_remove_medication_frequency_appointment_patient_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['doctor_id', 'start_time', 'booked'], name='core_avail_doctor_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['start_time', 'doctor_id'], name='core_avail_open_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['specialty', 'clinic'], name='core_doctor_specialty_idx'),
+        ),
+    ]
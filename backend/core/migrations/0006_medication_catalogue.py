@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_duplicate_catalogue_entries(apps, schema_editor):
+    """Point items at the oldest of each duplicated (name, dosage) catalogue row and drop the rest"""
+    Medication = apps.get_model('core', 'Medication')
+    PrescriptionItem = apps.get_model('core', 'PrescriptionItem')
+    duplicates = (
+        Medication.objects.filter(prescription__isnull=True)
+        .values('name', 'dosage')
+        .annotate(keep=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        extra = Medication.objects.filter(
+            name=row['name'], dosage=row['dosage'], prescription__isnull=True,
+        ).exclude(pk=row['keep'])
+        PrescriptionItem.objects.filter(medication__in=extra).update(medication_id=row['keep'])
+        extra.delete()
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm only exists on PostgreSQL; other backends use core.medications.MedicationPrefixIndex
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_medication_trgm_idx ON core_medication USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_medication_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_doctor_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='search_name',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower('name'), output_field=models.CharField(max_length=255)),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['search_name'], name='core_medication_search_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(merge_duplicate_catalogue_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='medication',
+            constraint=models.UniqueConstraint(condition=models.Q(('prescription__isnull', True)), fields=('name', 'dosage'), name='core_medication_catalog_uniq'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
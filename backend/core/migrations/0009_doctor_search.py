@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower
+
+
+def fill_search_text(apps, schema_editor):
+    Doctor = apps.get_model('core', 'Doctor')
+    User = apps.get_model('core', 'User')
+    Clinic = apps.get_model('core', 'Clinic')
+    user = User.objects.filter(pk=OuterRef('user_id'))
+    clinic = Clinic.objects.filter(pk=OuterRef('clinic_id'))
+    Doctor.objects.update(search_text=Lower(Concat(
+        Coalesce(Subquery(user.values('name')[:1]), Subquery(user.values('username')[:1]), Value('')),
+        Value(' '), F('specialty'), Value(' '),
+        Coalesce(Subquery(clinic.values('name')[:1]), Value('')),
+    )))
+
+
+def create_search_vector(apps, schema_editor):
+    # tsvector only exists on PostgreSQL; other backends use the fallback in core.search
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE core_doctor ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(search_text, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+        ") STORED"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS core_doctor_search_vector_idx ON core_doctor USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE core_doctor DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sync_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
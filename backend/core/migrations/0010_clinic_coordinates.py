@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import re
+
+from django.db import migrations, models
+
+COORDINATES = re.compile(r'(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)')
+
+
+def parse_map_locations(apps, schema_editor):
+    """Fill coordinates from map_location values like "36.75,3.06" or maps URLs containing them"""
+    Clinic = apps.get_model('core', 'Clinic')
+    clinics = []
+    for clinic in Clinic.objects.exclude(map_location__isnull=True).exclude(map_location='').only('id', 'map_location'):
+        for lat, lon in COORDINATES.findall(clinic.map_location):
+            if -90 <= float(lat) <= 90 and -180 <= float(lon) <= 180:
+                clinic.latitude, clinic.longitude = float(lat), float(lon)
+                clinics.append(clinic)
+                break
+    Clinic.objects.bulk_update(clinics, ['latitude', 'longitude'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_doctor_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clinic',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='clinic',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clinic',
+            index=models.Index(fields=['latitude', 'longitude'], name='core_clinic_location_idx'),
+        ),
+        migrations.RunPython(parse_map_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+import base64
+import secrets
+
+from django.db import migrations, models
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+# A frozen copy of core.checkin as of this migration, so later changes there cannot alter it
+SALT = 'core.checkin'
+
+
+def _encode(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _signature(nonce):
+    return _encode(salted_hmac(SALT, nonce, algorithm='sha256').digest()[:12])
+
+
+def generate_token():
+    nonce = _encode(secrets.token_bytes(12))
+    return f'{nonce}.{_signature(nonce)}'
+
+
+def is_signed(token):
+    nonce, _, signature = (token or '').partition('.')
+    return bool(nonce) and constant_time_compare(signature, _signature(nonce))
+
+
+def issue_tokens(apps, schema_editor):
+    """Replace empty, duplicated and unsigned codes, none of which could check in, with signed tokens"""
+    Appointment = apps.get_model('core', 'Appointment')
+    batch = []
+    for appointment in Appointment.objects.only('id', 'qr_Code').iterator(chunk_size=2000):
+        if not is_signed(appointment.qr_Code):
+            appointment.qr_Code = generate_token()
+            batch.append(appointment)
+        if len(batch) == 2000:
+            Appointment.objects.bulk_update(batch, ['qr_Code'])
+            batch = []
+    Appointment.objects.bulk_update(batch, ['qr_Code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_clinic_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunPython(issue_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='qr_Code',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:09
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_appointment_check_in_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('qr_Code', models.CharField(blank=True, max_length=255, null=True)),
+                ('reminder_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='core.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='core.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'start_time'], name='core_appt_archive_patient_idx'), models.Index(fields=['doctor', 'start_time'], name='core_appt_archive_doctor_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('date_creation', models.DateField()),
+                ('time_creation', models.TimeField()),
+                ('type', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to='core.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date_creation'], name='core_notif_archive_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from rest_framework.response import Response
+
+from .coalescing import coalesce
+from .serializers import sparse_options
+
+
+class EagerLoadingViewMixin:
+    """Apply the serializer's select_related/prefetch_related paths to the view queryset"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        options = sparse_options(self.request)
+        expand = options[1] if options is not None else None
+        return self.get_serializer_class().setup_eager_loading(queryset, expand=expand)
+
+
+class CoalescedListMixin:
+    """Serve concurrent identical list requests from one evaluation of the page"""
+
+    def list(self, request, *args, **kwargs):
+        data = coalesce(
+            f'{type(self).__name__}:{request.build_absolute_uri()}',
+            lambda: super(CoalescedListMixin, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
@@ -1,4 +1,6 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models.functions import Lower, Now
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 
@@ -33,9 +35,18 @@ class Clinic(models.Model):
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     map_location = models.CharField(max_length=255, blank=True, null=True)
+    # Parsed from map_location when not given (core.geo); degrees, WGS84
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for proximity search
+            models.Index(fields=['latitude', 'longitude'], name='core_clinic_location_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -49,9 +60,21 @@ class Doctor(models.Model):
     grade = models.FloatField(default=0.0)
     description = models.TextField(blank=True, null=True)
     nbr_patients = models.IntegerField(default=0)
+    # Running totals behind `grade`, maintained by core.aggregates
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    # Lower-cased "name specialty clinic", maintained by core.search; PostgreSQL
+    # builds the weighted tsvector column from it and `description` (migration 0009)
+    search_text = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['specialty', 'clinic'], name='core_doctor_specialty_idx'),
+            models.Index(fields=['updated_at', 'id'], name='core_doctor_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Dr. {self.user.get_full_name()}"
 
@@ -79,11 +102,39 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
         ('in_progress', 'In Progress'),
     ], default='scheduled')
-    qr_Code = models.CharField(max_length=255, blank=True, null=True)
+    # Signed check-in token issued by core.checkin
+    qr_Code = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    reminder_sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # Last line of defence against double-booking a doctor's slot
+            models.UniqueConstraint(fields=['doctor', 'start_time'], name='core_appointment_doctor_start_uniq'),
+        ]
+        indexes = [
+            # Reminder scheduler scans upcoming appointments that were not reminded yet
+            models.Index(fields=['start_time'], condition=models.Q(reminder_sent_at__isnull=True), name='core_appt_unreminded_idx'),
+            # Offline sync reads changes in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='core_appt_updated_idx'),
+            # Patient timeline reads newest first
+            models.Index(fields=['patient', 'start_time'], name='core_appt_patient_start_idx'),
+            # Admin status filter, newest first
+            models.Index(fields=['status', 'id'], name='core_appt_status_idx'),
+        ]
 
     def __str__(self):
         return f"Appointment with {self.doctor} on {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
+    # The signals counting nbr_patients lock the doctor row, and the write
+    # must commit under that lock for the count to stay exact
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
 class Notification(models.Model):
     """System notifications for users"""
     id = models.AutoField(primary_key=True)
@@ -96,6 +147,56 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='core_notif_updated_idx'),
+            models.Index(fields=['user', 'created_at'], name='core_notif_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class AppointmentArchive(models.Model):
+    """Completed appointments moved out of `Appointment` by core.archive"""
+    id = models.IntegerField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='archived_appointments')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='archived_appointments')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    status = models.CharField(max_length=20)
+    qr_Code = models.CharField(max_length=255, blank=True, null=True)
+    reminder_sent_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'start_time'], name='core_appt_archive_patient_idx'),
+            models.Index(fields=['doctor', 'start_time'], name='core_appt_archive_doctor_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived appointment with {self.doctor_id} on {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+
+class NotificationArchive(models.Model):
+    """Old notifications moved out of `Notification` by core.archive"""
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    date_creation = models.DateField()
+    time_creation = models.TimeField()
+    type = models.CharField(max_length=50)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_notif_archive_user_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -106,11 +207,20 @@ class Feedback(models.Model):
     description = models.TextField()
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='feedback')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='feedback')
+    rating = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     date_creation = models.DateField()
     time_creation = models.TimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='core_feedback_updated_idx'),
+            models.Index(fields=['patient', 'created_at'], name='core_feedback_patient_idx'),
+        ]
+
     def __str__(self):
         return f"Feedback from {self.patient} for {self.doctor}"
 
@@ -123,6 +233,12 @@ class Prescription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='core_rx_updated_idx'),
+            models.Index(fields=['patient', 'created_at'], name='core_rx_patient_created_idx'),
+        ]
+
     def __str__(self):
         return f"Prescription for {self.patient} by {self.doctor} on {self.date}"
 
@@ -138,6 +254,25 @@ class Medication(models.Model):
         null=True,
         blank=True
     )
+    # Lower-cased name for typeahead; the trigram index on it is created in migration 0006
+    search_name = models.GeneratedField(
+        expression=Lower('name'),
+        output_field=models.CharField(max_length=255),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['search_name'], name='core_medication_search_idx', opclasses=['varchar_pattern_ops']),
+        ]
+        constraints = [
+            # Medications without a prescription form the shared catalogue
+            models.UniqueConstraint(
+                fields=['name', 'dosage'],
+                condition=models.Q(prescription__isnull=True),
+                name='core_medication_catalog_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.dosage})"
@@ -160,9 +295,55 @@ class Availability(models.Model):
     end_time = models.DateTimeField()
     booked = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor_id', 'start_time', 'booked'], name='core_avail_doctor_start_idx'),
+            # Slot search only ever looks at open slots, so keep that index small
+            models.Index(fields=['start_time', 'doctor_id'], condition=models.Q(booked=False), name='core_avail_open_start_idx'),
+        ]
+
     def __str__(self):
         return f"Dr. {self.doctor_id} available from {self.start_time} to {self.end_time}"
 
+class AvailabilityRule(models.Model):
+    """Weekly recurring block of a doctor's schedule, expanded into slots by core.schedule"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability_rules')
+    weekday = models.PositiveSmallIntegerField(choices=[
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ])
+    # Local wall-clock times; the last slot ends at or before end_time
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30, validators=[MinValueValidator(5)])
+    valid_from = models.DateField(blank=True, null=True)
+    valid_until = models.DateField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'weekday'], name='core_avail_rule_doctor_idx'),
+        ]
+
+    def __str__(self):
+        return f"Dr. {self.doctor_id} on {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+class AvailabilityException(models.Model):
+    """Period in which a doctor's recurring schedule does not apply (leave, holidays)"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability_exceptions')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    reason = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'start_time'], name='core_avail_exception_idx'),
+        ]
+
+    def __str__(self):
+        return f"Dr. {self.doctor_id} unavailable from {self.start_time} to {self.end_time}"
+
 class SocialMedia(models.Model):
     """Social media profiles for doctors"""
     id = models.AutoField(primary_key=True)
@@ -172,3 +353,20 @@ class SocialMedia(models.Model):
 
     def __str__(self):
         return f"{self.name} profile for Dr. {self.doctor_id}"
+
+class SyncTombstone(models.Model):
+    """Deleted rows of synced models, so offline clients can drop them"""
+    model = models.CharField(max_length=50)
+    object_id = models.IntegerField()
+    # User who could see the row; null for rows everyone syncs, such as doctors
+    owner_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'id'], name='core_tombstone_model_idx'),
+            models.Index(fields=['owner_id', 'id'], name='core_tombstone_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,189 @@
+"""Background notification fan-out.
+
+Request handlers enqueue unsaved `Notification` objects and return straight
+away; worker threads drain the queue and write notifications with one
+bulk_create per batch. The queue is bounded so a burst applies backpressure
+instead of growing memory without limit.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import Appointment, Notification
+
+logger = logging.getLogger(__name__)
+
+
+def build_notification(user_id, title, description, type):
+    now = timezone.localtime()
+    return Notification(
+        user_id=user_id,
+        title=title,
+        description=description,
+        type=type,
+        date_creation=now.date(),
+        time_creation=now.time(),
+    )
+
+
+class NotificationDispatcher:
+    """Bounded in-process queue drained by worker threads in bulk_create batches"""
+
+    def __init__(self, workers=2, batch_size=500, max_queue=10000, flush_interval=0.5):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'rejected': 0, 'inserted': 0, 'failed': 0, 'batches': 0, 'high_water_mark': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'notification-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Let the workers drain what is queued, then shut them down"""
+        if not self._threads:
+            self.drain()
+            return
+        self._queue.join()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, notification, timeout=None):
+        """Queue a notification; returns False if the queue stayed full for `timeout` seconds"""
+        if not self._threads and self.workers:
+            self.start()
+        try:
+            self._queue.put(notification, timeout=timeout)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        with self._lock:
+            self._counters['enqueued'] += 1
+            self._counters['high_water_mark'] = max(self._counters['high_water_mark'], self._queue.qsize())
+        return True
+
+    def _take_batch(self, wait):
+        try:
+            batch = [self._queue.get(timeout=wait) if wait else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            Notification.objects.bulk_create(batch, batch_size=self.batch_size)
+            self._count('inserted', len(batch))
+            self._count('batches')
+        except Exception:
+            logger.exception('Could not write %d notifications', len(batch))
+            self._count('failed', len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def drain(self):
+        """Write everything queued so far from the calling thread"""
+        while batch := self._take_batch(wait=None):
+            self._write(batch)
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._take_batch(wait=self.flush_interval)
+                if batch:
+                    close_old_connections()
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def metrics(self):
+        with self._lock:
+            return dict(
+                self._counters,
+                queue_depth=self._queue.qsize(),
+                max_queue=self._queue.maxsize,
+                workers=len(self._threads),
+            )
+
+
+dispatcher = NotificationDispatcher(
+    workers=getattr(settings, 'NOTIFICATION_WORKERS', 2),
+    batch_size=getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500),
+    max_queue=getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 10000),
+)
+
+
+def notify(user_id, title, description, type, timeout=0.1):
+    """Fire-and-forget notification for request handlers"""
+    return dispatcher.enqueue(build_notification(user_id, title, description, type), timeout=timeout)
+
+
+def schedule_appointment_reminders(within=timedelta(hours=24), now=None, batch_size=1000):
+    """Write one reminder per confirmed appointment starting within `within`.
+
+    Appointments are read in keyset batches from the partial index on
+    unreminded start times. Each batch's reminders are bulk-created and the
+    appointments flagged in the same transaction, so a reminder is never
+    flagged without being written and running the scheduler again never sends
+    one twice. Rows locked by a concurrent run are skipped where the backend
+    supports it.
+    """
+    now = now or timezone.now()
+    pending = Appointment.objects.filter(
+        reminder_sent_at__isnull=True,
+        status='confirmed',
+        start_time__gte=now,
+        start_time__lt=now + within,
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        pending = pending.select_for_update(skip_locked=True, of=('self',))
+    total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                pending.filter(id__gt=last_id).order_by('id')
+                .values('id', 'start_time', 'patient__user_id', 'doctor__user__name')[:batch_size]
+            )
+            if not batch:
+                return total
+            reminders = []
+            for row in batch:
+                start = timezone.localtime(row['start_time'])
+                doctor = row['doctor__user__name'] or 'your doctor'
+                reminders.append(build_notification(
+                    row['patient__user_id'],
+                    'Appointment reminder',
+                    f'Your appointment with {doctor} is on {start:%Y-%m-%d} at {start:%H:%M}.',
+                    'appointment_reminder',
+                ))
+            Notification.objects.bulk_create(reminders)
+            Appointment.objects.filter(id__in=[row['id'] for row in batch]).update(reminder_sent_at=now)
+        total += len(batch)
+        last_id = batch[-1]['id']
@@ -0,0 +1,63 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection, transaction
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination on the primary key, stable under concurrent inserts"""
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class SlotCursorPagination(CursorPagination):
+    """Keyset pagination over slots in chronological order"""
+    ordering = ('start_time', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+def estimate_rows(model):
+    """Planner statistics row count of a table, or None when the backend has none"""
+    table = model._meta.db_table
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Filled by ANALYZE with a row per index; the first number of a
+                # stat is the rows that index covers, fewer than the table for
+                # a partial index, so the largest is the table's
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+            else:
+                return None
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    if not rows:
+        return None
+    estimate = max(int(str(row[0]).split()[0]) for row in rows)
+    # PostgreSQL reports -1 before the first ANALYZE
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for large tables that never runs an unbounded COUNT(*).
+
+    An unfiltered list uses the planner's row estimate once the table is past
+    `exact_limit` rows; a filtered one counts at most `exact_limit` rows, so
+    pages beyond that are not listed.
+    """
+    exact_limit = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model)
+            if estimate is not None and estimate > self.exact_limit:
+                return estimate
+        return queryset.order_by()[:self.exact_limit].count()
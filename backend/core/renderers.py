@@ -0,0 +1,37 @@
+"""JSON renderer backed by orjson, used when the package is installed.
+
+Datetimes, decimals and the like are handed back to DRF's encoder, so the
+output parses to the same JSON as `JSONRenderer`'s while the bulk of the
+encoding runs in orjson. It is not byte-identical: orjson writes exponents
+without a sign or padding (1e16, not 1e+16) and renders NaN and infinity as
+null instead of raising under STRICT_JSON. Settings that change the layout
+(indent, COMPACT_JSON off, UNICODE_JSON off) use the stdlib encoder.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render_time'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson only writes compact, unescaped UTF-8; indented output for the
+        # browsable API and ?indent= stays with the stdlib encoder too
+        if not self.compact or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_encoder.default, option=self.options)
@@ -0,0 +1,134 @@
+"""Recurring availability expanded into slots on demand.
+
+An `AvailabilityRule` stores one weekly block of a doctor's schedule instead
+of one `Availability` row per slot. `open_slots` generates the slots of the
+queried window lazily, one local day at a time: each day costs one range
+query for the appointments that could overlap it, and booked or excepted
+slots are dropped. A caller that stops after the first page never expands or
+reads the rest of the window.
+"""
+import bisect
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import calendar
+from .models import Appointment, AvailabilityException, AvailabilityRule
+
+
+def _doctor_filter(doctor=None, specialty=None, clinic=None, doctor_ids=None):
+    """Q on a `doctor` foreign key, shared by rules, exceptions and appointments"""
+    lookup = Q()
+    if doctor is not None:
+        lookup &= Q(doctor_id=doctor)
+    if doctor_ids is not None:
+        lookup &= Q(doctor_id__in=doctor_ids)
+    if specialty:
+        lookup &= Q(doctor__specialty=specialty)
+    if clinic is not None:
+        lookup &= Q(doctor__clinic=clinic)
+    return lookup
+
+
+def _local_days(start, end):
+    """(day, day_start, day_end) for every local day overlapping [start, end)"""
+    day = timezone.localtime(start).date()
+    while True:
+        day_start = max(start, timezone.make_aware(datetime.combine(day, time.min)))
+        day_end = min(end, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)))
+        if day_start >= end:
+            return
+        yield day, day_start, day_end
+        day += timedelta(days=1)
+
+
+def _overlaps(intervals, start, end):
+    """Whether [start, end) overlaps any of the merged, sorted `intervals`"""
+    index = bisect.bisect_left(intervals, (end,))
+    return index > 0 and intervals[index - 1][1] > start
+
+
+def _busy(queryset, start, end, max_length=None):
+    """{doctor_id: merged intervals} of the rows of `queryset` overlapping [start, end)"""
+    queryset = queryset.filter(start_time__lt=end, end_time__gt=start)
+    if max_length is not None:
+        # Bounds the start_time range scan, as in core.calendar
+        queryset = queryset.filter(start_time__gte=start - max_length)
+    intervals = defaultdict(list)
+    for doctor_id, row_start, row_end in queryset.values_list('doctor_id', 'start_time', 'end_time'):
+        intervals[doctor_id].append((row_start, row_end))
+    return {doctor_id: calendar.merge_intervals(rows) for doctor_id, rows in intervals.items()}
+
+
+class Schedule:
+    """The recurring rules and exceptions of a set of doctors over a window"""
+
+    def __init__(self, start, end, **filters):
+        self.start = start
+        self.end = end
+        self.doctors = _doctor_filter(**filters)
+        days = (timezone.localtime(start).date(), timezone.localtime(end).date())
+        rules = AvailabilityRule.objects.filter(
+            self.doctors,
+            Q(valid_from__isnull=True) | Q(valid_from__lte=days[1]),
+            Q(valid_until__isnull=True) | Q(valid_until__gte=days[0]),
+        ).values_list('doctor_id', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until')
+        self.rules = defaultdict(list)
+        for doctor_id, weekday, *rule in rules:
+            self.rules[weekday].append((doctor_id, *rule))
+        self.longest_slot = timedelta(minutes=max((rule[3] for day in self.rules.values() for rule in day), default=0))
+        # Exceptions can span weeks, so they are read once for the whole window
+        self.exceptions = _busy(AvailabilityException.objects.filter(self.doctors), start, end + self.longest_slot) if self.rules else {}
+
+    def day_slots(self, day, day_start, day_end):
+        """(start, doctor_id, end) of the rule slots starting in [day_start, day_end), in order"""
+        slots = []
+        for doctor_id, rule_start, rule_end, minutes, valid_from, valid_until in self.rules[day.weekday()]:
+            if (valid_from and day < valid_from) or (valid_until and day > valid_until):
+                continue
+            length = timedelta(minutes=minutes)
+            slot_start = timezone.make_aware(datetime.combine(day, rule_start))
+            last_end = timezone.make_aware(datetime.combine(day, rule_end))
+            exceptions = self.exceptions.get(doctor_id, ())
+            while slot_start + length <= last_end:
+                slot_end = slot_start + length
+                if day_start <= slot_start < day_end and not _overlaps(exceptions, slot_start, slot_end):
+                    slots.append((slot_start, doctor_id, slot_end))
+                slot_start = slot_end
+        slots.sort()
+        return slots
+
+    def open_slots(self, after=None):
+        """Generated slots not taken by an appointment, ordered by (start, doctor_id)"""
+        if not self.rules:
+            return
+        for day, day_start, day_end in _local_days(self.start, self.end):
+            slots = self.day_slots(day, day_start, day_end)
+            if after is not None:
+                slots = slots[bisect.bisect_right(slots, after, key=lambda slot: slot[:2]):]
+            if not slots:
+                continue
+            # Appointments reaching into the day, up to the end of its last slot
+            booked = _busy(Appointment.objects.filter(self.doctors), day_start, day_end + self.longest_slot, calendar.MAX_INTERVAL)
+            for slot in slots:
+                if not _overlaps(booked.get(slot[1], ()), slot[0], slot[2]):
+                    yield slot
+
+    def free_intervals(self):
+        """{doctor_id: [(start, end)]} of every generated slot in the window, booked or not"""
+        intervals = defaultdict(list)
+        for day, day_start, day_end in _local_days(self.start, self.end):
+            for slot_start, doctor_id, slot_end in self.day_slots(day, day_start, day_end):
+                intervals[doctor_id].append((slot_start, slot_end))
+        return intervals
+
+
+def open_slots(start, end, after=None, **filters):
+    """Lazily generated open slots as (start, doctor_id, end), soonest first.
+
+    `after` is a (start, doctor_id) keyset cursor; filters are doctor,
+    specialty, clinic and doctor_ids.
+    """
+    return Schedule(start, end, **filters).open_slots(after=after)
@@ -0,0 +1,79 @@
+"""Ranked doctor search by name, specialty, clinic and description.
+
+On PostgreSQL the query runs against the generated, weighted `search_vector`
+tsvector column and its GIN index (migration 0009): name, specialty and clinic
+weigh more than the description, and ties go to the better graded doctor.
+Other backends match every term with LIKE and rank the candidates in Python.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Concat, Lower
+
+from .models import Clinic, Doctor, User
+
+SEARCH_CONFIG = 'simple'
+# Fallback ranking weights, mirroring setweight 'A' and 'C' in migration 0009
+HEADLINE_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.2
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def refresh_search_text(queryset=None):
+    """Rebuild `search_text` with one UPDATE over the given doctors"""
+    queryset = Doctor.objects.all() if queryset is None else queryset
+    user = User.objects.filter(pk=OuterRef('user_id'))
+    clinic = Clinic.objects.filter(pk=OuterRef('clinic_id'))
+    return queryset.update(search_text=Lower(Concat(
+        Coalesce(Subquery(user.values('name')[:1]), Subquery(user.values('username')[:1]), Value('')),
+        Value(' '), F('specialty'), Value(' '),
+        Coalesce(Subquery(clinic.values('name')[:1]), Value('')),
+    )))
+
+
+def _search_postgres(words, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
+    vector = RawSQL('core_doctor.search_vector', [], output_field=SearchVectorField())
+    return list(
+        Doctor.objects.alias(vector=vector).filter(vector=query)
+        .annotate(rank=SearchRank(vector, query))
+        .order_by('-rank', '-grade', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def _search_fallback(words, limit):
+    matches = Q()
+    for word in words:
+        matches &= Q(search_text__contains=word) | Q(description__icontains=word)
+    scored = []
+    for pk, text, description, grade in Doctor.objects.filter(matches).values_list('id', 'search_text', 'description', 'grade').iterator():
+        headline = set(terms(text))
+        body = set(terms(description or ''))
+        weights = [
+            HEADLINE_WEIGHT if any(token.startswith(word) for token in headline)
+            else DESCRIPTION_WEIGHT if any(token.startswith(word) for token in body) else 0
+            for word in words
+        ]
+        # LIKE also matched inside words; like tsquery prefixes, every term must start a word
+        if all(weights):
+            scored.append((-sum(weights), -grade, pk))
+    scored.sort()
+    return [pk for _, _, pk in scored[:limit]]
+
+
+def search_doctors(query, limit=20):
+    """Ids of the best matching doctors, most relevant first"""
+    words = terms(query)
+    if not words:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(words, limit)
+    return _search_fallback(words, limit)
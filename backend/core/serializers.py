@@ -1,19 +1,98 @@
 from rest_framework import serializers
 from .models import User, Clinic, Doctor, Patient, Appointment, Notification, Feedback, Prescription, Medication, PrescriptionItem, Availability, SocialMedia
-
-class UserSerializer(serializers.ModelSerializer):
+from .services import create_prescription
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_options(request):
+    """(fields, expand) requested through `?fields=` and `?expand=`, or None.
+
+    Sending either parameter switches to the compact mode: nested relations
+    are rendered as ids unless their dotted path is listed in `expand`.
+    Without them serializers keep their full nested output.
+    """
+    params = getattr(request, 'query_params', None) or {}
+    if 'fields' not in params and 'expand' not in params:
+        return None
+    fields = _split(params.get('fields', ''))
+    expand = set()
+    for path in _split(params.get('expand', '')) | {field.rpartition('.')[0] for field in fields if '.' in field}:
+        parts = path.split('.')
+        expand.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return fields, expand
+
+
+class EagerLoadingMixin:
+    """Relations a serializer reads, so list querysets can load them up front"""
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, expand=None):
+        """`expand` limits loading to the relations a compact response renders in full"""
+        select_related = cls.select_related_fields
+        prefetch_related = cls.prefetch_related_fields
+        if expand is not None:
+            select_related = [path for path in select_related if path.split('__')[0] in expand]
+            # Collapsed to-many relations still need their ids prefetched
+            prefetch_related = list(dict.fromkeys(
+                path if path.split('__')[0] in expand else path.split('__')[0] for path in prefetch_related
+            ))
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class SparseFieldsMixin:
+    """Honour `?fields=` and `?expand=` on this serializer and the ones nested in it"""
+
+    def _path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        options = sparse_options(self.context.get('request'))
+        if options is None:
+            return fields
+        requested, expand = options
+        path = self._path()
+        prefix = f'{path}.' if path else ''
+        # "doctor.specialty" selects `doctor` here and `specialty` inside it
+        selected = {field[len(prefix):].split('.')[0] for field in requested if field.startswith(prefix)}
+        if selected:
+            fields = {name: field for name, field in fields.items() if name in selected}
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, serializers.BaseSerializer) and f'{prefix}{name}' not in expand:
+                many = nested is not field
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, source=field.source)
+        return fields
+
+class UserSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'name', 'email', 'phone', 'address', 'role', 'birth_date', 'created_at', 'updated_at']
 
 
-class ClinicSerializer(serializers.ModelSerializer):
+class ClinicSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Clinic
-        fields = ['id', 'name', 'address', 'map_location', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'address', 'map_location', 'latitude', 'longitude', 'created_at', 'updated_at']
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user', 'clinic')
     user = UserSerializer()
     clinic = ClinicSerializer()
 
@@ -22,7 +101,8 @@ class DoctorSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'photo', 'specialty', 'clinic', 'grade', 'description', 'nbr_patients', 'created_at', 'updated_at']
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
     user = UserSerializer()
 
     class Meta:
@@ -30,15 +110,19 @@ class PatientSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'created_at', 'updated_at']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('doctor__user', 'doctor__clinic')
     doctor = DoctorSerializer()
 
     class Meta:
         model = Appointment
         fields = ['id', 'doctor', 'patient', 'start_time', 'end_time', 'created_at', 'updated_at', 'status', 'qr_Code']
+        # Issued and signed on save (core.checkin); a client-chosen code could never check in
+        read_only_fields = ['qr_Code']
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
     user = UserSerializer()
 
     class Meta:
@@ -46,18 +130,19 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'title', 'description', 'date_creation', 'time_creation', 'type', 'created_at', 'updated_at']
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class FeedbackSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('patient__user', 'doctor__user', 'doctor__clinic')
     patient = PatientSerializer()
     doctor = DoctorSerializer()
 
     class Meta:
         model = Feedback
-        fields = ['id', 'title', 'description', 'patient', 'doctor', 'date_creation', 'time_creation', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'patient', 'doctor', 'rating', 'date_creation', 'time_creation', 'created_at', 'updated_at']
 
 
 
 
-class MedicationSerializer(serializers.ModelSerializer):
+class MedicationSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     prescription = serializers.PrimaryKeyRelatedField(queryset=Prescription.objects.all(), required=False, allow_null=True)
 
     class Meta:
@@ -65,7 +150,8 @@ class MedicationSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'dosage', 'prescription']
 
 
-class PrescriptionItemSerializer(serializers.ModelSerializer):
+class PrescriptionItemSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('medication',)
     prescription = serializers.PrimaryKeyRelatedField(queryset=Prescription.objects.all())
     medication = MedicationSerializer()
 
@@ -73,7 +159,8 @@ class PrescriptionItemSerializer(serializers.ModelSerializer):
         model = PrescriptionItem
         fields = ['prescription', 'medication', 'frequency', 'instructions']
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('items__medication',)
     patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.all())
     doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.all())
     items = PrescriptionItemSerializer(many=True, read_only=True)
@@ -82,7 +169,32 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         model = Prescription
         fields = ['id', 'patient', 'doctor', 'date', 'created_at', 'updated_at', 'items']
 
-class AvailabilitySerializer(serializers.ModelSerializer):
+class PrescriptionItemWriteSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    dosage = serializers.CharField(max_length=100)
+    frequency = serializers.CharField(max_length=100)
+    instructions = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class PrescriptionCreateSerializer(serializers.ModelSerializer):
+    """Writes a prescription and all of its items in one request"""
+    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.all())
+    doctor = serializers.PrimaryKeyRelatedField(queryset=Doctor.objects.all())
+    items = PrescriptionItemWriteSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Prescription
+        fields = ['id', 'patient', 'doctor', 'date', 'items']
+
+    def create(self, validated_data):
+        return create_prescription(**validated_data)
+
+    def to_representation(self, instance):
+        instance = PrescriptionSerializer.setup_eager_loading(Prescription.objects.filter(pk=instance.pk)).get()
+        return PrescriptionSerializer(instance).data
+
+class AvailabilitySerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('doctor_id__user', 'doctor_id__clinic')
     doctor_id = DoctorSerializer()
 
     class Meta:
@@ -90,9 +202,26 @@ class AvailabilitySerializer(serializers.ModelSerializer):
         fields = ['id', 'doctor_id', 'start_time', 'end_time', 'booked']
 
 
-class SocialMediaSerializer(serializers.ModelSerializer):
+class SocialMediaSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('doctor_id__user', 'doctor_id__clinic')
     doctor_id = DoctorSerializer()
 
     class Meta:
         model = SocialMedia
         fields = ['id', 'doctor_id', 'name', 'link']
+
+
+class SocialMediaLinkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SocialMedia
+        fields = ['id', 'name', 'link']
+
+
+class DoctorProfileSerializer(DoctorSerializer):
+    """Doctor card with social links and feedback count, as shown on the profile page"""
+    prefetch_related_fields = ('social_media',)
+    social_media = SocialMediaLinkSerializer(many=True, read_only=True)
+    feedback_count = serializers.IntegerField(read_only=True)
+
+    class Meta(DoctorSerializer.Meta):
+        fields = DoctorSerializer.Meta.fields + ['social_media', 'feedback_count']
@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .medications import medication_index
+from .models import Availability, Appointment, Prescription, Medication, PrescriptionItem
+from .schedule import open_slots
+
+
+class SlotUnavailable(Exception):
+    """The requested slot is already booked or being booked by someone else"""
+
+
+def search_slots(specialty=None, clinic=None, doctor=None, start=None, end=None, include_booked=False):
+    """Availability slots in a time window, soonest first.
+
+    Filters map onto the composite/partial availability indexes: open slots are
+    range-scanned on start_time and joined to doctors by specialty/clinic.
+    """
+    queryset = Availability.objects.all()
+    if not include_booked:
+        queryset = queryset.filter(booked=False)
+    queryset = queryset.filter(start_time__gte=start or timezone.now())
+    if end is not None:
+        queryset = queryset.filter(start_time__lt=end)
+    if doctor is not None:
+        queryset = queryset.filter(doctor_id=doctor)
+    if specialty:
+        queryset = queryset.filter(doctor_id__specialty=specialty)
+    if clinic is not None:
+        queryset = queryset.filter(doctor_id__clinic=clinic)
+    return queryset.order_by('start_time', 'id')
+
+
+def _claim(slot, patient):
+    # The conditional UPDATE re-checks `booked` under the row lock, which also
+    # keeps backends without SELECT ... FOR UPDATE (SQLite) from double-booking.
+    if not Availability.objects.filter(pk=slot.pk, booked=False).update(booked=True):
+        raise SlotUnavailable(slot.pk)
+    return Appointment.objects.create(
+        doctor_id=slot.doctor_id_id,
+        patient=patient,
+        start_time=slot.start_time,
+        end_time=slot.end_time,
+        status='confirmed',
+    )
+
+
+def book_slot(slot_id, patient):
+    """Atomically mark an availability slot as booked and create its appointment.
+
+    Concurrent callers never wait on each other: a slot locked by another
+    transaction is skipped and reported as unavailable straight away.
+    """
+    try:
+        with transaction.atomic():
+            slot = (
+                Availability.objects.select_for_update(skip_locked=True)
+                .filter(pk=slot_id, booked=False)
+                .first()
+            )
+            if slot is None:
+                raise SlotUnavailable(slot_id)
+            return _claim(slot, patient)
+    except IntegrityError:
+        raise SlotUnavailable(slot_id)
+
+
+def book_next_slot(doctor, patient, start=None):
+    """Book the earliest open slot of a doctor, skipping slots other requests hold"""
+    try:
+        with transaction.atomic():
+            slot = (
+                Availability.objects.select_for_update(skip_locked=True)
+                .filter(doctor_id=doctor, booked=False, start_time__gte=start or timezone.now())
+                .order_by('start_time')
+                .first()
+            )
+            if slot is None:
+                raise SlotUnavailable(None)
+            return _claim(slot, patient)
+    except IntegrityError:
+        raise SlotUnavailable(None)
+
+
+def book_rule_slot(doctor, start_time, patient):
+    """Book the slot generated from a doctor's recurring rules that starts at `start_time`.
+
+    There is no row to lock; the (doctor, start_time) unique constraint on
+    appointments settles concurrent bookings of the same slot.
+    """
+    slot = next(open_slots(start_time, start_time + timedelta(microseconds=1), doctor=doctor), None)
+    if slot is None:
+        raise SlotUnavailable(None)
+    try:
+        with transaction.atomic():
+            return Appointment.objects.create(
+                doctor_id=doctor, patient=patient, start_time=slot[0], end_time=slot[2], status='confirmed',
+            )
+    except IntegrityError:
+        raise SlotUnavailable(None)
+
+
+def _catalogue_medications(pairs):
+    lookup = Q()
+    for name, dosage in pairs:
+        lookup |= Q(name=name, dosage=dosage)
+    return {
+        (medication.name, medication.dosage): medication
+        for medication in Medication.objects.filter(lookup, prescription__isnull=True)
+    }
+
+
+def create_prescription(patient, doctor, date, items):
+    """Create a prescription with its medications and items in a constant number of queries.
+
+    `items` are dicts with name, dosage, frequency and optional instructions.
+    Medications are shared by (name, dosage): existing catalogue rows are
+    reused and only the missing ones are inserted, in one bulk_create.
+    """
+    pairs = {(item['name'], item['dosage']) for item in items}
+    with transaction.atomic():
+        prescription = Prescription.objects.create(patient=patient, doctor=doctor, date=date)
+        medications = _catalogue_medications(pairs)
+        missing = pairs - medications.keys()
+        if missing:
+            # Another request may insert the same medication concurrently, so
+            # skip conflicts and read the ids back instead of relying on RETURNING
+            Medication.objects.bulk_create(
+                [Medication(name=name, dosage=dosage) for name, dosage in missing], ignore_conflicts=True
+            )
+            medications.update(_catalogue_medications(missing))
+            medication_index.invalidate()
+        PrescriptionItem.objects.bulk_create([
+            PrescriptionItem(
+                prescription=prescription,
+                medication=medications[(item['name'], item['dosage'])],
+                frequency=item['frequency'],
+                instructions=item.get('instructions'),
+            )
+            for item in items
+        ])
+    return prescription
@@ -0,0 +1,122 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, cache, checkin, geo, search, sync
+from .medications import medication_index
+from .models import User, Clinic, Doctor, Feedback, SocialMedia, Appointment, Medication, Notification, Prescription
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+def doctor_changed(sender, instance, **kwargs):
+    cache.invalidate_doctor(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=SocialMedia)
+@receiver([post_save, post_delete], sender=Feedback)
+def doctor_relation_changed(sender, instance, **kwargs):
+    doctor_id = instance.doctor_id_id if sender is SocialMedia else instance.doctor_id
+    cache.invalidate_doctor(doctor_id)
+
+
+@receiver([post_save, post_delete], sender=Clinic)
+def clinic_changed(sender, instance, **kwargs):
+    cache.invalidate_all()
+    geo.invalidate_density()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Doctor cards embed the user, patients and admins never show up in them
+    if instance.role == 'doctor':
+        cache.invalidate_all()
+
+
+@receiver(pre_save, sender=Feedback)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = (
+        Feedback.objects.filter(pk=instance.pk).values_list('doctor_id', 'rating').first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Feedback)
+def feedback_saved(sender, instance, **kwargs):
+    previous_doctor, previous_rating = getattr(instance, '_previous_rating', None) or (None, None)
+    if previous_doctor == instance.doctor_id:
+        aggregates.apply_rating_change(
+            instance.doctor_id,
+            (instance.rating or 0) - (previous_rating or 0),
+            (instance.rating is not None) - (previous_rating is not None),
+        )
+        return
+    if previous_rating is not None:
+        aggregates.apply_rating_change(previous_doctor, -previous_rating, -1)
+    if instance.rating is not None:
+        aggregates.apply_rating_change(instance.doctor_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=Feedback)
+def feedback_deleted(sender, instance, **kwargs):
+    if instance.rating is not None:
+        aggregates.apply_rating_change(instance.doctor_id, -instance.rating, -1)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_status(sender, instance, **kwargs):
+    instance._previous_status = (
+        Appointment.objects.filter(pk=instance.pk).values_list('status', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def appointment_saved(sender, instance, **kwargs):
+    was_completed = getattr(instance, '_previous_status', None) == 'completed'
+    if was_completed != (instance.status == 'completed'):
+        aggregates.record_completion(instance, not was_completed)
+
+
+@receiver(post_delete, sender=Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        aggregates.record_completion(instance, False)
+
+
+@receiver([post_save, post_delete], sender=Medication)
+def medication_changed(sender, instance, **kwargs):
+    medication_index.invalidate()
+
+
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=Prescription)
+@receiver(post_delete, sender=Feedback)
+def synced_row_deleted(sender, instance, **kwargs):
+    sync.record_deletion(instance)
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, **kwargs):
+    search.refresh_search_text(Doctor.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=User)
+def doctor_user_saved(sender, instance, **kwargs):
+    if instance.role == 'doctor':
+        search.refresh_search_text(Doctor.objects.filter(user=instance))
+
+
+@receiver(post_save, sender=Clinic)
+def clinic_saved(sender, instance, **kwargs):
+    search.refresh_search_text(Doctor.objects.filter(clinic=instance))
+
+
+@receiver(pre_save, sender=Clinic)
+def fill_clinic_coordinates(sender, instance, **kwargs):
+    if instance.latitude is None or instance.longitude is None:
+        instance.latitude, instance.longitude = geo.parse_coordinates(instance.map_location) or (None, None)
+
+
+@receiver(pre_save, sender=Appointment)
+def issue_check_in_token(sender, instance, **kwargs):
+    if not instance.qr_Code:
+        instance.qr_Code = checkin.generate_token()
@@ -0,0 +1,158 @@
+"""Incremental sync for offline clients.
+
+Every synced model is read in (updated_at, id) keyset order over its
+updated_at index, starting from the watermark the client sent back from its
+previous sync. Rows are returned as positional lists next to a single field
+list, and deletions come from `SyncTombstone` rows written by a post_delete
+signal, one per user who can see the deleted row. Rows changed through
+queryset.update() must bump `updated_at` themselves to be picked up.
+
+`updated_at` and tombstone ids are assigned before commit, so a transaction
+can commit after one stamped later and the client's watermark would already
+be past it. Feeds therefore stop SYNC_SAFETY_LAG seconds before now, longer
+than any transaction writing synced rows; changes reach clients that much
+later instead of never.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Appointment, Doctor, Feedback, Notification, Patient, Prescription, SyncTombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+def _patient_or_doctor(user_id):
+    return Q(patient__user_id=user_id) | Q(doctor__user_id=user_id)
+
+
+def _patient_and_doctor_users(instance):
+    patients = Patient.objects.filter(pk=instance.patient_id).values_list('user_id', flat=True)
+    doctors = Doctor.objects.filter(pk=instance.doctor_id).values_list('user_id', flat=True)
+    return list(patients.union(doctors))
+
+
+# name -> (model, fields sent to clients, rows visible to a user, users who can see an instance; None for everyone)
+SYNCED_MODELS = {
+    'doctors': (
+        Doctor,
+        ('id', 'user_id', 'user__name', 'photo', 'specialty', 'clinic_id', 'clinic__name', 'grade', 'description', 'nbr_patients', 'updated_at'),
+        None,
+        None,
+    ),
+    'appointments': (
+        Appointment,
+        ('id', 'doctor_id', 'patient_id', 'start_time', 'end_time', 'status', 'qr_Code', 'updated_at'),
+        _patient_or_doctor,
+        _patient_and_doctor_users,
+    ),
+    'notifications': (
+        Notification,
+        ('id', 'user_id', 'title', 'description', 'type', 'date_creation', 'time_creation', 'updated_at'),
+        lambda user_id: Q(user_id=user_id),
+        lambda instance: [instance.user_id],
+    ),
+    'prescriptions': (
+        Prescription,
+        ('id', 'patient_id', 'doctor_id', 'date', 'updated_at'),
+        _patient_or_doctor,
+        _patient_and_doctor_users,
+    ),
+    'feedback': (
+        Feedback,
+        ('id', 'title', 'description', 'patient_id', 'doctor_id', 'rating', 'date_creation', 'time_creation', 'updated_at'),
+        _patient_or_doctor,
+        _patient_and_doctor_users,
+    ),
+}
+SYNCED_LABELS = {model: name for name, (model, *_) in SYNCED_MODELS.items()}
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+
+def format_watermark(updated_at, pk):
+    return f'{updated_at.isoformat()}|{pk}'
+
+
+def parse_watermark(value):
+    """Inverse of format_watermark; an empty watermark means "from the beginning" """
+    if not value:
+        return None
+    timestamp, _, pk = value.rpartition('|')
+    try:
+        updated_at = parse_datetime(timestamp)
+    except ValueError:
+        raise InvalidWatermark(value)
+    if updated_at is None or not pk.isdigit():
+        raise InvalidWatermark(value)
+    if timezone.is_naive(updated_at):
+        updated_at = timezone.make_aware(updated_at)
+    return updated_at, int(pk)
+
+
+def horizon():
+    """Latest time whose writes are known to be committed"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SAFETY_LAG', 10))
+
+
+def changes_since(name, watermark, user_id=None, limit=DEFAULT_LIMIT):
+    """Rows of one synced model changed after `watermark`, oldest first"""
+    model, fields, scope, _ = SYNCED_MODELS[name]
+    queryset = model.objects.filter(updated_at__lte=horizon())
+    if user_id is not None and scope is not None:
+        queryset = queryset.filter(scope(user_id))
+    if watermark is not None:
+        updated_at, pk = watermark
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    # One extra row tells the client whether to come back for more
+    rows = list(queryset.order_by('updated_at', 'pk').values_list(*fields)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        # updated_at is always the last field
+        watermark = (rows[-1][-1], rows[-1][0])
+    return {
+        'fields': [field.replace('__', '_') for field in fields],
+        'rows': [list(row) for row in rows],
+        'watermark': format_watermark(*watermark) if watermark else None,
+        'more': more,
+    }
+
+
+def deletions_since(names, after, user_id=None, limit=MAX_LIMIT):
+    """Ids deleted after tombstone `after`, grouped by model name.
+
+    With `user_id` only deletions of rows that user could see are returned. A
+    client without a tombstone watermark has just downloaded everything, so
+    it only needs the current position.
+    """
+    tombstones = SyncTombstone.objects.filter(model__in=names, deleted_at__lte=horizon())
+    if user_id is not None:
+        tombstones = tombstones.filter(Q(owner_id__isnull=True) | Q(owner_id=user_id))
+    if after is None:
+        return {}, tombstones.order_by('-id').values_list('id', flat=True).first() or 0, False
+    rows = list(tombstones.filter(id__gt=after).order_by('id').values_list('id', 'model', 'object_id')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    deleted = {}
+    for _, name, object_id in rows:
+        deleted.setdefault(name, {})[object_id] = None
+    # Unscoped feeds see one tombstone per owner of a row
+    return {name: list(ids) for name, ids in deleted.items()}, rows[-1][0] if rows else after, more
+
+
+def record_deletion(instance):
+    name = SYNCED_LABELS[type(instance)]
+    owners = SYNCED_MODELS[name][3]
+    if owners is None:
+        SyncTombstone.objects.create(model=name, object_id=instance.pk)
+        return
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(model=name, object_id=instance.pk, owner_id=owner_id) for owner_id in owners(instance)
+    ])
@@ -1,3 +1,1351 @@
-from django.test import TestCase
+import json
+import math
+import tempfile
+import threading
+from io import StringIO
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from time import sleep
 
-# Create your tests here.
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipIf, skipUnless
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import User, Clinic, Doctor, Patient, Appointment, AppointmentArchive, AvailabilityException, AvailabilityRule, Notification, NotificationArchive, SyncTombstone, Feedback, Prescription, Medication, PrescriptionItem, Availability, SocialMedia
+from .archive import archive
+from .cache import get_cache, stats as cache_stats
+from .coalescing import coalesce
+from .notifications import NotificationDispatcher, build_notification, schedule_appointment_reminders
+from .calendar import merge_intervals, subtract_intervals
+from .medications import medication_index, search_medications
+from .renderers import ORJSONRenderer, orjson
+from .schedule import open_slots
+from . import geo, search
+from .pagination import EstimatedCountPaginator, estimate_rows
+from .search import search_doctors
+from .geo import haversine_km, nearest_clinics, parse_coordinates
+from .checkin import generate_token, is_signed
+from .instrumentation import registry as performance_registry
+from .serializers import AppointmentSerializer
+from .services import SlotUnavailable, book_next_slot, book_slot, create_prescription
+from .throttling import WindowRateThrottle
+
+
+class UserEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', role='patient')
+            for i in range(25)
+        ])
+
+    def test_cursor_pagination_walks_every_user_once(self):
+        url = reverse('get_users') + '?page_size=10'
+        seen = []
+        while url:
+            body = self.client.get(url).json()
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+        self.assertEqual(seen, list(User.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_export_streams_all_users(self):
+        response = self.client.get(reverse('export_users'))
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0]['username'], 'user0')
+
+
+class SlotSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        clinic = Clinic.objects.create(name='Central', address='1 Main St')
+        cls.cardiologist = Doctor.objects.create(
+            user=User.objects.create(username='cardio', email='cardio@example.com', role='doctor'),
+            specialty='Cardiology', clinic=clinic,
+        )
+        dermatologist = Doctor.objects.create(
+            user=User.objects.create(username='derma', email='derma@example.com', role='doctor'),
+            specialty='Dermatology', clinic=clinic,
+        )
+        start = timezone.now() + timedelta(days=1)
+        for doctor in (cls.cardiologist, dermatologist):
+            for hour in range(4):
+                Availability.objects.create(
+                    doctor_id=doctor,
+                    start_time=start + timedelta(hours=hour),
+                    end_time=start + timedelta(hours=hour, minutes=30),
+                    booked=hour == 0,
+                )
+
+    def test_filters_by_specialty_and_skips_booked_slots(self):
+        body = self.client.get(reverse('search_slots'), {'specialty': 'Cardiology'}).json()
+        self.assertEqual(len(body['results']), 3)
+        self.assertTrue(all(row['doctor_id']['id'] == self.cardiologist.id for row in body['results']))
+        starts = [row['start_time'] for row in body['results']]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_time_window_and_invalid_datetime(self):
+        end = (timezone.now() + timedelta(hours=1)).isoformat()
+        body = self.client.get(reverse('search_slots'), {'end': end}).json()
+        self.assertEqual(body['results'], [])
+        response = self.client.get(reverse('search_slots'), {'start': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('search_slots'), {'start': '2026-02-30T10:00'})
+        self.assertEqual(response.status_code, 400)
+
+
+def make_doctor_with_slots(slots, username='booking-doctor'):
+    doctor = Doctor.objects.create(
+        user=User.objects.create(username=username, email=f'{username}@example.com', role='doctor'),
+        specialty='Cardiology',
+    )
+    start = timezone.now() + timedelta(days=1)
+    for i in range(slots):
+        Availability.objects.create(
+            doctor_id=doctor,
+            start_time=start + timedelta(minutes=30 * i),
+            end_time=start + timedelta(minutes=30 * (i + 1)),
+        )
+    return doctor
+
+
+def make_patients(count, prefix='patient'):
+    return [
+        Patient.objects.create(user=User.objects.create(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', role='patient'))
+        for i in range(count)
+    ]
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(2)
+        self.first, self.second = make_patients(2)
+        self.slot = self.doctor.availabilities.order_by('start_time').first()
+
+    def test_slot_can_only_be_booked_once(self):
+        appointment = book_slot(self.slot.id, self.first)
+        self.assertEqual(appointment.start_time, self.slot.start_time)
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.booked)
+        with self.assertRaises(SlotUnavailable):
+            book_slot(self.slot.id, self.second)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_book_next_slot_moves_on_to_the_following_slot(self):
+        first = book_next_slot(self.doctor, self.first)
+        second = book_next_slot(self.doctor, self.second)
+        self.assertLess(first.start_time, second.start_time)
+        with self.assertRaises(SlotUnavailable):
+            book_next_slot(self.doctor, self.first)
+
+    def test_booking_endpoint_reports_conflicts(self):
+        url = reverse('book_appointment')
+        response = self.client.post(url, {'slot': self.slot.id, 'patient': self.first.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(url, {'slot': self.slot.id, 'patient': self.second.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(url, {'slot': [self.slot.id], 'patient': self.second.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, 'needs SELECT ... FOR UPDATE SKIP LOCKED')
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_concurrent_bookings_never_share_a_slot(self):
+        doctor = make_doctor_with_slots(10)
+        patients = make_patients(40)
+
+        def attempt(patient):
+            try:
+                return book_next_slot(doctor, patient).start_time
+            except SlotUnavailable:
+                return None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            booked = [start for start in pool.map(attempt, patients) if start]
+        self.assertEqual(len(booked), len(set(booked)))
+        self.assertEqual(Appointment.objects.filter(doctor=doctor).count(), doctor.availabilities.filter(booked=True).count())
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must issue the same number of queries whatever the page size"""
+
+    endpoints = [
+        'get_doctors', 'get_patients', 'get_appointments', 'get_notifications', 'get_feedback',
+        'get_prescriptions', 'get_availabilities', 'get_social_media',
+    ]
+
+    def populate(self, count, prefix):
+        clinic = Clinic.objects.create(name=f'{prefix} clinic', address='1 Main St')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(count):
+            doctor = Doctor.objects.create(
+                user=User.objects.create(username=f'{prefix}-doc{i}', email=f'{prefix}-doc{i}@example.com', role='doctor'),
+                specialty='Cardiology', clinic=clinic,
+            )
+            patient = Patient.objects.create(
+                user=User.objects.create(username=f'{prefix}-pat{i}', email=f'{prefix}-pat{i}@example.com', role='patient'),
+            )
+            slot_start = start + timedelta(hours=i)
+            Appointment.objects.create(doctor=doctor, patient=patient, start_time=slot_start, end_time=slot_start + timedelta(minutes=30))
+            Availability.objects.create(doctor_id=doctor, start_time=slot_start, end_time=slot_start + timedelta(minutes=30))
+            SocialMedia.objects.create(doctor_id=doctor, name='Twitter', link='https://twitter.com/doc')
+            today = timezone.now()
+            Notification.objects.create(user=patient.user, title='Reminder', description='Soon', date_creation=today.date(), time_creation=today.time(), type='reminder')
+            Feedback.objects.create(title='Great', description='Kind', patient=patient, doctor=doctor, date_creation=today.date(), time_creation=today.time())
+            prescription = Prescription.objects.create(patient=patient, doctor=doctor, date=today.date())
+            for _ in range(2):
+                medication = Medication.objects.create(name='Aspirin', dosage='100mg', prescription=prescription)
+                PrescriptionItem.objects.create(prescription=prescription, medication=medication, frequency='daily')
+
+    def count_queries(self, name):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(name), {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), len(response.json()['results'])
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_query_count_is_independent_of_list_size(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.populate(2, 'small')
+        small = {name: self.count_queries(name) for name in self.endpoints}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.populate(10, 'large')
+        get_cache().clear()
+        for name in self.endpoints:
+            with self.subTest(endpoint=name):
+                queries, rows = self.count_queries(name)
+                self.assertGreater(rows, small[name][1])
+                self.assertEqual(queries, small[name][0])
+
+
+class DoctorCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        cache_stats.reset()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clinic = Clinic.objects.create(name='Central', address='1 Main St')
+            self.doctor = Doctor.objects.create(
+                user=User.objects.create(username='doc', email='doc@example.com', role='doctor'),
+                specialty='Cardiology', clinic=self.clinic,
+            )
+
+    def test_directory_is_served_from_cache_until_a_doctor_changes(self):
+        url = reverse('get_doctors')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['results'][0]['specialty'], 'Cardiology')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.specialty = 'Neurology'
+            self.doctor.save()
+        self.assertEqual(self.client.get(url).json()['results'][0]['specialty'], 'Neurology')
+        self.assertEqual(cache_stats.snapshot()['directory']['hits'], 1)
+        self.assertEqual(cache_stats.snapshot()['directory']['misses'], 2)
+
+    def test_directory_pages_are_keyed_by_filters(self):
+        url = reverse('get_doctors')
+        self.assertEqual(len(self.client.get(url, {'specialty': 'Cardiology'}).json()['results']), 1)
+        self.assertEqual(len(self.client.get(url, {'specialty': 'Neurology'}).json()['results']), 0)
+
+    def test_profile_is_invalidated_by_feedback_and_clinic_changes(self):
+        url = reverse('get_doctor', args=[self.doctor.pk])
+        self.assertEqual(self.client.get(url).json()['feedback_count'], 0)
+        patient = make_patients(1)[0]
+        today = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(title='Great', description='Kind', patient=patient, doctor=self.doctor, date_creation=today.date(), time_creation=today.time())
+        self.assertEqual(self.client.get(url).json()['feedback_count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clinic.name = 'Renamed'
+            self.clinic.save()
+        self.assertEqual(self.client.get(url).json()['clinic']['name'], 'Renamed')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+class DoctorAggregateTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(0)
+        self.patients = make_patients(2)
+        self.today = timezone.now()
+
+    def feedback(self, patient, rating):
+        return Feedback.objects.create(
+            title='Visit', description='Notes', patient=patient, doctor=self.doctor, rating=rating,
+            date_creation=self.today.date(), time_creation=self.today.time(),
+        )
+
+    def appointment(self, patient, hours):
+        start = self.today + timedelta(hours=hours)
+        return Appointment.objects.create(doctor=self.doctor, patient=patient, start_time=start, end_time=start + timedelta(minutes=30), status='confirmed')
+
+    def test_grade_follows_feedback_writes(self):
+        first = self.feedback(self.patients[0], 4)
+        second = self.feedback(self.patients[1], 2)
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.rating_count, self.doctor.grade), (2, 3.0))
+        first.rating = 5
+        first.save()
+        second.delete()
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.rating_count, self.doctor.grade), (1, 5.0))
+        first.delete()
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.rating_count, self.doctor.grade), (0, 0.0))
+
+    def test_nbr_patients_counts_distinct_patients_with_completed_appointments(self):
+        visits = [self.appointment(self.patients[0], 1), self.appointment(self.patients[0], 2), self.appointment(self.patients[1], 3)]
+        for visit in visits:
+            visit.status = 'completed'
+            visit.save()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 2)
+        visits[0].delete()
+        visits[2].delete()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 1)
+
+    def test_archived_visits_keep_the_patient_counted(self):
+        start = self.today - timedelta(days=400)
+        AppointmentArchive.objects.create(
+            id=10_000, doctor=self.doctor, patient=self.patients[0], status='completed',
+            start_time=start, end_time=start + timedelta(minutes=30), created_at=start, updated_at=start,
+        )
+        Doctor.objects.filter(pk=self.doctor.pk).update(nbr_patients=1)
+        visit = self.appointment(self.patients[0], 1)
+        visit.status = 'completed'
+        visit.save()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 1)
+        visit.delete()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 1)
+
+    def test_checker_detects_drift_and_rebuild_repairs_it(self):
+        self.feedback(self.patients[0], 3)
+        call_command('check_doctor_aggregates', stdout=StringIO())
+        Doctor.objects.filter(pk=self.doctor.pk).update(grade=1.0, nbr_patients=7)
+        with self.assertRaises(CommandError):
+            call_command('check_doctor_aggregates', stdout=StringIO())
+        call_command('rebuild_doctor_aggregates', stdout=StringIO())
+        call_command('check_doctor_aggregates', stdout=StringIO())
+        self.doctor.refresh_from_db()
+        self.assertEqual((self.doctor.grade, self.doctor.nbr_patients), (3.0, 0))
+
+
+@skipUnless(connection.features.has_select_for_update, 'needs SELECT ... FOR UPDATE')
+class ConcurrentCompletionTests(TransactionTestCase):
+    def test_first_visits_completing_together_count_the_patient_once(self):
+        doctor = make_doctor_with_slots(0)
+        patient = make_patients(1)[0]
+        start = timezone.now()
+        visits = [
+            Appointment.objects.create(
+                doctor=doctor, patient=patient, status='confirmed',
+                start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i, minutes=30),
+            )
+            for i in range(4)
+        ]
+
+        def complete(visit):
+            try:
+                visit.status = 'completed'
+                visit.save()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(complete, visits))
+        doctor.refresh_from_db()
+        self.assertEqual(doctor.nbr_patients, 1)
+
+
+class PrescriptionCreateTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(0)
+        self.patient = make_patients(1)[0]
+
+    def post(self, items):
+        payload = {'patient': self.patient.id, 'doctor': self.doctor.id, 'date': '2025-05-01', 'items': items}
+        return self.client.post(reverse('create_prescription'), payload, content_type='application/json')
+
+    def items(self, count):
+        return [{'name': f'Drug {i}', 'dosage': '10mg', 'frequency': 'daily'} for i in range(count)]
+
+    def test_creates_items_and_reuses_medications(self):
+        response = self.post(self.items(3) + [{'name': 'Drug 0', 'dosage': '10mg', 'frequency': 'at night'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['items']), 4)
+        self.assertEqual(Medication.objects.count(), 3)
+        self.post(self.items(5))
+        self.assertEqual(Medication.objects.count(), 5)
+        self.assertEqual(PrescriptionItem.objects.count(), 9)
+
+    def test_query_count_does_not_depend_on_item_count(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.items(2))
+        with CaptureQueriesContext(connection) as large:
+            self.post([{'name': f'Other {i}', 'dosage': '5mg', 'frequency': 'daily'} for i in range(20)])
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_rejects_empty_items(self):
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class MedicationSearchTests(TestCase):
+    def setUp(self):
+        medication_index.invalidate()
+        for name, dosage in [
+            ('Amoxicillin', '250mg'), ('Amoxicillin', '500mg'), ('Amlodipine', '5mg'),
+            ('Folic Acid', '5mg'), ('Paracetamol', '1g'), ('Ibuprofen', '400mg'),
+        ]:
+            Medication.objects.create(name=name, dosage=dosage)
+
+    def names(self, query, limit=10):
+        return [row['name'] for row in search_medications(query, limit)]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(self.names('amo'), ['Amoxicillin', 'Amoxicillin'])
+        self.assertEqual(self.names('AM', limit=2), ['Amlodipine', 'Amoxicillin'])
+        self.assertEqual(self.names('acid'), ['Folic Acid'])
+
+    def test_fuzzy_matches_tolerate_typos(self):
+        self.assertIn('Paracetamol', self.names('paracetmol'))
+        self.assertEqual(self.names('zzzz'), [])
+
+    def test_new_catalogue_entries_are_searchable(self):
+        self.assertEqual(self.names('cetir'), [])
+        before = medication_index._current()
+        Medication.objects.create(name='Cetirizine', dosage='10mg')
+        self.assertEqual(self.names('cetir'), ['Cetirizine'])
+        # A search still holding the previous snapshot sees it whole
+        self.assertIsNot(medication_index._current(), before)
+        self.assertNotIn('cetirizine', before.names)
+        self.assertEqual(len(before.groups), len(before.names))
+
+    def test_endpoint_returns_ids_and_dosages(self):
+        rows = self.client.get(reverse('search_medications'), {'q': 'ibu'}).json()
+        self.assertEqual([(row['name'], row['dosage']) for row in rows], [('Ibuprofen', '400mg')])
+        rows = self.client.get(reverse('search_medications'), {'q': 'am', 'limit': -1}).json()
+        self.assertEqual([row['name'] for row in rows], ['Amlodipine'])
+
+
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(0)
+        self.patients = make_patients(3)
+
+    def test_drain_writes_queued_notifications_in_batches(self):
+        dispatcher = NotificationDispatcher(workers=0, batch_size=2)
+        for patient in self.patients:
+            self.assertTrue(dispatcher.enqueue(build_notification(patient.user_id, 'Hello', 'Body', 'info')))
+        self.assertEqual(dispatcher.metrics()['queue_depth'], 3)
+        with self.assertNumQueries(2):
+            dispatcher.drain()
+        metrics = dispatcher.metrics()
+        self.assertEqual((metrics['inserted'], metrics['batches'], metrics['queue_depth']), (3, 2, 0))
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_full_queue_rejects_instead_of_blocking(self):
+        dispatcher = NotificationDispatcher(workers=0, max_queue=1)
+        self.assertTrue(dispatcher.enqueue(build_notification(self.patients[0].user_id, 'a', 'b', 'info'), timeout=0))
+        self.assertFalse(dispatcher.enqueue(build_notification(self.patients[0].user_id, 'a', 'b', 'info'), timeout=0))
+        self.assertEqual(dispatcher.metrics()['rejected'], 1)
+
+    def test_reminders_are_scheduled_once_per_upcoming_appointment(self):
+        now = timezone.now()
+        for hours, patient in zip((2, 5, 30), self.patients):
+            Appointment.objects.create(
+                doctor=self.doctor, patient=patient, status='confirmed',
+                start_time=now + timedelta(hours=hours), end_time=now + timedelta(hours=hours, minutes=30),
+            )
+        self.assertEqual(schedule_appointment_reminders(now=now, batch_size=1), 2)
+        self.assertEqual(schedule_appointment_reminders(now=now), 0)
+        reminded = set(Notification.objects.filter(type='appointment_reminder').values_list('user_id', flat=True))
+        self.assertEqual(reminded, {self.patients[0].user_id, self.patients[1].user_id})
+
+    def test_reminders_are_not_flagged_when_writing_them_fails(self):
+        now = timezone.now()
+        Appointment.objects.create(
+            doctor=self.doctor, patient=self.patients[0], status='confirmed',
+            start_time=now + timedelta(hours=2), end_time=now + timedelta(hours=2, minutes=30),
+        )
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                schedule_appointment_reminders(now=now)
+        self.assertFalse(Appointment.objects.filter(reminder_sent_at__isnull=False).exists())
+        self.assertEqual(schedule_appointment_reminders(now=now), 1)
+
+
+class NotificationWorkerTests(TransactionTestCase):
+    def dispatch(self, workers):
+        user = User.objects.create(username='worker-target', email='worker-target@example.com', role='patient')
+        dispatcher = NotificationDispatcher(workers=workers, batch_size=25, flush_interval=0.05)
+        for i in range(100):
+            dispatcher.enqueue(build_notification(user.id, f'Note {i}', 'Body', 'info'))
+        dispatcher.stop()
+        self.assertEqual(Notification.objects.filter(user=user).count(), 100)
+        self.assertEqual(dispatcher.metrics()['failed'], 0)
+
+    def test_worker_thread_writes_everything_before_stopping(self):
+        self.dispatch(workers=1)
+
+    # The in-memory SQLite test database locks whole tables, so concurrent writers fail at once
+    @skipIf(connection.vendor == 'sqlite', 'needs a database that takes concurrent writes')
+    def test_worker_threads_write_everything_before_stopping(self):
+        self.dispatch(workers=2)
+
+
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        clinic = Clinic.objects.create(name='Central', address='1 Main St')
+        for i in range(5):
+            Doctor.objects.create(
+                user=User.objects.create(username=f'async-doc{i}', email=f'async-doc{i}@example.com', role='doctor'),
+                specialty='Cardiology' if i % 2 else 'Neurology', clinic=clinic,
+            )
+
+    async def test_keyset_pages_cover_every_doctor(self):
+        url = reverse('async_get_doctors') + '?page_size=2'
+        seen = []
+        while url:
+            body = (await self.async_client.get(url)).json()
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+        expected = [pk async for pk in Doctor.objects.order_by('pk').values_list('pk', flat=True)]
+        self.assertEqual(seen, expected)
+
+    async def test_filters_and_detail(self):
+        body = (await self.async_client.get(reverse('async_get_doctors'), {'specialty': 'Cardiology'})).json()
+        self.assertEqual(len(body['results']), 2)
+        doctor = await Doctor.objects.afirst()
+        response = await self.async_client.get(reverse('async_get_doctor', args=[doctor.pk]))
+        self.assertEqual(response.json()['feedback_count'], 0)
+        response = await self.async_client.get(reverse('async_get_doctor', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_users_and_notifications(self):
+        body = (await self.async_client.get(reverse('async_get_users'))).json()
+        self.assertEqual(len(body['results']), 5)
+        body = (await self.async_client.get(reverse('async_get_notifications'), {'user': 1})).json()
+        self.assertEqual(body, {'next': None, 'results': []})
+
+
+class DoctorCalendarTests(TestCase):
+    def test_interval_helpers(self):
+        self.assertEqual(merge_intervals([(5, 7), (1, 3), (2, 4), (7, 8)]), [(1, 4), (5, 8)])
+        self.assertEqual(subtract_intervals([(0, 10), (12, 14)], [(2, 3), (5, 13)]), [(0, 2), (3, 5), (13, 14)])
+        self.assertEqual(subtract_intervals([(0, 4)], []), [(0, 4)])
+
+    def test_clinic_calendar_merges_slots_and_appointments_in_constant_queries(self):
+        clinic = Clinic.objects.create(name='Central', address='1 Main St')
+        doctors = []
+        for i in range(3):
+            doctor = make_doctor_with_slots(0, username=f'calendar-doc{i}')
+            doctor.clinic = clinic
+            doctor.save()
+            doctors.append(doctor)
+        day = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for doctor in doctors:
+            for hour in range(4):
+                Availability.objects.create(
+                    doctor_id=doctor, start_time=day + timedelta(hours=hour),
+                    end_time=day + timedelta(hours=hour + 1), booked=hour == 1,
+                )
+        patient = make_patients(1)[0]
+        Appointment.objects.create(
+            doctor=doctors[0], patient=patient, start_time=day + timedelta(hours=2, minutes=30),
+            end_time=day + timedelta(hours=3), status='confirmed',
+        )
+        params = {'clinic': clinic.id, 'start': day.isoformat(), 'end': (day + timedelta(days=1)).isoformat()}
+        # Doctors, appointments, slots and recurring rules
+        with self.assertNumQueries(4):
+            body = self.client.get(reverse('doctor_calendar'), params).json()
+        calendars = {row['doctor']: row for row in body['doctors']}
+        first = calendars[doctors[0].id]
+        self.assertEqual(len(first['busy']), 2)
+        self.assertEqual(len(first['free']), 3)
+        self.assertEqual(len(calendars[doctors[1].id]['free']), 2)
+
+    def test_requires_a_window_and_doctors(self):
+        self.assertEqual(self.client.get(reverse('doctor_calendar'), {'doctor': 1}).status_code, 400)
+        now = timezone.now()
+        params = {'start': now.isoformat(), 'end': (now + timedelta(days=1)).isoformat()}
+        self.assertEqual(self.client.get(reverse('doctor_calendar'), params).status_code, 400)
+
+
+@override_settings(SYNC_SAFETY_LAG=0)
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor_with_slots(0, username='sync-doctor')
+        cls.patients = make_patients(2, prefix='sync-patient')
+        for patient in cls.patients:
+            for i in range(3):
+                build_notification(patient.user_id, f'Note {i}', 'Body', 'info').save()
+
+    def sync(self, **params):
+        return self.client.get(reverse('sync'), params).json()
+
+    def test_initial_sync_then_only_deltas(self):
+        user_id = self.patients[0].user_id
+        first = self.sync(user=user_id, models='notifications,doctors')
+        notifications = first['changes']['notifications']
+        self.assertEqual(len(notifications['rows']), 3)
+        self.assertEqual(notifications['fields'][-1], 'updated_at')
+        self.assertEqual(first['deleted'], {})
+
+        watermarks = {name: first['changes'][name]['watermark'] for name in ('notifications', 'doctors')}
+        again = self.sync(user=user_id, models='notifications,doctors', deleted=first['deleted_watermark'], **watermarks)
+        self.assertEqual(again['changes']['notifications']['rows'], [])
+        self.assertEqual(again['changes']['doctors']['watermark'], watermarks['doctors'])
+
+        note = Notification.objects.filter(user_id=user_id).first()
+        note.title = 'Edited'
+        note.save()
+        Notification.objects.filter(user_id=user_id).exclude(pk=note.pk).first().delete()
+        delta = self.sync(user=user_id, models='notifications,doctors', deleted=first['deleted_watermark'], **watermarks)
+        rows = delta['changes']['notifications']['rows']
+        self.assertEqual([row[0] for row in rows], [note.pk])
+        self.assertEqual(len(delta['deleted']['notifications']), 1)
+        self.assertGreater(delta['deleted_watermark'], first['deleted_watermark'])
+
+    def test_paging_through_changes_with_the_watermark(self):
+        seen = []
+        params = {'models': 'notifications', 'limit': 2}
+        while True:
+            body = self.sync(**params)['changes']['notifications']
+            seen.extend(row[0] for row in body['rows'])
+            params['notifications'] = body['watermark']
+            if not body['more']:
+                break
+        self.assertEqual(sorted(seen), sorted(Notification.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_rating_changes_bump_the_doctor_watermark(self):
+        watermark = self.sync(models='doctors')['changes']['doctors']['watermark']
+        Feedback.objects.create(
+            title='Great', description='', patient=self.patients[0], doctor=self.doctor, rating=5,
+            date_creation=timezone.now().date(), time_creation=timezone.now().time(),
+        )
+        rows = self.sync(models='doctors', doctors=watermark)['changes']['doctors']['rows']
+        self.assertEqual([row[0] for row in rows], [self.doctor.pk])
+
+    def test_rejects_unknown_models_and_bad_watermarks(self):
+        self.assertEqual(self.client.get(reverse('sync'), {'models': 'users'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('sync'), {'models': 'doctors', 'doctors': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('sync'), {'models': 'doctors', 'doctors': '2026-02-30T00:00:00|1'}).status_code, 400)
+        body = self.sync(models='notifications', limit=-2)['changes']['notifications']
+        self.assertEqual((len(body['rows']), body['more']), (1, True))
+
+    def test_deletions_are_scoped_to_the_users_who_could_see_them(self):
+        first, second = self.patients
+        start = timezone.now() + timedelta(days=1)
+        appointment = Appointment.objects.create(
+            doctor=self.doctor, patient=first, status='confirmed', start_time=start, end_time=start + timedelta(minutes=30),
+        )
+        positions = {patient: self.sync(user=patient.user_id)['deleted_watermark'] for patient in self.patients}
+        appointment_id = appointment.pk
+        appointment.delete()
+        Notification.objects.filter(user_id=second.user_id).first().delete()
+        self.assertEqual(set(self.sync(user=first.user_id, deleted=positions[first])['deleted']), {'appointments'})
+        self.assertEqual(set(self.sync(user=second.user_id, deleted=positions[second])['deleted']), {'notifications'})
+        doctor_view = self.sync(user=self.doctor.user_id, deleted=positions[first])['deleted']
+        self.assertEqual(doctor_view, {'appointments': [appointment_id]})
+        # Unscoped feeds list the appointment once, not once per owner
+        self.assertEqual(self.sync(deleted=positions[first])['deleted']['appointments'], [appointment_id])
+
+    @override_settings(SYNC_SAFETY_LAG=60)
+    def test_feeds_stay_behind_writes_that_may_still_be_uncommitted(self):
+        self.assertEqual(self.sync(models='notifications')['changes']['notifications']['rows'], [])
+        Notification.objects.update(updated_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(len(self.sync(models='notifications')['changes']['notifications']['rows']), 6)
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor_with_slots(5, username='sparse-doctor')
+        patient = make_patients(1, prefix='sparse-patient')[0]
+        create_prescription(patient, cls.doctor, timezone.now().date(), [
+            {'name': 'Amoxicillin', 'dosage': '500mg', 'frequency': 'daily'},
+            {'name': 'Ibuprofen', 'dosage': '200mg', 'frequency': 'as needed'},
+        ])
+
+    def test_full_output_is_unchanged_without_parameters(self):
+        row = self.client.get(reverse('get_availabilities')).json()['results'][0]
+        self.assertEqual(row['doctor_id']['user']['username'], 'sparse-doctor')
+
+    def test_compact_mode_collapses_relations_to_ids(self):
+        with self.assertNumQueries(1):
+            row = self.client.get(reverse('get_availabilities'), {'expand': ''}).json()['results'][0]
+        self.assertEqual(row['doctor_id'], self.doctor.pk)
+        row = self.client.get(reverse('get_availabilities'), {'expand': 'doctor_id'}).json()['results'][0]
+        self.assertEqual(row['doctor_id']['user'], self.doctor.user_id)
+        self.assertEqual(row['doctor_id']['specialty'], 'Cardiology')
+
+    def test_fields_select_columns_at_any_depth(self):
+        row = self.client.get(reverse('get_availabilities'), {'fields': 'id,doctor_id.specialty'}).json()['results'][0]
+        self.assertEqual(row, {'id': row['id'], 'doctor_id': {'specialty': 'Cardiology'}})
+
+    def test_collapsed_to_many_relations_are_prefetched(self):
+        with self.assertNumQueries(2):
+            row = self.client.get(reverse('get_prescriptions'), {'fields': 'id,items'}).json()['results'][0]
+        self.assertEqual(len(row['items']), 2)
+        self.assertIsInstance(row['items'][0], int)
+
+    @skipUnless(orjson, 'orjson is not installed')
+    def test_orjson_renderer_matches_the_default_renderer(self):
+        data = {'when': timezone.now(), 'rows': [{'id': 1, 'name': 'Zoë'}], 1: None}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    @skipUnless(orjson, 'orjson is not installed')
+    def test_orjson_renderer_output_is_equivalent_on_api_payloads(self):
+        Clinic.objects.create(name='Sparse Clinic', address='1 Rd', latitude=36.7538, longitude=-0.6308)
+        Doctor.objects.filter(pk=self.doctor.pk).update(grade=10 / 3)
+        requests = [
+            (reverse('nearby_clinics'), {'lat': 36.7, 'lon': -0.6}), (reverse('get_doctors'), {}),
+            (reverse('get_availabilities'), {}), (reverse('get_prescriptions'), {}),
+        ]
+        for url, params in requests:
+            data = self.client.get(url, params).data
+            self.assertTrue(data, url)
+            self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)), url)
+        data = {'dose': Decimal('2.50'), 'large': 1e16, 'small': 1e-7}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+
+class DoctorSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        heart = Clinic.objects.create(name='Heart Institute', address='1 Main St')
+        other = Clinic.objects.create(name='Riverside', address='2 River Rd')
+
+        def doctor(username, name, specialty, clinic, grade=0.0, description=''):
+            user = User.objects.create(username=username, email=f'{username}@example.com', name=name, role='doctor')
+            return Doctor.objects.create(user=user, specialty=specialty, clinic=clinic, grade=grade, description=description)
+
+        cls.amina = doctor('amina', 'Amina Cherif', 'Cardiology', heart, grade=4.0)
+        cls.karim = doctor('karim', 'Karim Haddad', 'Cardiology', other, grade=4.8)
+        cls.lina = doctor('lina', 'Lina Bouzid', 'Dermatology', other, description='Also treats cardiology patients with skin conditions')
+
+    def test_ranks_headline_matches_before_description_then_grade(self):
+        self.assertEqual(search_doctors('cardio'), [self.karim.pk, self.amina.pk, self.lina.pk])
+        self.assertEqual(search_doctors('cardiology heart'), [self.amina.pk])
+        self.assertEqual(search_doctors('ology'), [])
+        self.assertEqual(search_doctors('  '), [])
+
+    def test_search_text_follows_user_and_clinic_renames(self):
+        user = self.amina.user
+        user.name = 'Amina Zerrouki'
+        user.save()
+        self.assertEqual(search_doctors('zerrouki'), [self.amina.pk])
+        clinic = self.karim.clinic
+        clinic.name = 'Lakeside'
+        clinic.save()
+        self.assertEqual(search_doctors('lakeside'), [self.karim.pk, self.lina.pk])
+
+    def test_endpoint_returns_doctors_in_rank_order(self):
+        body = self.client.get(reverse('search_doctors'), {'q': 'cardio', 'limit': 2}).json()
+        self.assertEqual([row['id'] for row in body], [self.karim.pk, self.amina.pk])
+        self.assertEqual(body[0]['user']['name'], 'Karim Haddad')
+
+
+class NearbyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.algiers = Clinic.objects.create(name='Algiers', address='a', map_location='https://maps.example.com/@36.7538,3.0588,15z')
+        cls.blida = Clinic.objects.create(name='Blida', address='b', latitude=36.4700, longitude=2.8277)
+        cls.oran = Clinic.objects.create(name='Oran', address='c', map_location='35.6971, -0.6308')
+        Clinic.objects.create(name='Unknown', address='d')
+        for clinic, specialty in ((cls.algiers, 'Dermatology'), (cls.blida, 'Cardiology'), (cls.oran, 'Cardiology')):
+            doctor = make_doctor_with_slots(0, username=f'near-{clinic.name.lower()}')
+            doctor.clinic = clinic
+            doctor.specialty = specialty
+            doctor.save()
+
+    def test_coordinates_and_distance(self):
+        self.assertEqual(parse_coordinates('36.75,3.06'), (36.75, 3.06))
+        self.assertIsNone(parse_coordinates('Rue Didouche Mourad'))
+        self.assertEqual((self.algiers.latitude, self.oran.longitude), (36.7538, -0.6308))
+        self.assertAlmostEqual(haversine_km(36.7538, 3.0588, 35.6971, -0.6308), 353, delta=3)
+
+    def test_first_radius_follows_the_clinic_density(self):
+        geo.invalidate_density()
+        with self.assertNumQueries(1):
+            density = geo.clinic_density()
+            self.assertEqual(geo.clinic_density(), density)
+        # Three located clinics spread over roughly 120 x 330 km
+        self.assertAlmostEqual(geo.initial_radius(3), math.sqrt(3 / (math.pi * density)))
+        self.assertGreater(geo.initial_radius(3), 100)
+        # Clinic writes reset it through the clinic signals
+        Clinic.objects.create(name='Tlemcen', address='e', map_location='34.88,-1.31')
+        self.assertLess(geo.clinic_density(), density)
+        Clinic.objects.update(latitude=None, longitude=None)
+        geo.invalidate_density()
+        self.assertIsNone(geo.clinic_density())
+        self.assertEqual(geo.initial_radius(3), geo.INITIAL_RADIUS_KM)
+        geo.invalidate_density()
+
+    def test_nearest_clinics_grow_the_box_until_enough_are_found(self):
+        found = nearest_clinics(36.76, 3.05, limit=2)
+        self.assertEqual([pk for _, pk in found], [self.algiers.pk, self.blida.pk])
+        self.assertEqual(len(nearest_clinics(36.76, 3.05, limit=10)), 3)
+        self.assertEqual(nearest_clinics(36.76, 3.05, limit=10, max_radius_km=10)[0][1], self.algiers.pk)
+        self.assertEqual(len(nearest_clinics(36.76, 3.05, limit=10, max_radius_km=10)), 1)
+
+    def test_nearby_doctors_endpoint_filters_by_specialty(self):
+        body = self.client.get(reverse('nearby_doctors'), {'lat': 36.76, 'lon': 3.05, 'specialty': 'Cardiology'}).json()
+        self.assertEqual([row['clinic']['name'] for row in body], ['Blida', 'Oran'])
+        self.assertLess(body[0]['distance_km'], body[1]['distance_km'])
+        body = self.client.get(reverse('nearby_clinics'), {'lat': 36.76, 'lon': 3.05, 'limit': 1}).json()
+        self.assertEqual([row['name'] for row in body], ['Algiers'])
+        body = self.client.get(reverse('nearby_clinics'), {'lat': 36.76, 'lon': 3.05, 'limit': -2}).json()
+        self.assertEqual([row['name'] for row in body], ['Algiers'])
+        self.assertEqual(self.client.get(reverse('nearby_clinics'), {'lat': 91, 'lon': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('nearby_clinics'), {'lat': 36.76, 'lon': 3.05, 'radius': 0}).status_code, 400)
+        body = self.client.get(reverse('nearby_clinics'), {'lat': 36.76, 'lon': 3.05, 'radius': 10}).json()
+        self.assertEqual([row['name'] for row in body], ['Algiers'])
+
+
+    def test_nearby_doctors_skip_clinics_without_doctors(self):
+        for i in range(5):
+            Clinic.objects.create(name=f'Empty {i}', address='e', latitude=36.76 + i / 1000, longitude=3.05)
+        body = self.client.get(reverse('nearby_doctors'), {'lat': 36.76, 'lon': 3.05, 'limit': 3}).json()
+        self.assertEqual([row['clinic']['name'] for row in body], ['Algiers', 'Blida', 'Oran'])
+
+def make_confirmed_appointments(count, username='checkin-doctor'):
+    doctor = make_doctor_with_slots(0, username=username)
+    patients = make_patients(count, prefix=f'{username}-patient')
+    start = timezone.now().replace(second=0, microsecond=0)
+    return [
+        Appointment.objects.create(
+            doctor=doctor, patient=patient, status='confirmed',
+            start_time=start + timedelta(minutes=15 * i), end_time=start + timedelta(minutes=15 * (i + 1)),
+        )
+        for i, patient in enumerate(patients)
+    ]
+
+
+class CheckInTests(TestCase):
+    def scan(self, token):
+        return self.client.post(reverse('check_in'), {'token': token}, content_type='application/json')
+
+    def test_tokens_are_signed_and_issued_on_save(self):
+        appointment = make_confirmed_appointments(1)[0]
+        self.assertEqual(len(appointment.qr_Code), 33)
+        self.assertTrue(is_signed(appointment.qr_Code))
+        nonce, _, signature = generate_token().partition('.')
+        self.assertFalse(is_signed(f'{nonce}.{signature[::-1]}'))
+
+    def test_scan_checks_in_once_with_a_single_query(self):
+        appointment = make_confirmed_appointments(1)[0]
+        with self.assertNumQueries(1):
+            response = self.scan(appointment.qr_Code)
+        self.assertEqual(response.json(), {'status': 'in_progress'})
+        appointment.refresh_from_db()
+        self.assertEqual(appointment.status, 'in_progress')
+        response = self.scan(appointment.qr_Code)
+        self.assertEqual((response.status_code, response.json()['status']), (409, 'in_progress'))
+
+    def test_forged_codes_never_reach_the_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.scan('not-a-token').status_code, 404)
+        self.assertEqual(self.scan(generate_token()).status_code, 404)
+        self.assertEqual(self.client.post(reverse('check_in'), [1], content_type='application/json').status_code, 400)
+
+    def test_clients_cannot_choose_the_code(self):
+        self.assertTrue(AppointmentSerializer().fields['qr_Code'].read_only)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite serialises concurrent writers with table locks')
+class ConcurrentCheckInTests(TransactionTestCase):
+    def test_concurrent_scanners_check_each_appointment_in_exactly_once(self):
+        tokens = [appointment.qr_Code for appointment in make_confirmed_appointments(50)]
+
+        def scan(token):
+            try:
+                return self.client_class().post(reverse('check_in'), {'token': token}, content_type='application/json').status_code
+            finally:
+                connection.close()
+
+        # Every code is scanned by three scanners at once
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(scan, tokens * 3))
+        self.assertEqual(statuses.count(200), len(tokens))
+        self.assertEqual(statuses.count(409), 2 * len(tokens))
+        self.assertEqual(Appointment.objects.filter(status='in_progress').count(), len(tokens))
+
+
+@override_settings(SERVER_TIMING_HEADER=True, QUERY_REPEAT_THRESHOLD=3)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_confirmed_appointments(4, username='timing-doctor')
+
+    def setUp(self):
+        performance_registry.reset()
+
+    def test_server_timing_reports_queries_and_render_time(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get_appointments'))
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('render;dur=', timing)
+        report = performance_registry.snapshot()['GET api/get-appointments/']
+        self.assertEqual((report['requests'], report['max_queries'], report['n_plus_one_requests']), (1, len(queries), 0))
+        self.assertEqual(sum(report['latency_ms'].values()), 1)
+
+    def test_flags_n_plus_one_serializers(self):
+        with mock.patch.object(AppointmentSerializer, 'select_related_fields', ()):
+            with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+                self.client.get(reverse('get_appointments'))
+        self.assertIn('Possible N+1 on GET /api/get-appointments/', logs.output[0])
+        report = performance_registry.snapshot()['GET api/get-appointments/']
+        self.assertEqual(report['n_plus_one_requests'], 1)
+        self.assertGreater(report['duplicate_queries'], 0)
+
+    def test_stats_are_admin_only(self):
+        self.assertEqual(self.client.get(reverse('performance_stats')).status_code, 403)
+        # Staff logins use the AUTH_USER_MODEL, which is Django's own user model
+        self.client.force_login(get_user_model().objects.create(username='perf-admin', is_staff=True))
+        body = self.client.get(reverse('performance_stats')).json()
+        self.assertIn('GET api/performance-stats/', body)
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_a_consistent_dataset(self):
+        call_command(
+            'generate_data', clinics=2, doctors=4, patients=10, slots_per_doctor=36, medications=20,
+            prefix='gen-test', stdout=StringIO(),
+        )
+        self.assertEqual(Doctor.objects.count(), 4)
+        self.assertEqual(Appointment.objects.count(), Availability.objects.filter(booked=True).count())
+        self.assertFalse(Appointment.objects.filter(qr_Code='').exists())
+        self.assertFalse(Clinic.objects.filter(latitude__isnull=True).exists())
+        call_command('check_doctor_aggregates', stdout=StringIO())
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(0, username='archive-doctor')
+        self.patients = make_patients(2, prefix='archive-patient')
+        self.now = timezone.now()
+
+    def appointment(self, patient, days, status):
+        start = self.now + timedelta(days=days)
+        return Appointment.objects.create(doctor=self.doctor, patient=patient, start_time=start, end_time=start + timedelta(minutes=30), status=status)
+
+    def notification(self, days):
+        created = timezone.localtime() + timedelta(days=days)
+        return Notification.objects.create(
+            user=self.patients[0].user, title='Notice', description='Body', type='info',
+            date_creation=created.date(), time_creation=created.time(),
+        )
+
+    def test_moves_old_history_in_batches(self):
+        old = [self.appointment(self.patients[0], -400 - i, 'completed') for i in range(3)]
+        recent = self.appointment(self.patients[1], -10, 'completed')
+        upcoming = self.appointment(self.patients[1], 5, 'confirmed')
+        old_notification, new_notification = self.notification(-200), self.notification(-1)
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 2)
+
+        call_command('archive_history', batch_size=2, stdout=StringIO())
+        self.assertEqual(set(Appointment.objects.values_list('pk', flat=True)), {recent.pk, upcoming.pk})
+        archived = AppointmentArchive.objects.get(pk=old[0].pk)
+        self.assertEqual((archived.patient_id, archived.start_time, archived.qr_Code), (self.patients[0].pk, old[0].start_time, old[0].qr_Code))
+        self.assertIsNotNone(archived.archived_at)
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [new_notification.pk])
+        self.assertTrue(NotificationArchive.objects.filter(pk=old_notification.pk).exists())
+        # Moved rows are not deletions for offline clients or the doctor aggregates
+        self.assertFalse(SyncTombstone.objects.exists())
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 2)
+        call_command('check_doctor_aggregates', stdout=StringIO())
+
+    def test_where_restricts_the_rows_moved(self):
+        kept = self.appointment(self.patients[0], -400, 'completed')
+        moved = self.appointment(self.patients[1], -401, 'completed')
+        self.assertEqual(archive('appointments', where=Q(patient__user__username__startswith='archive-patient1')), 1)
+        self.assertEqual(list(Appointment.objects.values_list('pk', flat=True)), [kept.pk])
+        self.assertTrue(AppointmentArchive.objects.filter(pk=moved.pk).exists())
+
+    def test_archived_visits_still_count_towards_nbr_patients(self):
+        self.appointment(self.patients[0], -400, 'completed')
+        archive('appointments')
+        visit = self.appointment(self.patients[0], -1, 'confirmed')
+        visit.status = 'completed'
+        visit.save()
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.nbr_patients, 1)
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.doctor = make_doctor_with_slots(0, username='rule-doctor')
+        self.patient = make_patients(1, prefix='rule-patient')[0]
+        today = timezone.localdate()
+        # Next week's Monday, so every slot is in the future
+        self.monday = today + timedelta(days=7 - today.weekday())
+        AvailabilityRule.objects.create(doctor=self.doctor, weekday=0, start_time=time(9), end_time=time(11), slot_minutes=30)
+        AvailabilityRule.objects.create(doctor=self.doctor, weekday=2, start_time=time(14), end_time=time(15), slot_minutes=60)
+
+    def at(self, hour, minute=0, days=0):
+        return timezone.make_aware(datetime.combine(self.monday + timedelta(days=days), time(hour, minute)))
+
+    def test_expands_rules_minus_exceptions_and_bookings(self):
+        AvailabilityException.objects.create(doctor=self.doctor, start_time=self.at(9, 30), end_time=self.at(10))
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, start_time=self.at(10), end_time=self.at(10, 30), status='confirmed')
+        slots = list(open_slots(self.at(0), self.at(0, days=7)))
+        self.assertEqual([start for start, _, _ in slots], [self.at(9), self.at(10, 30), self.at(14, days=2)])
+        self.assertEqual(slots[-1][2], self.at(15, days=2))
+
+    def test_first_page_reads_only_the_days_it_needs(self):
+        with self.assertNumQueries(3):
+            slots = list(islice(open_slots(self.at(0), self.at(0, days=60)), 2))
+        self.assertEqual([start for start, _, _ in slots], [self.at(9), self.at(9, 30)])
+
+    def test_endpoint_pages_with_a_cursor(self):
+        params = {'doctor': self.doctor.id, 'start': self.at(0).isoformat(), 'end': self.at(0, days=3).isoformat(), 'limit': 3}
+        first = self.client.get(reverse('schedule_slots'), params).json()
+        self.assertEqual(len(first['results']), 3)
+        second = self.client.get(reverse('schedule_slots'), {**params, 'after': first['next']}).json()
+        self.assertEqual([row['start_time'] for row in second['results']], [self.at(10, 30).isoformat().replace('+00:00', 'Z'), self.at(14, days=2).isoformat().replace('+00:00', 'Z')])
+        self.assertIsNone(second['next'])
+        self.assertEqual(len(self.client.get(reverse('schedule_slots'), {**params, 'limit': -3}).json()['results']), 1)
+        response = self.client.get(reverse('schedule_slots'), {**params, 'after': '2026-02-30T10:00:00|1'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_books_generated_slots_once(self):
+        book = lambda start: self.client.post(
+            reverse('book_appointment'), {'doctor': self.doctor.id, 'start': start.isoformat(), 'patient': self.patient.id},
+            content_type='application/json',
+        )
+        response = book(self.at(9, 30))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Appointment.objects.get().end_time, self.at(10))
+        self.assertEqual(book(self.at(9, 30)).status_code, 409)
+        self.assertEqual(book(self.at(9, 15)).status_code, 409)
+        free = self.client.get(reverse('doctor_calendar'), {
+            'doctor': self.doctor.id, 'start': self.at(0).isoformat(), 'end': self.at(12).isoformat(),
+        }).json()['doctors'][0]['free']
+        self.assertEqual(len(free), 2)
+
+
+class PatientTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_doctor_with_slots(0, username='timeline-doctor')
+        cls.patient, other = make_patients(2, prefix='timeline-patient')
+        now = timezone.now()
+        cls.expected = []
+
+        def at(days):
+            return now - timedelta(days=days)
+
+        for days in (1, 30, 400):
+            appointment = Appointment.objects.create(
+                doctor=cls.doctor, patient=cls.patient, start_time=at(days), end_time=at(days) + timedelta(minutes=30), status='completed',
+            )
+            cls.expected.append((at(days), 'appointment', appointment.pk))
+        Appointment.objects.create(doctor=cls.doctor, patient=other, start_time=at(2), end_time=at(2) + timedelta(minutes=30))
+        for days in (3, 31):
+            prescription = create_prescription(cls.patient, cls.doctor, at(days).date(), [
+                {'name': 'Amoxicillin', 'dosage': '500mg', 'frequency': 'twice a day'},
+                {'name': 'Ibuprofen', 'dosage': '200mg', 'frequency': 'as needed'},
+            ])
+            Prescription.objects.filter(pk=prescription.pk).update(created_at=at(days))
+            cls.expected.append((at(days), 'prescription', prescription.pk))
+        feedback = Feedback.objects.create(
+            title='Great', description='Thanks', patient=cls.patient, doctor=cls.doctor, rating=5,
+            date_creation=at(1).date(), time_creation=at(1).time(),
+        )
+        # Same time as the most recent appointment: the kind breaks the tie
+        Feedback.objects.filter(pk=feedback.pk).update(created_at=at(1))
+        cls.expected.append((at(1), 'feedback', feedback.pk))
+        for days in (5, 200):
+            notification = Notification.objects.create(
+                user=cls.patient.user, title='Reminder', description='Body', type='info',
+                date_creation=at(days).date(), time_creation=at(days).time(),
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=at(days))
+            cls.expected.append((at(days), 'notification', notification.pk))
+        archive('appointments')
+        archive('notifications')
+        kinds = ['appointment', 'prescription', 'feedback', 'notification']
+        cls.expected = [(kind, pk) for _, kind, pk in sorted(cls.expected, key=lambda e: (e[0], kinds.index(e[1]), e[2]), reverse=True)]
+
+    def page(self, **params):
+        return self.client.get(reverse('patient_timeline', args=[self.patient.pk]), params).json()
+
+    def test_pages_through_the_merged_history_in_constant_queries(self):
+        self.assertTrue(AppointmentArchive.objects.exists() and NotificationArchive.objects.exists())
+        seen = []
+        cursor = ''
+        while True:
+            # Patient, one query per source and one for the prescription items, if any
+            with CaptureQueriesContext(connection) as queries:
+                body = self.page(limit=3, cursor=cursor)
+            self.assertLessEqual(len(queries), 8)
+            seen += [(entry['type'], entry['id']) for entry in body['results']]
+            if not body['next']:
+                break
+            cursor = body['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_prescriptions_carry_their_items(self):
+        body = self.page(types='prescription')
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual([item['medication_name'] for item in body['results'][0]['items']], ['Amoxicillin', 'Ibuprofen'])
+        self.assertEqual(body['results'][0]['doctor_id'], self.doctor.pk)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(reverse('patient_timeline', args=[self.patient.pk]), {'types': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('patient_timeline', args=[self.patient.pk]), {'cursor': 'nope'}).status_code, 400)
+        url = reverse('patient_timeline', args=[self.patient.pk])
+        self.assertEqual(self.client.get(url, {'cursor': '2026-02-30T00:00:00|appointment|1'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {'limit': -3}).json()['results']), 1)
+        self.assertEqual(self.client.get(reverse('patient_timeline', args=[0])).status_code, 404)
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, text):
+        path = self.directory / name
+        path.write_text(text)
+        return str(path)
+
+    def run_command(self, *args):
+        output = StringIO()
+        call_command(*args, stdout=output, stderr=StringIO())
+        return output.getvalue()
+
+    def test_imports_resolve_references_and_are_idempotent(self):
+        clinics = self.write('clinics.csv', 'name,address,map_location,latitude,longitude\nNorth,1 Rd,"36.7, 3.05",,\nSouth,2 Rd,,35.2,0.6\n')
+        doctors = self.write('doctors.jsonl', '\n'.join([
+            '{"email": "amina@example.com", "name": "Amina Haddad", "specialty": "Cardiology", "clinic": "North"}',
+            '{"email": "karim@example.com", "specialty": "Neurology", "clinic": "Nowhere"}',
+            '{"email": "lina@example.com"}',
+            'not json',
+        ]) + '\n')
+        slots = self.write('slots.csv', (
+            'doctor_email,start_time,end_time,booked\n'
+            'amina@example.com,2030-01-07T09:00:00+00:00,2030-01-07T09:30:00+00:00,false\n'
+            'amina@example.com,2030-01-07T09:30:00+00:00,2030-01-07T10:00:00+00:00,true\n'
+            'ghost@example.com,2030-01-07T09:00:00+00:00,2030-01-07T09:30:00+00:00,false\n'
+        ))
+        self.assertIn('2 created', self.run_command('import_records', 'clinics', clinics))
+        output = self.run_command('import_records', 'doctors', doctors)
+        self.assertIn('1 created', output)
+        self.assertIn("line 2: unknown clinic 'Nowhere'", output)
+        self.assertIn('line 3: specialty is required', output)
+        self.assertIn('line 4: not a JSON object', output)
+        with self.assertRaises(CommandError):
+            self.run_command('import_records', 'availabilities', slots, '--strict')
+
+        doctor = Doctor.objects.select_related('user', 'clinic').get()
+        self.assertEqual((doctor.user.username, doctor.user.role, doctor.clinic.name), ('amina@example.com', 'doctor', 'North'))
+        self.assertEqual((doctor.clinic.latitude, doctor.clinic.longitude), (36.7, 3.05))
+        self.assertIn('amina haddad', doctor.search_text)
+        self.assertEqual(list(doctor.availabilities.order_by('start_time').values_list('booked', flat=True)), [False, True])
+
+        self.assertIn('0 created, 0 updated, 2 unchanged', self.run_command('import_records', 'availabilities', slots))
+        self.assertIn('0 created, 0 updated, 1 unchanged', self.run_command('import_records', 'doctors', doctors))
+        self.assertEqual(Doctor.objects.count(), 1)
+
+    def test_bad_rows_are_rejected_without_aborting(self):
+        User.objects.create_user(username='taken', email='owner@example.com', password='x')
+        doctors = self.write('doctors.jsonl', '\n'.join([
+            '{"email": "a@example.com", "username": 5, "specialty": "Cardiology"}',
+            '{"email": "b@example.com", "username": "taken", "specialty": "Cardiology"}',
+            '{"email": "c@example.com", "username": "twin", "specialty": "Cardiology"}',
+            '{"email": "d@example.com", "username": "twin", "specialty": "Cardiology"}',
+        ]) + '\n')
+        output = self.run_command('import_records', 'doctors', doctors)
+        self.assertIn('1 created', output)
+        self.assertIn('line 1: username must be a string', output)
+        self.assertIn("line 2: username 'taken' is taken", output)
+        self.assertIn("line 4: username 'twin' is taken", output)
+        slots = self.write('slots.csv', (
+            'doctor_email,start_time,end_time,booked\n'
+            'c@example.com,2030-02-30T10:00:00+00:00,2030-02-30T10:30:00+00:00,false\n'
+            'c@example.com,2030-03-01T10:00:00+00:00,2030-03-01T10:30:00+00:00,false\n'
+        ))
+        output = self.run_command('import_records', 'availabilities', slots)
+        self.assertIn('1 created', output)
+        self.assertIn('line 2: start_time must be', output)
+
+    def test_export_round_trips(self):
+        doctor = make_doctor_with_slots(3, username='export-doctor')
+        doctor.clinic = Clinic.objects.create(name='Central', address='1 Main St')
+        doctor.save()
+        for entity, name in (('clinics', 'clinics.csv'), ('doctors', 'doctors.jsonl'), ('availabilities', 'slots.csv')):
+            self.assertIn('Exported', self.run_command('export_records', entity, str(self.directory / name)))
+        exported = (self.directory / 'doctors.jsonl').read_text().splitlines()
+        self.assertEqual(json.loads(exported[0])['clinic'], 'Central')
+        for entity, name in (('clinics', 'clinics.csv'), ('doctors', 'doctors.jsonl'), ('availabilities', 'slots.csv')):
+            self.assertIn('0 created, 0 updated', self.run_command('import_records', entity, str(self.directory / name)))
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create(username='site-admin', is_staff=True, is_superuser=True))
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:core_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        make_confirmed_appointments(2, username='admin-doctor-a')
+        before = {model: len(self.changelist_queries(model)) for model in ('appointment', 'availability', 'notification', 'prescription')}
+        make_confirmed_appointments(6, username='admin-doctor-b')
+        for model, count in before.items():
+            self.assertEqual(len(self.changelist_queries(model)), count, model)
+        self.assertEqual(self.client.get(reverse('admin:core_appointment_changelist'), {'status': 'confirmed', 'when': 'upcoming'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:core_appointment_add')).status_code, 200)
+
+    def test_counts_are_estimated_or_bounded(self):
+        make_confirmed_appointments(5, username='admin-doctor-c')
+        paginator = EstimatedCountPaginator(Appointment.objects.order_by('-id'), 2)
+        paginator.exact_limit = 3
+        with mock.patch('core.pagination.estimate_rows', return_value=None):
+            self.assertEqual(paginator.count, 3)
+        paginator = EstimatedCountPaginator(Appointment.objects.order_by('-id'), 2)
+        with mock.patch('core.pagination.estimate_rows', return_value=2_000_000), self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 2_000_000)
+        filtered = EstimatedCountPaginator(Appointment.objects.filter(status='confirmed').order_by('-id'), 2)
+        with mock.patch('core.pagination.estimate_rows', return_value=2_000_000):
+            self.assertEqual(filtered.count, 5)
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads sqlite_stat1')
+    def test_estimate_is_the_table_not_a_partial_index(self):
+        make_confirmed_appointments(5, username='admin-doctor-e')
+        Appointment.objects.filter(pk__in=Appointment.objects.order_by('id').values('pk')[:4]).update(reminder_sent_at=timezone.now())
+        table = Appointment._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            # Put the partial index's row first, where LIMIT 1 would find it
+            cursor.execute("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = %s ORDER BY idx = 'core_appt_unreminded_idx' DESC", [table])
+            stats = cursor.fetchall()
+            cursor.execute('DELETE FROM sqlite_stat1 WHERE tbl = %s', [table])
+            cursor.executemany('INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (%s, %s, %s)', [(table, idx, stat) for idx, stat in stats])
+        self.assertEqual(stats[0][0], 'core_appt_unreminded_idx')
+        self.assertEqual(estimate_rows(Appointment), 5)
+
+    def test_doctor_search_uses_the_search_index(self):
+        make_doctor_with_slots(0, username='admin-search-doctor')
+        Doctor.objects.update(specialty='Dermatology')
+        search.refresh_search_text()
+        response = self.client.get(reverse('admin:core_doctor_changelist'), {'q': 'derma'})
+        self.assertContains(response, '1 result')
+
+
+THROTTLED = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'hot_read_user': '3/min', 'hot_read_anon': '2/min'}}
+
+
+@override_settings(REST_FRAMEWORK=THROTTLED)
+@mock.patch.object(WindowRateThrottle, 'timer', return_value=1000.0)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def test_anonymous_requests_are_limited_per_ip(self, timer):
+        url = reverse('get_availabilities')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        timer.return_value = 1020.0
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with override_settings(REST_FRAMEWORK=settings.REST_FRAMEWORK | {'DEFAULT_THROTTLE_RATES': {}}):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_users_are_limited_on_their_own_budget(self, timer):
+        self.client.force_login(get_user_model().objects.create_user('throttled', password='secret'))
+        url = reverse('get_doctors')
+        self.assertEqual([self.client.get(url).status_code for _ in range(4)], [200, 200, 200, 429])
+        self.assertEqual(Client().get(url).status_code, 200)
+
+
+class CoalescingTests(TransactionTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def herd(self, url, clients=12, coalesced=True):
+        """Response bodies and total queries of `clients` threads requesting `url` at once"""
+        barrier = threading.Barrier(clients)
+        lock = threading.Lock()
+        queries = []
+
+        def slow_query(execute, sql, params, many, context):
+            with lock:
+                queries.append(sql)
+            # Keeps the first read in flight while the rest of the herd arrives
+            sleep(0.1)
+            return execute(sql, params, many, context)
+
+        def fetch(_):
+            try:
+                barrier.wait()
+                with connection.execute_wrapper(slow_query):
+                    return Client().get(url).content
+            finally:
+                connection.close()
+
+        def uncoalesced(key, compute):
+            return compute()
+
+        read = coalesce if coalesced else uncoalesced
+        with mock.patch('core.mixins.coalesce', read), mock.patch('core.cache.coalesce', read), \
+                ThreadPoolExecutor(max_workers=clients) as pool:
+            bodies = list(pool.map(fetch, range(clients)))
+        return bodies, len(queries)
+
+    def test_identical_slot_searches_share_one_query(self):
+        doctor = make_doctor_with_slots(5)
+        url = f"{reverse('search_slots')}?doctor={doctor.pk}"
+        with CaptureQueriesContext(connection) as single:
+            expected = self.client.get(url).content
+        bodies, queries = self.herd(url)
+        self.assertEqual(set(bodies), {expected})
+        self.assertEqual(queries, len(single))
+        self.assertEqual(self.herd(url, coalesced=False)[1], 12 * len(single))
+
+    def test_a_directory_cache_miss_is_computed_once(self):
+        make_doctor_with_slots(0)
+        url = reverse('get_doctors')
+        cache_stats.reset()
+        bodies, queries = self.herd(url)
+        self.assertEqual(len(set(bodies)), 1)
+        self.assertEqual(cache_stats.snapshot()['directory']['misses'], 12)
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(url)
+        self.assertEqual(queries, len(single))
@@ -0,0 +1,69 @@
+"""Per-user and per-IP rate limits for the hot read endpoints.
+
+DRF's stock throttles keep a list of request timestamps per client and
+rewrite it on every request, which loses counts when a client's requests race
+and grows with the rate. These count requests in fixed windows with
+`cache.add` and `cache.incr`, which are atomic on Redis, in the cache named by
+THROTTLE_CACHE_ALIAS. Rates come from DEFAULT_THROTTLE_RATES and a missing
+scope turns the throttle off.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class WindowRateThrottle(SimpleRateThrottle):
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def get_rate(self):
+        # Read per request, so overridden settings apply without a restart
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        self.window_end = (window + 1) * self.duration
+        key = f'{self.key}:{window}'
+        cache = self.cache
+        cache.add(key, 0, self.duration)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            cache.set(key, 1, self.duration)
+            count = 1
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(0, self.window_end - self.now)
+
+
+class UserRateThrottle(WindowRateThrottle):
+    """Requests of one authenticated user"""
+    scope = 'hot_read_user'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class AnonRateThrottle(WindowRateThrottle):
+    """Unauthenticated requests from one client IP"""
+    scope = 'hot_read_anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+HOT_READ_THROTTLES = [UserRateThrottle, AnonRateThrottle]
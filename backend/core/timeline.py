@@ -0,0 +1,104 @@
+"""A patient's medical history as one chronological feed.
+
+Appointments (hot and archived), prescriptions, feedback and notifications
+(hot and archived) are each read with a keyset query over a (patient, time)
+index, newest first, and k-way merged in Python. Entries are ordered by
+(time, kind, id) and the cursor is the key of the last entry on the page, so
+pages stay stable while new rows arrive. A page costs one query per source
+plus one for the items of its prescriptions, however long the history is.
+"""
+import heapq
+from itertools import islice
+
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Appointment, AppointmentArchive, Feedback, Notification, NotificationArchive, Prescription, PrescriptionItem
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+DOCTOR_NAME = {'doctor_name': F('doctor__user__name')}
+APPOINTMENT_FIELDS = (('doctor_id', 'start_time', 'end_time', 'status'), DOCTOR_NAME)
+NOTIFICATION_FIELDS = (('title', 'description'), {'notification_type': F('type')})
+
+# (kind, model, time field, owner lookup, owner attribute of the patient, (fields, aliases))
+# The position of a kind breaks ties between entries with the same time
+SOURCES = [
+    ('appointment', Appointment, 'start_time', 'patient_id', 'pk', APPOINTMENT_FIELDS),
+    ('appointment', AppointmentArchive, 'start_time', 'patient_id', 'pk', APPOINTMENT_FIELDS),
+    ('prescription', Prescription, 'created_at', 'patient_id', 'pk', (('doctor_id', 'date'), DOCTOR_NAME)),
+    ('feedback', Feedback, 'created_at', 'patient_id', 'pk', (('doctor_id', 'title', 'description', 'rating'), {})),
+    ('notification', Notification, 'created_at', 'user_id', 'user_id', NOTIFICATION_FIELDS),
+    ('notification', NotificationArchive, 'created_at', 'user_id', 'user_id', NOTIFICATION_FIELDS),
+]
+KINDS = list(dict.fromkeys(kind for kind, *_ in SOURCES))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def format_cursor(entry):
+    return f"{entry['time'].isoformat()}|{entry['type']}|{entry['id']}"
+
+
+def parse_cursor(value):
+    """(time, kind rank, id) from format_cursor; an empty cursor starts at the newest entry"""
+    if not value:
+        return None
+    parts = value.split('|')
+    if len(parts) != 3 or parts[1] not in KINDS or not parts[2].isdigit():
+        raise InvalidCursor(value)
+    try:
+        moment = parse_datetime(parts[0])
+    except ValueError:
+        raise InvalidCursor(value)
+    if moment is None:
+        raise InvalidCursor(value)
+    return moment, KINDS.index(parts[1]), int(parts[2])
+
+
+def _older_than(time_field, rank, cursor):
+    """Entries of one kind whose (time, rank, id) key sorts before the cursor"""
+    moment, cursor_rank, cursor_id = cursor
+    if rank < cursor_rank:
+        return Q(**{f'{time_field}__lte': moment})
+    if rank > cursor_rank:
+        return Q(**{f'{time_field}__lt': moment})
+    return Q(**{f'{time_field}__lt': moment}) | Q(**{time_field: moment, 'id__lt': cursor_id})
+
+
+def _source_page(source, patient, cursor, limit):
+    kind, model, time_field, owner, attribute, (fields, aliases) = source
+    rank = KINDS.index(kind)
+    queryset = model.objects.filter(**{owner: getattr(patient, attribute)})
+    if cursor is not None:
+        queryset = queryset.filter(_older_than(time_field, rank, cursor))
+    rows = queryset.order_by(f'-{time_field}', '-id').values('id', *fields, time=F(time_field), **aliases)[:limit]
+    return [(row['time'], rank, row['id'], dict(row, type=kind)) for row in rows]
+
+
+def timeline(patient, cursor=None, limit=DEFAULT_LIMIT, kinds=None):
+    """One page of entries, newest first, and whether more remain"""
+    pages = [
+        _source_page(source, patient, cursor, limit + 1)
+        for source in SOURCES if kinds is None or source[0] in kinds
+    ]
+    merged = heapq.merge(*pages, key=lambda entry: entry[:3], reverse=True)
+    entries = [entry for *_, entry in islice(merged, limit + 1)]
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    prescription_ids = [entry['id'] for entry in entries if entry['type'] == 'prescription']
+    if prescription_ids:
+        items = {}
+        rows = PrescriptionItem.objects.filter(prescription_id__in=prescription_ids).order_by('id').values(
+            'prescription_id', 'frequency', 'instructions', medication_name=F('medication__name'), dosage=F('medication__dosage'),
+        )
+        for row in rows:
+            items.setdefault(row.pop('prescription_id'), []).append(row)
+        for entry in entries:
+            if entry['type'] == 'prescription':
+                entry['items'] = items.get(entry['id'], [])
+    return entries, more
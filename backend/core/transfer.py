@@ -0,0 +1,353 @@
+"""Streaming bulk import and export of clinics, doctors and availability slots.
+
+Files are CSV or JSON Lines with one record per row and are read lazily, so
+memory stays flat whatever the file size. Rows are handled in chunks: foreign
+keys are resolved through in-memory maps (clinics by name, doctors by their
+user's email) filled with one query per chunk, and each chunk is written with
+bulk_create / bulk_update inside its own transaction. Existing rows are
+updated in place, so re-running an import is safe. Exports produce the same
+columns, read through server-side cursors.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, geo
+from .models import Availability, Clinic, Doctor, User
+from .search import refresh_search_text
+from .utils import chunked
+
+DEFAULT_BATCH_SIZE = 1000
+# Each bulk_update statement is a CASE over its rows, which gets slow when large
+UPDATE_BATCH_SIZE = 200
+
+FIELDS = {
+    'clinics': ['name', 'address', 'map_location', 'latitude', 'longitude'],
+    'doctors': ['email', 'username', 'name', 'phone', 'specialty', 'clinic', 'description', 'photo'],
+    'availabilities': ['doctor_email', 'start_time', 'end_time', 'booked'],
+}
+
+
+class RowError(ValueError):
+    """A record that cannot be imported; the import skips it and reports it"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.created + self.updated + self.unchanged + len(self.errors)
+
+
+def file_format(path, format=None):
+    if format:
+        return format
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_records(file, format):
+    """(line number, dict) for every record of an open CSV or JSONL file"""
+    if format == 'csv':
+        for number, row in enumerate(csv.DictReader(file), start=2):
+            yield number, {key: value if value != '' else None for key, value in row.items()}
+        return
+    for number, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def write_records(file, format, fields, rows):
+    """Write tuples in `fields` order; returns the number written"""
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(['' if value is None else value.isoformat() if isinstance(value, datetime) else value for value in row])
+            count += 1
+        return count
+    for row in rows:
+        file.write(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n')
+        count += 1
+    return count
+
+
+def _text(record, name):
+    value = record.get(name)
+    if value is not None and not isinstance(value, str):
+        raise RowError(f'{name} must be a string')
+    return value
+
+
+def _required(record, name):
+    value = _text(record, name)
+    if value is None or value.strip() == '':
+        raise RowError(f'{name} is required')
+    return value.strip()
+
+
+def _float(record, name):
+    value = record.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} must be a number')
+
+
+def _datetime(record, name):
+    value = _required(record, name)
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        # Well-formed but impossible, such as February 30
+        parsed = None
+    if parsed is None:
+        raise RowError(f'{name} must be an ISO 8601 datetime')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _bool(record, name):
+    value = record.get(name)
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def _assign(instance, values):
+    """Set `values` on `instance`; returns whether anything changed"""
+    changed = False
+    for name, value in values.items():
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed = True
+    return changed
+
+
+def _parse(chunk, parse, result):
+    """Parsed rows of a chunk; bad records go to the result's errors"""
+    parsed = []
+    for number, record in chunk:
+        try:
+            if not isinstance(record, dict):
+                raise RowError('not a JSON object')
+            parsed.append((number, parse(record)))
+        except RowError as exc:
+            result.errors.append((number, str(exc)))
+    return parsed
+
+
+def _clinic_record(record):
+    latitude, longitude = _float(record, 'latitude'), _float(record, 'longitude')
+    if latitude is None or longitude is None:
+        # bulk_create skips the pre_save signal that usually fills these
+        latitude, longitude = geo.parse_coordinates(_text(record, 'map_location')) or (None, None)
+    return {
+        'name': _required(record, 'name'),
+        'address': _required(record, 'address'),
+        'map_location': _text(record, 'map_location'),
+        'latitude': latitude,
+        'longitude': longitude,
+    }
+
+
+def import_clinics(chunk, result):
+    """Clinics are matched by name"""
+    rows = _parse(chunk, _clinic_record, result)
+    existing = {}
+    for clinic in Clinic.objects.filter(name__in=[row['name'] for _, row in rows]).order_by('-id'):
+        existing[clinic.name] = clinic
+    new, changed = {}, {}
+    for _, row in rows:
+        clinic = existing.get(row['name'])
+        if clinic is None:
+            new[row['name']] = Clinic(**row)
+        elif _assign(clinic, row):
+            # bulk_update skips auto_now
+            clinic.updated_at = timezone.now()
+            changed[row['name']] = clinic
+        else:
+            result.unchanged += 1
+    with transaction.atomic():
+        Clinic.objects.bulk_create(new.values())
+        Clinic.objects.bulk_update(changed.values(), ['address', 'map_location', 'latitude', 'longitude', 'updated_at'], batch_size=UPDATE_BATCH_SIZE)
+        # Clinic names are part of the doctors' search text
+        refresh_search_text(Doctor.objects.filter(clinic_id__in=[clinic.pk for clinic in changed.values()]))
+    result.created += len(new)
+    result.updated += len(changed)
+
+
+def _doctor_record(record):
+    email = _required(record, 'email')
+    return {
+        'email': email,
+        'username': (_text(record, 'username') or email).strip(),
+        'name': _text(record, 'name'),
+        'phone': _text(record, 'phone'),
+        'specialty': _required(record, 'specialty'),
+        'clinic': _text(record, 'clinic'),
+        'description': _text(record, 'description'),
+        'photo': _text(record, 'photo'),
+    }
+
+
+def import_doctors(chunk, result, clinics):
+    """Doctors are matched by their user's email; `clinics` maps clinic names to ids"""
+    rows = _parse(chunk, _doctor_record, result)
+    resolved = []
+    for number, row in rows:
+        if row['clinic'] and row['clinic'] not in clinics:
+            result.errors.append((number, f"unknown clinic {row['clinic']!r}"))
+        else:
+            resolved.append((number, row))
+    # Later rows win when a file repeats an email
+    resolved = list({row['email']: (number, row) for number, row in resolved}.values())
+    users = {user.email: user for user in User.objects.filter(email__in=[row['email'] for _, row in resolved])}
+    # New users need a username nobody else has, in the database or earlier in the chunk
+    taken = set(User.objects.filter(
+        username__in=[row['username'] for _, row in resolved if row['email'] not in users],
+    ).values_list('username', flat=True))
+    doctors = {doctor.user_id: doctor for doctor in Doctor.objects.filter(user__in=users.values())}
+
+    new_users, updated_users, new_doctors, updated_doctors = [], [], [], []
+    now = timezone.now()
+    for number, row in resolved:
+        if row['email'] not in users:
+            if row['username'] in taken:
+                result.errors.append((number, f"username {row['username']!r} is taken"))
+                continue
+            taken.add(row['username'])
+        user_values = {'name': row['name'], 'phone': row['phone']}
+        doctor_values = {
+            'specialty': row['specialty'], 'description': row['description'], 'photo': row['photo'],
+            'clinic_id': clinics[row['clinic']] if row['clinic'] else None,
+        }
+        user = users.get(row['email'])
+        if user is None:
+            user = User(email=row['email'], username=row['username'], role='doctor', **user_values)
+            new_users.append(user)
+            user_changed = True
+        else:
+            user_changed = _assign(user, user_values)
+            if user_changed:
+                updated_users.append(user)
+        doctor = doctors.get(user.pk) if user.pk else None
+        if doctor is None:
+            new_doctors.append(Doctor(user=user, **doctor_values))
+        elif _assign(doctor, doctor_values) or user_changed:
+            # bulk_update skips auto_now, and offline clients sync doctors by updated_at
+            doctor.updated_at = now
+            updated_doctors.append(doctor)
+        else:
+            result.unchanged += 1
+    with transaction.atomic():
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update(updated_users, ['name', 'phone'], batch_size=UPDATE_BATCH_SIZE)
+        Doctor.objects.bulk_create(new_doctors)
+        Doctor.objects.bulk_update(updated_doctors, ['specialty', 'description', 'photo', 'clinic', 'updated_at'], batch_size=UPDATE_BATCH_SIZE)
+        refresh_search_text(Doctor.objects.filter(pk__in=[doctor.pk for doctor in new_doctors + updated_doctors]))
+    result.created += len(new_doctors)
+    result.updated += len(updated_doctors)
+
+
+def _availability_record(record):
+    row = {
+        'doctor_email': _required(record, 'doctor_email'),
+        'start_time': _datetime(record, 'start_time'),
+        'end_time': _datetime(record, 'end_time'),
+        'booked': _bool(record, 'booked'),
+    }
+    if row['end_time'] <= row['start_time']:
+        raise RowError('end_time must be after start_time')
+    return row
+
+
+def import_availabilities(chunk, result):
+    """Slots are matched by doctor and start time"""
+    rows = _parse(chunk, _availability_record, result)
+    doctors = dict(
+        Doctor.objects.filter(user__email__in={row['doctor_email'] for _, row in rows}).values_list('user__email', 'id')
+    )
+    slots = {}
+    for number, row in rows:
+        doctor_id = doctors.get(row['doctor_email'])
+        if doctor_id is None:
+            result.errors.append((number, f"unknown doctor {row['doctor_email']!r}"))
+            continue
+        slots[doctor_id, row['start_time']] = row
+    existing = {}
+    if slots:
+        starts = [start for _, start in slots]
+        matches = Availability.objects.filter(
+            doctor_id__in={doctor_id for doctor_id, _ in slots}, start_time__gte=min(starts), start_time__lte=max(starts),
+        ).only('id', 'doctor_id', 'start_time', 'end_time', 'booked')
+        existing = {(slot.doctor_id_id, slot.start_time): slot for slot in matches}
+    new, changed = [], []
+    # Most re-imports only flip `booked`, which two plain UPDATEs handle
+    flipped = {True: [], False: []}
+    for (doctor_id, start), row in slots.items():
+        slot = existing.get((doctor_id, start))
+        if slot is None:
+            new.append(Availability(doctor_id_id=doctor_id, start_time=start, end_time=row['end_time'], booked=row['booked']))
+        elif slot.end_time != row['end_time']:
+            slot.end_time, slot.booked = row['end_time'], row['booked']
+            changed.append(slot)
+        elif slot.booked != row['booked']:
+            flipped[row['booked']].append(slot.pk)
+        else:
+            result.unchanged += 1
+    with transaction.atomic():
+        Availability.objects.bulk_create(new)
+        Availability.objects.bulk_update(changed, ['end_time', 'booked'], batch_size=UPDATE_BATCH_SIZE)
+        for booked, ids in flipped.items():
+            if ids:
+                Availability.objects.filter(pk__in=ids).update(booked=booked)
+    result.created += len(new)
+    result.updated += len(changed) + len(flipped[True]) + len(flipped[False])
+
+
+def import_records(entity, records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Import (line number, dict) records of `entity` chunk by chunk"""
+    result = ImportResult()
+    clinics = dict(Clinic.objects.order_by('-id').values_list('name', 'id')) if entity == 'doctors' else None
+    for chunk in chunked(records, batch_size):
+        if entity == 'clinics':
+            import_clinics(chunk, result)
+        elif entity == 'doctors':
+            import_doctors(chunk, result, clinics)
+        else:
+            import_availabilities(chunk, result)
+        if progress:
+            progress(result)
+    if entity != 'availabilities':
+        cache.invalidate_all()
+    if entity == 'clinics':
+        geo.invalidate_density()
+    return result
+
+
+def export_rows(entity, batch_size=DEFAULT_BATCH_SIZE):
+    """Tuples in FIELDS[entity] order, streamed through a server-side cursor"""
+    if entity == 'clinics':
+        queryset = Clinic.objects.order_by('id').values_list(*FIELDS['clinics'])
+    elif entity == 'doctors':
+        queryset = Doctor.objects.order_by('id').values_list(
+            'user__email', 'user__username', 'user__name', 'user__phone', 'specialty', 'clinic__name', 'description', 'photo',
+        )
+    else:
+        queryset = Availability.objects.order_by('id').values_list('doctor_id__user__email', 'start_time', 'end_time', 'booked')
+    return queryset.iterator(chunk_size=batch_size)
@@ -1,8 +1,39 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
 
-    path('get-users/', views.get_users, name='get_users'),
+    path('get-users/', views.UserListView.as_view(), name='get_users'),
+    path('get-users/export/', views.UserExportView.as_view(), name='export_users'),
+    path('get-doctors/', views.DoctorListView.as_view(), name='get_doctors'),
+    path('get-doctors/<int:pk>/', views.DoctorProfileView.as_view(), name='get_doctor'),
+    path('get-patients/', views.PatientListView.as_view(), name='get_patients'),
+    path('get-appointments/', views.AppointmentListView.as_view(), name='get_appointments'),
+    path('get-notifications/', views.NotificationListView.as_view(), name='get_notifications'),
+    path('get-feedback/', views.FeedbackListView.as_view(), name='get_feedback'),
+    path('get-prescriptions/', views.PrescriptionListView.as_view(), name='get_prescriptions'),
+    path('create-prescription/', views.PrescriptionCreateView.as_view(), name='create_prescription'),
+    path('search-medications/', views.MedicationSearchView.as_view(), name='search_medications'),
+    path('search-doctors/', views.DoctorSearchView.as_view(), name='search_doctors'),
+    path('nearby-clinics/', views.NearbyClinicsView.as_view(), name='nearby_clinics'),
+    path('nearby-doctors/', views.NearbyDoctorsView.as_view(), name='nearby_doctors'),
+    path('get-availabilities/', views.AvailabilityListView.as_view(), name='get_availabilities'),
+    path('get-social-media/', views.SocialMediaListView.as_view(), name='get_social_media'),
+    path('search-slots/', views.SlotSearchView.as_view(), name='search_slots'),
+    path('schedule-slots/', views.ScheduleSlotSearchView.as_view(), name='schedule_slots'),
+    path('book-appointment/', views.BookAppointmentView.as_view(), name='book_appointment'),
+    path('check-in/', views.CheckInView.as_view(), name='check_in'),
+    path('doctor-calendar/', views.DoctorCalendarView.as_view(), name='doctor_calendar'),
+    path('patient-timeline/<int:pk>/', views.PatientTimelineView.as_view(), name='patient_timeline'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache_stats'),
+    path('performance-stats/', views.PerformanceStatsView.as_view(), name='performance_stats'),
+    path('notification-stats/', views.NotificationQueueStatsView.as_view(), name='notification_stats'),
+
+    path('async/get-users/', async_views.get_users, name='async_get_users'),
+    path('async/get-doctors/', async_views.get_doctors, name='async_get_doctors'),
+    path('async/get-doctors/<int:pk>/', async_views.get_doctor, name='async_get_doctor'),
+    path('async/get-appointments/', async_views.get_appointments, name='async_get_appointments'),
+    path('async/get-notifications/', async_views.get_notifications, name='async_get_notifications'),
 
 ]
@@ -0,0 +1,26 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def chunked(iterable, size):
+    """Group an iterable into lists of at most `size` items"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json_array(queryset, serializer_class, chunk_size=2000):
+    """Yield a JSON array piece by piece, reading rows through a server-side cursor"""
+    yield '['
+    separator = ''
+    for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        rows = serializer_class(chunk, many=True).data
+        yield separator + ','.join(json.dumps(row, cls=DjangoJSONEncoder) for row in rows)
+        separator = ','
+    yield ']'
@@ -1,18 +1,468 @@
+from collections.abc import Mapping
+from datetime import timedelta
+from itertools import islice
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from .models import Appointment, Doctor, Patient, Notification, Feedback, Prescription
-from .serializers import AppointmentSerializer, DoctorSerializer, PatientSerializer, NotificationSerializer, FeedbackSerializer, PrescriptionSerializer
-from django.http import JsonResponse
-from supabase import create_client
-import os
-from django.conf import settings
-from supabase import create_client
-
-supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-def get_users(request):
-    # Query the "user" table
-    response = supabase.table('core_user').select('*').execute()
-
-    # Return the response data as JSON
-    return JsonResponse(response.data, safe=False)
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import User, Clinic, Appointment, Doctor, Patient, Notification, Feedback, Prescription, Availability, SocialMedia
+from .serializers import ClinicSerializer, UserSerializer, AppointmentSerializer, DoctorSerializer, PatientSerializer, NotificationSerializer, FeedbackSerializer, PrescriptionSerializer, AvailabilitySerializer, SocialMediaSerializer, DoctorProfileSerializer, PrescriptionCreateSerializer, sparse_options
+from . import cache, checkin, coalescing, geo, instrumentation, sync, timeline
+from .mixins import CoalescedListMixin, EagerLoadingViewMixin
+from .pagination import IdCursorPagination, SlotCursorPagination
+from .calendar import doctor_calendars
+from .medications import search_medications
+from .search import search_doctors
+from .notifications import dispatcher as notification_dispatcher, notify
+from .schedule import open_slots
+from .services import SlotUnavailable, book_rule_slot, book_slot, search_slots
+from .throttling import HOT_READ_THROTTLES
+from .utils import stream_json_array
+
+
+def _datetime_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        # Well-formed but impossible dates such as February 30 raise ValueError
+        parsed = parse_datetime(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Invalid datetime.'})
+    if parsed is None:
+        raise ValidationError({name: 'Expected an ISO 8601 datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _float_param(params, name, low, high):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not low <= number <= high:
+        raise ValidationError({name: f'Expected a number between {low} and {high}.'})
+    return number
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Expected an integer id.'})
+
+
+def _limit_param(params, default, maximum):
+    """`limit` clamped to [1, maximum]; missing or zero means `default`"""
+    return max(1, min(_int_param(params, 'limit') or default, maximum))
+
+
+class UserListView(EagerLoadingViewMixin, generics.ListAPIView):
+    """Users ordered by id, paginated with an opaque keyset cursor"""
+    queryset = User.objects.order_by('id')
+    serializer_class = UserSerializer
+    pagination_class = IdCursorPagination
+
+
+class UserExportView(APIView):
+    """Bulk export of every user as a streamed JSON array"""
+
+    def get(self, request):
+        rows = stream_json_array(User.objects.order_by('id'), UserSerializer)
+        return StreamingHttpResponse(rows, content_type='application/json')
+
+
+class SlotSearchView(CoalescedListMixin, generics.ListAPIView):
+    """Open availability slots filtered by specialty, clinic, doctor and time window"""
+    serializer_class = AvailabilitySerializer
+    pagination_class = SlotCursorPagination
+    throttle_classes = HOT_READ_THROTTLES
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = search_slots(
+            specialty=params.get('specialty'),
+            clinic=_int_param(params, 'clinic'),
+            doctor=_int_param(params, 'doctor'),
+            start=_datetime_param(params, 'start'),
+            end=_datetime_param(params, 'end'),
+            include_booked=params.get('include_booked') in ('1', 'true'),
+        )
+        options = sparse_options(self.request)
+        return self.get_serializer_class().setup_eager_loading(queryset, expand=options[1] if options else None)
+
+
+class ScheduleSlotSearchView(APIView):
+    """Open slots generated from recurring availability rules, filtered like slot search.
+
+    Pages are ordered by (start_time, doctor) and continued with the `after`
+    cursor returned as `next`.
+    """
+    default_window = timedelta(days=14)
+    max_window = timedelta(days=62)
+    throttle_classes = HOT_READ_THROTTLES
+
+    def get(self, request):
+        return Response(coalescing.coalesce(f'schedule-slots:{request.build_absolute_uri()}', lambda: self.page(request)))
+
+    def page(self, request):
+        params = request.query_params
+        start = _datetime_param(params, 'start') or timezone.now()
+        end = _datetime_param(params, 'end') or start + self.default_window
+        if end <= start or end - start > self.max_window:
+            raise ValidationError({'detail': f'end must be after start and within {self.max_window.days} days of it.'})
+        try:
+            after = sync.parse_watermark(params.get('after'))
+        except sync.InvalidWatermark:
+            raise ValidationError({'after': 'Invalid cursor.'})
+        limit = _limit_param(params, 20, 200)
+        slots = list(islice(open_slots(
+            start, end, after=after,
+            doctor=_int_param(params, 'doctor'), specialty=params.get('specialty'), clinic=_int_param(params, 'clinic'),
+        ), limit + 1))
+        more = len(slots) > limit
+        slots = slots[:limit]
+        return {
+            'results': [{'doctor': doctor_id, 'start_time': slot_start, 'end_time': slot_end} for slot_start, doctor_id, slot_end in slots],
+            'next': sync.format_watermark(slots[-1][0], slots[-1][1]) if more else None,
+        }
+
+
+class DoctorListView(EagerLoadingViewMixin, generics.ListAPIView):
+    """Doctor directory, cached per query string until a doctor-related write"""
+    queryset = Doctor.objects.order_by('id')
+    serializer_class = DoctorSerializer
+    pagination_class = IdCursorPagination
+    throttle_classes = HOT_READ_THROTTLES
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('specialty'):
+            queryset = queryset.filter(specialty=params['specialty'])
+        clinic = _int_param(params, 'clinic')
+        if clinic is not None:
+            queryset = queryset.filter(clinic=clinic)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        data = cache.get_or_compute(
+            'directory',
+            cache.directory_key(request.build_absolute_uri()),
+            lambda: super(DoctorListView, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+
+class DoctorProfileView(EagerLoadingViewMixin, generics.RetrieveAPIView):
+    """Doctor profile with clinic, social links and feedback count"""
+    queryset = Doctor.objects.annotate(feedback_count=Count('feedback'))
+    serializer_class = DoctorProfileSerializer
+    throttle_classes = HOT_READ_THROTTLES
+
+    def retrieve(self, request, *args, **kwargs):
+        if sparse_options(request) is not None:
+            # Only the full profile is cached
+            return super().retrieve(request, *args, **kwargs)
+        data = cache.get_or_compute(
+            'profile',
+            cache.profile_key(kwargs['pk']),
+            lambda: super(DoctorProfileView, self).retrieve(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+
+class NotificationQueueStatsView(APIView):
+    """Queue depth, throughput and backpressure counters of the notification workers"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(notification_dispatcher.metrics())
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the doctor caches and coalesced reads in this process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(dict(cache.stats.snapshot(), coalesced=coalescing.flights.snapshot()))
+
+
+class PerformanceStatsView(APIView):
+    """Per-endpoint query counts, timings and histograms recorded in this process"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(instrumentation.registry.snapshot())
+
+
+class PatientListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Patient.objects.order_by('id')
+    serializer_class = PatientSerializer
+    pagination_class = IdCursorPagination
+
+
+class AppointmentListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Appointment.objects.order_by('id')
+    serializer_class = AppointmentSerializer
+    pagination_class = IdCursorPagination
+
+
+class NotificationListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Notification.objects.order_by('id')
+    serializer_class = NotificationSerializer
+    pagination_class = IdCursorPagination
+
+
+class FeedbackListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Feedback.objects.order_by('id')
+    serializer_class = FeedbackSerializer
+    pagination_class = IdCursorPagination
+
+
+class PrescriptionListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Prescription.objects.order_by('id')
+    serializer_class = PrescriptionSerializer
+    pagination_class = IdCursorPagination
+
+
+class PrescriptionCreateView(generics.CreateAPIView):
+    """Create a prescription together with all of its medication items"""
+    serializer_class = PrescriptionCreateSerializer
+
+    def perform_create(self, serializer):
+        prescription = serializer.save()
+        transaction.on_commit(lambda: notify(
+            prescription.patient.user_id, 'Prescription ready',
+            f'Your prescription from {prescription.date} is available.', 'prescription_ready',
+        ))
+
+
+class MedicationSearchView(APIView):
+    """Typeahead over the medication catalogue"""
+
+    def get(self, request):
+        limit = _limit_param(request.query_params, 10, 50)
+        return Response(search_medications(request.query_params.get('q', ''), limit))
+
+
+class DoctorSearchView(APIView):
+    """Doctors ranked by how well their name, specialty, clinic and description match `q`"""
+
+    def get(self, request):
+        limit = _limit_param(request.query_params, 20, 50)
+        ids = search_doctors(request.query_params.get('q', ''), limit)
+        options = sparse_options(request)
+        queryset = DoctorSerializer.setup_eager_loading(Doctor.objects.filter(pk__in=ids), expand=options[1] if options else None)
+        doctors = queryset.in_bulk()
+        serializer = DoctorSerializer([doctors[pk] for pk in ids], many=True, context={'request': request})
+        return Response(serializer.data)
+
+
+class NearbyView(APIView):
+    """Closest clinics or doctors to `lat`/`lon`, optionally within `radius` km"""
+    model = None
+    serializer_class = None
+    max_limit = 50
+
+    def get(self, request):
+        params = request.query_params
+        lat = _float_param(params, 'lat', -90, 90)
+        lon = _float_param(params, 'lon', -180, 180)
+        if lat is None or lon is None:
+            raise ValidationError({'detail': 'lat and lon are required.'})
+        radius = _float_param(params, 'radius', 0, geo.MAX_RADIUS_KM)
+        if radius is None:
+            radius = geo.MAX_RADIUS_KM
+        elif radius <= 0:
+            raise ValidationError({'radius': 'Expected a positive number of km.'})
+        limit = _limit_param(params, 10, self.max_limit)
+        found = self.nearest(lat, lon, limit, radius)
+        options = sparse_options(request)
+        queryset = self.serializer_class.setup_eager_loading(self.model.objects.filter(pk__in=[pk for _, pk in found]), expand=options[1] if options else None)
+        objects = queryset.in_bulk()
+        data = self.serializer_class([objects[pk] for _, pk in found], many=True, context={'request': request}).data
+        return Response([
+            {'distance_km': round(distance, 3), **row} for (distance, _), row in zip(found, data)
+        ])
+
+
+class NearbyClinicsView(NearbyView):
+    model = Clinic
+    serializer_class = ClinicSerializer
+
+    def nearest(self, lat, lon, limit, radius):
+        return geo.nearest_clinics(lat, lon, limit, radius)
+
+
+class NearbyDoctorsView(NearbyView):
+    model = Doctor
+    serializer_class = DoctorSerializer
+
+    def nearest(self, lat, lon, limit, radius):
+        return geo.nearest_doctors(lat, lon, limit, radius, specialty=self.request.query_params.get('specialty'))
+
+
+class AvailabilityListView(CoalescedListMixin, EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = Availability.objects.order_by('id')
+    serializer_class = AvailabilitySerializer
+    pagination_class = IdCursorPagination
+    throttle_classes = HOT_READ_THROTTLES
+
+
+class SocialMediaListView(EagerLoadingViewMixin, generics.ListAPIView):
+    queryset = SocialMedia.objects.order_by('id')
+    serializer_class = SocialMediaSerializer
+    pagination_class = IdCursorPagination
+
+
+class DoctorCalendarView(APIView):
+    """Merged busy and free intervals of one or more doctors, or a whole clinic, over a window"""
+    max_window = timedelta(days=62)
+
+    def get(self, request):
+        params = request.query_params
+        start = _datetime_param(params, 'start')
+        end = _datetime_param(params, 'end')
+        if start is None or end is None or end <= start:
+            raise ValidationError({'detail': 'start and end are required and end must be after start.'})
+        if end - start > self.max_window:
+            raise ValidationError({'detail': f'The window cannot exceed {self.max_window.days} days.'})
+        try:
+            doctor_ids = [int(value) for value in params.getlist('doctor')]
+        except ValueError:
+            raise ValidationError({'doctor': 'Expected integer ids.'})
+        clinic = _int_param(params, 'clinic')
+        if clinic is not None:
+            doctor_ids += Doctor.objects.filter(clinic=clinic).order_by('id').values_list('id', flat=True)
+        if not doctor_ids:
+            raise ValidationError({'detail': 'Pass at least one doctor or a clinic.'})
+
+        def intervals(pairs):
+            return [{'start': s, 'end': e} for s, e in pairs]
+
+        calendars = doctor_calendars(list(dict.fromkeys(doctor_ids)), start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'doctors': [
+                {'doctor': doctor_id, 'busy': intervals(calendar['busy']), 'free': intervals(calendar['free'])}
+                for doctor_id, calendar in calendars.items()
+            ],
+        })
+
+
+class SyncView(APIView):
+    """Rows changed and deleted since the client's per-model watermarks.
+
+    Query parameters: `models` (comma separated, default all), one watermark
+    per model named after it, `deleted` for the tombstone watermark, `user` to
+    scope personal data and `limit` rows per model. A model whose `more` flag is
+    set should be requested again with its new watermark.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        names = params['models'].split(',') if params.get('models') else list(sync.SYNCED_MODELS)
+        unknown = [name for name in names if name not in sync.SYNCED_MODELS]
+        if unknown:
+            raise ValidationError({'models': f'Unknown models: {", ".join(unknown)}.'})
+        limit = _limit_param(params, sync.DEFAULT_LIMIT, sync.MAX_LIMIT)
+        user_id = _int_param(params, 'user')
+        changes = {}
+        for name in names:
+            try:
+                watermark = sync.parse_watermark(params.get(name))
+            except sync.InvalidWatermark:
+                raise ValidationError({name: 'Invalid watermark.'})
+            changes[name] = sync.changes_since(name, watermark, user_id=user_id, limit=limit)
+        deleted, deleted_watermark, more_deleted = sync.deletions_since(names, _int_param(params, 'deleted'), user_id=user_id)
+        return Response({
+            'changes': changes,
+            'deleted': deleted,
+            'deleted_watermark': deleted_watermark,
+            'more_deleted': more_deleted,
+        })
+
+
+class PatientTimelineView(APIView):
+    """A patient's appointments, prescriptions, feedback and notifications, newest first.
+
+    `types` (comma separated) narrows the feed; the `next` cursor continues it.
+    """
+
+    def get(self, request, pk):
+        params = request.query_params
+        kinds = params['types'].split(',') if params.get('types') else None
+        unknown = [kind for kind in kinds or () if kind not in timeline.KINDS]
+        if unknown:
+            raise ValidationError({'types': f'Unknown types: {", ".join(unknown)}.'})
+        try:
+            cursor = timeline.parse_cursor(params.get('cursor'))
+        except timeline.InvalidCursor:
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        limit = _limit_param(params, timeline.DEFAULT_LIMIT, timeline.MAX_LIMIT)
+        patient = get_object_or_404(Patient.objects.only('id', 'user_id'), pk=pk)
+        entries, more = timeline.timeline(patient, cursor=cursor, limit=limit, kinds=kinds)
+        return Response({
+            'results': entries,
+            'next': timeline.format_cursor(entries[-1]) if more else None,
+        })
+
+
+class BookAppointmentView(APIView):
+    """Book an availability slot, or a slot generated from a doctor's rules (doctor and start), for a patient"""
+
+    def post(self, request):
+        slot_id = _int_param(request.data, 'slot')
+        doctor_id = _int_param(request.data, 'doctor')
+        start = _datetime_param(request.data, 'start')
+        patient_id = _int_param(request.data, 'patient')
+        if patient_id is None or (slot_id is None and (doctor_id is None or start is None)):
+            raise ValidationError({'detail': 'A patient and either a slot or a doctor and start are required.'})
+        patient = get_object_or_404(Patient, pk=patient_id)
+        try:
+            if slot_id is not None:
+                appointment = book_slot(slot_id, patient)
+            else:
+                appointment = book_rule_slot(doctor_id, start, patient)
+        except SlotUnavailable:
+            return Response({'detail': 'This slot is no longer available.'}, status=status.HTTP_409_CONFLICT)
+        start = timezone.localtime(appointment.start_time)
+        transaction.on_commit(lambda: notify(
+            patient.user_id, 'Appointment confirmed',
+            f'Your appointment is booked for {start:%Y-%m-%d} at {start:%H:%M}.', 'appointment_confirmed',
+        ))
+        return Response(AppointmentSerializer(appointment).data, status=status.HTTP_201_CREATED)
+
+
+class CheckInView(APIView):
+    """Scan a QR check-in token: confirmed appointments move to in_progress"""
+
+    def post(self, request):
+        if not isinstance(request.data, Mapping):
+            raise ValidationError({'detail': 'Expected a JSON object with a token.'})
+        try:
+            checkin.check_in(str(request.data.get('token', '')))
+        except checkin.InvalidToken:
+            return Response({'detail': 'Unknown check-in code.'}, status=status.HTTP_404_NOT_FOUND)
+        except checkin.AlreadyCheckedIn as exc:
+            return Response(
+                {'detail': 'This appointment cannot be checked in.', 'status': exc.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({'status': 'in_progress'})